@@ -0,0 +1,72 @@
+"""A shelf of books: one GET per book vs one batch request.
+
+    python benchmarks/bench_batch.py [--size 100k] [--shelf 50] [--pages 100]
+
+Each page is --shelf random ids, fetched as GET /api/books/{id} one after
+another (`sequential`), six at a time like a browser (`parallel_6`), or
+as a single GET /api/books?ids=... (`batch`). `cold` empties the book
+cache before every page; `warm` leaves it filled. Times are per page.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+
+from catalog import cached_catalog, parse_size
+from common import percentiles, timer
+from driver import LoadDriver
+
+
+async def sequential(driver: LoadDriver, ids) -> None:
+    for book_id in ids:
+        await driver.request(("GET", f"/api/books/{book_id}"))
+
+
+async def parallel(driver: LoadDriver, ids, connections: int = 6) -> None:
+    queue = list(ids)
+
+    async def connection():
+        while queue:
+            await driver.request(("GET", f"/api/books/{queue.pop()}"))
+
+    await asyncio.gather(*(connection() for _ in range(connections)))
+
+
+async def batch(driver: LoadDriver, ids) -> None:
+    status = await driver.request(("GET", f"/api/books?ids={','.join(map(str, ids))}"))
+    assert status == 200, status
+
+
+async def run(args, path: str) -> None:
+    books = parse_size(args.size)
+    rnd = random.Random(5)
+    shelves = [rnd.sample(range(1, books + 1), args.shelf) for _ in range(args.pages)]
+    results = []
+    async with LoadDriver({"DB_PATH": path}) as driver:
+        for cache in ("cold", "warm"):
+            for name, fetch in (("sequential", sequential), ("parallel_6", parallel), ("batch", batch)):
+                samples = []
+                for ids in shelves:
+                    if cache == "cold":
+                        driver.app["book_cache"].clear()
+                    began = timer()
+                    await fetch(driver, ids)
+                    samples.append(timer() - began)
+                results.append({"cache": cache, "strategy": name, "shelf": args.shelf, **percentiles(samples)})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", default="100k")
+    parser.add_argument("--shelf", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=100)
+    args = parser.parse_args()
+
+    source = cached_catalog(parse_size(args.size))
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    shutil.copyfile(source, path)
+    asyncio.run(run(args, path))
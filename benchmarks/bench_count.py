@@ -0,0 +1,71 @@
+"""Cost of the total count in search_books, per count strategy.
+
+"double" replays the old behaviour: COUNT(*) over the full query followed
+by the same query again with LIMIT.
+
+    python benchmarks/bench_count.py [--books 200000] [--rounds 30]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+
+from common import create_catalog, percentiles, timer
+
+import aiosqlite
+
+from models.book import BookSearchParams
+from services.book_service import BookService
+from services.search_service import SearchService
+
+QUERIES = (
+    {},
+    {"available_only": True},
+    {"genre": "Жанр 3", "sort_by": "year"},
+    {"year_from": 1900, "year_to": 1990, "sort_by": "title"},
+    {"mode": "fts", "title": "мир"},
+)
+
+
+async def double_execution(service: SearchService, params: BookSearchParams) -> None:
+    query, query_params, _ = service.build_search_query(params)
+    async with service.db.execute(f"SELECT COUNT(*) FROM ({query})", query_params) as cursor:
+        await cursor.fetchone()
+    async with service.db.execute(f"{query} LIMIT ? OFFSET ?", query_params + [params.per_page, 0]) as cursor:
+        ids = [row["id"] for row in await cursor.fetchall()]
+    await BookService(service.db).get_books_by_ids(ids)
+
+
+async def run(args) -> None:
+    path = args.db or os.path.join(tempfile.mkdtemp(), "bench.db")
+    if not args.db or not os.path.exists(path):
+        await create_catalog(path, args.books)
+
+    results = []
+    async with aiosqlite.connect(path) as db:
+        db.row_factory = aiosqlite.Row
+        service = SearchService(db, count_cap=args.cap)
+        for query in QUERIES:
+            for strategy in ("double", "exact", "estimate", "none"):
+                samples = []
+                for _ in range(args.rounds):
+                    params = BookSearchParams(per_page=20, count=None if strategy == "double" else strategy, **query)
+                    began = timer()
+                    if strategy == "double":
+                        await double_execution(service, params)
+                    else:
+                        await service.search_books(params)
+                    samples.append(timer() - began)
+                results.append({"query": query, "strategy": strategy, **percentiles(samples)})
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=200000)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--cap", type=int, default=1000)
+    parser.add_argument("--db", help="reuse (or create) a catalog at this path")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,92 @@
+"""Write throughput with and without group commit.
+
+    python benchmarks/bench_group_commit.py [--books 10000] [--clients 64] [--writes 2000]
+
+Each client updates copies_available of random books through
+BookService.update_book, either in a transaction of its own or through
+GroupCommitter. One write in twenty-five targets a missing book and must
+fail alone. Runs with synchronous=NORMAL and FULL.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+
+from common import create_catalog, timer
+
+from models.book import BookUpdate
+from models.pool import ConnectionPool
+from services.book_service import BookService
+from services.group_commit import GroupCommitter
+from utils.exceptions import NotFoundError
+
+
+async def run_clients(args, pool: ConnectionPool, committer=None):
+    rnd = random.Random(7)
+    per_client = args.writes // args.clients
+    failures = 0
+
+    async def client():
+        nonlocal failures
+        for i in range(per_client):
+            book_id = args.books + 1 if i % 25 == 24 else rnd.randint(1, args.books)
+            update = BookUpdate(copies_available=rnd.randint(0, 5))
+            operation = lambda service: service.update_book(book_id, update)
+            try:
+                if committer is not None:
+                    await committer.submit(operation)
+                else:
+                    async with pool.writer() as db:
+                        await operation(BookService(db))
+            except NotFoundError:
+                failures += 1
+
+    began = timer()
+    await asyncio.gather(*(client() for _ in range(args.clients)))
+    elapsed = timer() - began
+    writes = per_client * args.clients
+    return {
+        "writes": writes,
+        "failed_as_expected": failures == args.clients * (per_client // 25),
+        "seconds": round(elapsed, 3),
+        "writes_per_second": round(writes / elapsed, 1),
+    }
+
+
+async def run(args) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    await create_catalog(path, args.books)
+
+    results = []
+    for synchronous in ("NORMAL", "FULL"):
+        pool = ConnectionPool(path, readers=0, synchronous=synchronous)
+        await pool.open()
+        try:
+            results.append({"synchronous": synchronous, "mode": "per_request", **await run_clients(args, pool)})
+
+            committer = GroupCommitter(pool, window=args.window_ms / 1000, max_batch=args.max_batch)
+            committer.start()
+            result = await run_clients(args, pool, committer)
+            await committer.stop()
+            results.append({
+                "synchronous": synchronous,
+                "mode": "group_commit",
+                **result,
+                "average_batch": committer.stats()["average_batch"],
+            })
+        finally:
+            await pool.close()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,63 @@
+"""Query count and latency of page hydration: per-id vs batched.
+
+    python benchmarks/bench_hydration.py [--books 20000] [--rounds 200]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+
+from common import QueryCounter, create_catalog, percentiles, timer
+
+import aiosqlite
+
+from services.book_service import BookService
+
+PAGE_SIZES = (10, 50, 100)
+
+
+async def per_id(service: BookService, ids):
+    return [await service.get_book_by_id(book_id) for book_id in ids]
+
+
+async def batched(service: BookService, ids):
+    return await service.get_books_by_ids(ids)
+
+
+async def run(args) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    await create_catalog(path, args.books)
+
+    results = []
+    async with aiosqlite.connect(path) as db:
+        db.row_factory = aiosqlite.Row
+        service = BookService(db)
+        counter = QueryCounter()
+        await db.set_trace_callback(counter)
+
+        for per_page in PAGE_SIZES:
+            for name, strategy in (("per_id", per_id), ("batched", batched)):
+                samples = []
+                counter.count = 0
+                for i in range(args.rounds):
+                    start = (i * per_page) % (args.books - per_page) + 1
+                    ids = list(range(start, start + per_page))
+                    began = timer()
+                    await strategy(service, ids)
+                    samples.append(timer() - began)
+                results.append({
+                    "strategy": name,
+                    "per_page": per_page,
+                    "queries_per_page": counter.count / args.rounds,
+                    **percentiles(samples),
+                })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
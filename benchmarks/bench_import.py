@@ -0,0 +1,92 @@
+"""Import throughput: create_book per row vs the batched import pipeline.
+
+    python benchmarks/bench_import.py [--books 20000] [--batch-size 5000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+
+from common import WORDS, timer
+
+from models.book import BookCreate
+from models.migrations import migrate
+from models.pool import ConnectionPool
+from services.book_service import BookService
+from services.import_service import ImportService, parse_records
+
+
+def make_lines(books: int, seed: int = 42):
+    rnd = random.Random(seed)
+    return [
+        json.dumps({
+            "title": " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(1, 4))),
+            "authors": sorted({f"Автор {rnd.randint(1, books // 10 + 1)}" for _ in range(rnd.randint(1, 2))}),
+            "genres": [f"Жанр {rnd.randint(1, 40)}"],
+            "publication_year": rnd.randint(1800, 2024),
+            "copies_available": rnd.randint(0, 5),
+        }, ensure_ascii=False).encode("utf-8") + b"\n"
+        for _ in range(books)
+    ]
+
+
+async def iterate(lines):
+    for line in lines:
+        yield line
+
+
+async def open_pool(name: str) -> ConnectionPool:
+    pool = ConnectionPool(os.path.join(tempfile.mkdtemp(), name), readers=0)
+    await pool.open()
+    async with pool.writer() as db:
+        await migrate(db)
+    return pool
+
+
+async def per_book(lines) -> None:
+    pool = await open_pool("per_book.db")
+    try:
+        async with pool.writer() as db:
+            service = BookService(db)
+            for line in lines:
+                await service.create_book(BookCreate.model_validate_json(line))
+    finally:
+        await pool.close()
+
+
+async def pipeline(lines, batch_size: int) -> None:
+    pool = await open_pool("pipeline.db")
+    try:
+        service = ImportService(pool.writer, batch_size=batch_size)
+        await service.import_records(parse_records(iterate(lines), "ndjson"))
+    finally:
+        await pool.close()
+
+
+async def run(args) -> None:
+    lines = make_lines(args.books)
+    results = []
+    for name, strategy in (
+        ("create_book", lambda: per_book(lines)),
+        ("import", lambda: pipeline(lines, args.batch_size)),
+    ):
+        began = timer()
+        await strategy()
+        elapsed = timer() - began
+        results.append({
+            "strategy": name,
+            "books": args.books,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(args.books / elapsed, 1),
+        })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    asyncio.run(run(parser.parse_args()))
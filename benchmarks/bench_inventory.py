@@ -0,0 +1,90 @@
+"""Loan throughput: update_book(copies_available) vs checkout/return.
+
+    python benchmarks/bench_inventory.py [--books 10000] [--clients 64] [--loans 4000]
+
+Each client checks a random book out and returns it, either by reading
+the book and writing the new count through update_book (the only way
+before), or with checkout_books/return_books. Inactive books are skipped
+by both.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+
+from common import QueryCounter, create_catalog, timer
+
+from models.book import BookUpdate
+from models.pool import ConnectionPool
+from services.book_service import BookService
+from utils.exceptions import ConflictError, NotFoundError
+
+
+async def via_update(db, book_id: int, delta: int) -> None:
+    service = BookService(db)
+    try:
+        book = await service.get_book_by_id(book_id)
+    except NotFoundError:
+        return
+    if book.copies_available + delta >= 0:
+        await service.update_book(book_id, BookUpdate(copies_available=book.copies_available + delta))
+
+
+async def via_checkout(db, book_id: int, delta: int) -> None:
+    service = BookService(db)
+    try:
+        if delta < 0:
+            await service.checkout_books([book_id])
+        else:
+            await service.return_books([book_id])
+    except (ConflictError, NotFoundError):
+        # Out of copies or inactive; nothing was changed
+        await db.rollback()
+
+
+async def run(args) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    await create_catalog(path, args.books)
+
+    results = []
+    pool = ConnectionPool(path, readers=0)
+    await pool.open()
+    counter = QueryCounter()
+    await pool.writer_connection.set_trace_callback(counter)
+    try:
+        for name, loan in (("update_book", via_update), ("checkout", via_checkout)):
+            rnd = random.Random(7)
+            per_client = args.loans // args.clients
+            counter.count = 0
+
+            async def client():
+                for _ in range(per_client):
+                    book_id = rnd.randint(1, args.books)
+                    for delta in (-1, 1):
+                        async with pool.writer() as db:
+                            await loan(db, book_id, delta)
+
+            began = timer()
+            await asyncio.gather(*(client() for _ in range(args.clients)))
+            elapsed = timer() - began
+            operations = per_client * args.clients * 2
+            results.append({
+                "strategy": name,
+                "operations": operations,
+                "statements_per_operation": round(counter.count / operations, 1),
+                "operations_per_second": round(operations / elapsed, 1),
+            })
+    finally:
+        await pool.close()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--loans", type=int, default=4000)
+    asyncio.run(run(parser.parse_args()))
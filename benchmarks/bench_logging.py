@@ -0,0 +1,148 @@
+"""Event-loop lag while requests log errors.
+
+    python benchmarks/bench_logging.py [--seconds 3] [--workers 50] [--stall-ms 50]
+
+Workers log like handle_errors does: 404 warnings, and every 50th record
+a 500 with a traceback. Meanwhile a probe sleeps 1 ms at a time and
+records how late it wakes up; `none` (logging off) is the lag of the
+load itself. The log file sits on a disk that stalls
+for --stall-ms on every 2000th write and rotates every 256 KB. Pipelines:
+
+- none: records below the logger level, nothing is written
+- direct: the former setup_logging, handlers attached to the logger
+- queue: utils.log, formatting and I/O in the listener thread
+- queue_sampled: the same with 4xx warnings capped at 10 per second
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+
+from common import percentiles, timer
+
+from utils.log import setup_logging, stop_logging
+
+
+class StallingFile(io.FileIO):
+    # A disk that occasionally takes its time
+    def __init__(self, path: str, mode: str, stall: float):
+        super().__init__(path, mode.replace("t", ""))
+        self.stall = stall
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        if self.writes % 2000 == 0:
+            time.sleep(self.stall)
+        return super().write(data)
+
+
+class StallingFileHandler(RotatingFileHandler):
+    def __init__(self, path: str, stall: float):
+        self.stall = stall
+        super().__init__(path, maxBytes=256 * 1024, backupCount=2, encoding="utf-8", delay=True)
+
+    def _open(self):
+        return io.TextIOWrapper(StallingFile(self.baseFilename, "ab", self.stall), encoding="utf-8", write_through=True)
+
+
+def direct_logger(path: str, stall: float) -> logging.Logger:
+    logger = logging.getLogger("library_api")
+    handler = StallingFileHandler(path, stall)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    logger.handlers = [handler]
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    return logger
+
+
+def queue_logger(path: str, stall: float, per_second: float):
+    config = {"LOG_FORMAT": "json", "LOG_FILE": path, "LOG_LEVEL": "INFO", "LOG_CLIENT_ERRORS_PER_SECOND": per_second}
+    logger, listener = setup_logging(config)
+    # The same stalling file, and no console output
+    handler = StallingFileHandler(path, stall)
+    handler.setFormatter(listener.handlers[0].formatter)
+    for old in listener.handlers:
+        old.close()
+    listener.handlers = (handler,)
+    return logger, listener
+
+
+async def probe(samples, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        began = timer()
+        await asyncio.sleep(0.001)
+        samples.append(max(timer() - began - 0.001, 0.0))
+
+
+async def worker(logger: logging.Logger, stop: asyncio.Event, counter) -> None:
+    while not stop.is_set():
+        counter[0] += 1
+        if counter[0] % 50 == 0:
+            try:
+                raise RuntimeError("database is locked")
+            except RuntimeError as e:
+                logger.error(f"Internal server error: {e}", exc_info=True,
+                             extra={"status": 500, "method": "GET", "path": "/api/books/1"})
+        else:
+            logger.warning(f"Not found: Book with id {counter[0]} not found",
+                           extra={"status": 404, "method": "GET", "path": f"/api/books/{counter[0]}"})
+        await asyncio.sleep(0)
+
+
+async def measure(logger: logging.Logger, args):
+    stop = asyncio.Event()
+    samples, counter = [], [0]
+    tasks = [asyncio.create_task(probe(samples, stop))]
+    tasks += [asyncio.create_task(worker(logger, stop, counter)) for _ in range(args.workers)]
+    await asyncio.sleep(args.seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return samples, counter[0]
+
+
+async def run(args) -> None:
+    directory = tempfile.mkdtemp()
+    stall = args.stall_ms / 1000
+    results = []
+    for mode in ("none", "direct", "queue", "queue_sampled"):
+        path = os.path.join(directory, f"{mode}.log")
+        listener = None
+        if mode == "none":
+            logger = direct_logger(path, stall)
+            logger.setLevel(logging.CRITICAL)
+        elif mode == "direct":
+            logger = direct_logger(path, stall)
+        else:
+            logger, listener = queue_logger(path, stall, 10 if mode == "queue_sampled" else 0)
+
+        samples, records = await measure(logger, args)
+        began = timer()
+        if listener is not None:
+            stop_logging(listener)
+        else:
+            for handler in logger.handlers:
+                handler.close()
+        results.append({
+            "pipeline": mode,
+            "records": records,
+            "records_per_second": round(records / args.seconds),
+            **{f"lag_{key}": value for key, value in percentiles(samples).items()},
+            "lag_max_ms": round(max(samples) * 1000, 3),
+            "drain_seconds": round(timer() - began, 3),
+        })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--workers", type=int, default=50)
+    parser.add_argument("--stall-ms", type=float, default=50.0)
+    asyncio.run(run(parser.parse_args()))
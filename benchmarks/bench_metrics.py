@@ -0,0 +1,146 @@
+"""Cost of the metrics middleware on the hot path.
+
+    python benchmarks/bench_metrics.py [--books 10000] [--rounds 30] [--requests 500]
+
+Two apps share one catalog, one with the metrics middleware and one
+without. Each round sends the same GET /api/books/{id} (served from the
+book cache) or GET /api/books/search requests to both, in random order;
+`overhead_percent` is the median of the per-round time ratios. Two
+servers in one process differ by a few percent even with the same code,
+so these figures are not the gate. The gate times the middleware in
+process around a stub handler, with and without it, over many calls
+and takes the fastest of the rounds: `within_budget` holds when that
+cost stays under 2% of a fixed per-request baseline (REQUEST_SECONDS),
+and the script exits with status 1 when it does not.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+
+from common import create_catalog, timer
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer, make_mocked_request
+
+from models.database import init_db
+from routes.books import setup_routes as setup_book_routes
+from routes.stats import setup_routes as setup_stats_routes
+from services.cache import BookCache
+from utils.config import load_config
+from utils.metrics import Metrics, metrics_middleware
+
+# The middleware may cost 2% of the cheapest request the app serves. A
+# cached GET /api/books/{id} takes 0.35-0.4 ms through the test client;
+# the baseline is fixed below that so that the gate does not move with
+# server noise and still holds on faster machines
+BUDGET = 0.02
+REQUEST_SECONDS = 0.00025
+
+
+async def make_app(path: str, metrics: bool) -> web.Application:
+    app = web.Application()
+    app["logger"] = logging.getLogger("bench_metrics")
+    app["config"] = {**load_config(), "DB_PATH": path}
+    if metrics:
+        app["metrics"] = Metrics()
+        app.middlewares.append(metrics_middleware(app["metrics"]))
+    await init_db(app, app["config"])
+    app["book_cache"] = BookCache()
+    setup_book_routes(app)
+    setup_stats_routes(app)
+    return app
+
+
+async def middleware_cost(app: web.Application, url: str, rounds: int = 20, calls: int = 5000) -> float:
+    # Seconds the middleware adds to one request. The handler is a stub,
+    # so there is no database or handler time whose noise would swamp the
+    # few microseconds being measured
+    request = make_mocked_request("GET", url, app=app)
+    # What Application._handle does, so route_name() sees the real route
+    match_info = await app.router.resolve(request)
+    match_info.add_app(app)
+    request._match_info = match_info
+    response = web.Response()
+
+    async def stub(request: web.Request) -> web.Response:
+        return response
+
+    middleware = metrics_middleware(Metrics())
+    best = {"bare": float("inf"), "metrics": float("inf")}
+    runs = {"bare": lambda: stub(request), "metrics": lambda: middleware(request, stub)}
+    for _ in range(rounds):
+        for name, call in runs.items():
+            began = timer()
+            for _ in range(calls):
+                await call()
+            best[name] = min(best[name], (timer() - began) / calls)
+    return max(best["metrics"] - best["bare"], 0.0)
+
+
+async def run(args) -> bool:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    await create_catalog(path, args.books)
+
+    clients = {}
+    for name, metrics in (("off", False), ("on", True)):
+        clients[name] = TestClient(TestServer(await make_app(path, metrics)))
+        await clients[name].start_server()
+
+    rnd = random.Random(7)
+    ids = [rnd.randint(1, args.books) for _ in range(args.requests)]
+    scenarios = {
+        "get_book": [f"/api/books/{book_id}" for book_id in ids],
+        "search": [f"/api/books/search?title=мир&per_page=10&page={rnd.randint(1, 20)}" for _ in ids],
+    }
+
+    results = []
+    try:
+        for scenario, urls in scenarios.items():
+            for client in clients.values():
+                # Warm the book cache and the connections
+                for url in urls:
+                    await (await client.get(url)).read()
+            ratios, times = [], {name: [] for name in clients}
+            for _ in range(args.rounds):
+                order = list(clients.items())
+                rnd.shuffle(order)
+                for name, client in order:
+                    began = timer()
+                    for url in urls:
+                        await (await client.get(url)).read()
+                    times[name].append(timer() - began)
+                ratios.append(times["on"][-1] / times["off"][-1])
+            results.append({
+                "scenario": scenario,
+                "requests": len(urls) * args.rounds,
+                "off_ms": round(statistics.median(times["off"]) / len(urls) * 1000, 4),
+                "on_ms": round(statistics.median(times["on"]) / len(urls) * 1000, 4),
+                "overhead_percent": round((statistics.median(ratios) - 1) * 100, 2),
+            })
+        cost = await middleware_cost(clients["off"].app, scenarios["get_book"][0])
+    finally:
+        for client in clients.values():
+            await client.close()
+
+    within_budget = cost < BUDGET * REQUEST_SECONDS
+    print(json.dumps({
+        "scenarios": results,
+        "middleware_us": round(cost * 1e6, 3),
+        "middleware_percent": round(cost / REQUEST_SECONDS * 100, 3),
+        "within_budget": within_budget,
+    }, indent=2))
+    return within_budget
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--requests", type=int, default=500)
+    sys.exit(0 if asyncio.run(run(parser.parse_args())) else 1)
@@ -0,0 +1,69 @@
+"""Full books vs sparse fieldsets on list and search pages.
+
+    python benchmarks/bench_projection.py [--size 100k] [--requests 300] [--per-page 50]
+
+Each page is requested in full, with `view=summary` (id, title,
+copies_available) and with `fields=title,authors`. `cold` empties the
+book cache before every request, so the page is read from SQLite; `warm`
+serves it from the cache. Reports latency and response size per page.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+
+from catalog import GENRES, cached_catalog, parse_size
+from common import percentiles, timer
+from driver import LoadDriver
+
+PROJECTIONS = {"full": "", "summary": "&view=summary", "title_authors": "&fields=title,authors"}
+
+
+async def run(args, path: str) -> None:
+    books = parse_size(args.size)
+    rnd = random.Random(3)
+    pages = {
+        "list": [f"/api/books?per_page={args.per_page}&page={rnd.randint(1, 50)}" for _ in range(args.requests)],
+        "search": [
+            f"/api/books/search?per_page={args.per_page}&genre=Жанр {rnd.randint(1, GENRES)}&count=none"
+            for _ in range(args.requests)
+        ],
+    }
+    results = []
+    async with LoadDriver({"DB_PATH": path}) as driver:
+        for cache in ("cold", "warm"):
+            for kind, urls in pages.items():
+                for projection, suffix in PROJECTIONS.items():
+                    samples, sizes = [], []
+                    for url in urls:
+                        if cache == "cold":
+                            driver.app["book_cache"].clear()
+                        began = timer()
+                        async with driver.client.get(url + suffix) as response:
+                            body = await response.read()
+                        samples.append(timer() - began)
+                        sizes.append(len(body))
+                    results.append({
+                        "cache": cache,
+                        "page": kind,
+                        "projection": projection,
+                        **percentiles(samples),
+                        "bytes_per_page": round(sum(sizes) / len(sizes)),
+                    })
+    print(json.dumps({"books": books, "per_page": args.per_page, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", default="100k")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--per-page", type=int, default=50)
+    args = parser.parse_args()
+
+    source = cached_catalog(parse_size(args.size))
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    shutil.copyfile(source, path)
+    asyncio.run(run(args, path))
@@ -0,0 +1,55 @@
+"""LIKE vs FTS5 search latency on a synthetic catalog.
+
+    python benchmarks/bench_search.py [--books 1000000] [--rounds 50]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+
+from common import create_catalog, percentiles, timer
+
+import aiosqlite
+
+from models.book import BookSearchParams
+from services.search_service import SearchService
+
+QUERIES = (
+    {"title": "мир"},
+    {"title": "капитанская доч"},
+    {"author": "Автор 12"},
+    {"title": "сад", "author": "Автор 7"},
+)
+
+
+async def run(args) -> None:
+    path = args.db or os.path.join(tempfile.mkdtemp(), "bench.db")
+    if not args.db or not os.path.exists(path):
+        began = timer()
+        await create_catalog(path, args.books)
+        print(f"catalog of {args.books} books built in {timer() - began:.1f}s")
+
+    results = []
+    async with aiosqlite.connect(path) as db:
+        db.row_factory = aiosqlite.Row
+        service = SearchService(db)
+        for query in QUERIES:
+            for mode in ("like", "fts"):
+                samples = []
+                for _ in range(args.rounds):
+                    params = BookSearchParams(mode=mode, per_page=20, **query)
+                    began = timer()
+                    result = await service.search_books(params)
+                    samples.append(timer() - began)
+                results.append({"query": query, "mode": mode, "total": result["total"], **percentiles(samples)})
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=1000000)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--db", help="reuse (or create) a catalog at this path")
+    asyncio.run(run(parser.parse_args()))
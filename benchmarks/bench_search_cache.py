@@ -0,0 +1,128 @@
+"""Search result cache: popular searches and a stampede of identical ones.
+
+    python benchmarks/bench_search_cache.py [--books 100000] [--searches 2000] [--stampede 200]
+
+`popular` replays --searches searches drawn with a Zipf-like skew from a
+set of genre, year range and `available_only` filters, with a write
+(which bumps the catalog version) every --write-every searches, with and
+without the result cache. Books come from a warm book cache either way,
+so the difference is the id and count queries. `stampede` starts
+--stampede identical searches at once on a pool of readers and counts
+how many of them ran the search in the database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+
+from common import create_catalog, percentiles, timer
+
+from models.book import BookSearchParams
+from models.pool import ConnectionPool
+from services.book_service import BookService
+from services.cache import BookCache, SearchCache
+from services.search_service import SearchService
+from utils.exceptions import NotFoundError
+
+FILTERS = (
+    *({"genre": f"Жанр {i}"} for i in range(1, 41)),
+    *({"year_from": year, "year_to": year + 9} for year in range(1900, 2020, 10)),
+    *({"genre": f"Жанр {i}", "available_only": True} for i in range(1, 11)),
+    {"available_only": True, "sort_by": "year", "sort_order": "desc"},
+)
+
+
+def popular_searches(count: int, seed: int = 7):
+    # Rank r is drawn with weight 1/r: a few searches make most of the load
+    rnd = random.Random(seed)
+    weights = [1 / rank for rank in range(1, len(FILTERS) + 1)]
+    return [
+        BookSearchParams(per_page=20, page=rnd.choice((1, 1, 1, 2)), **filters)
+        for filters in rnd.choices(FILTERS, weights=weights, k=count)
+    ]
+
+
+async def search(pool: ConnectionPool, book_cache: BookCache, result_cache, params: BookSearchParams):
+    # What the search handler does: catalog version first, then the search
+    async with pool.reader() as db:
+        version, _ = await BookService(db).get_catalog_version()
+        service = SearchService(db, cache=book_cache, result_cache=result_cache)
+        return await service.search_books(params, catalog_version=version)
+
+
+async def popular(pool: ConnectionPool, args, cached: bool) -> dict:
+    book_cache = BookCache(max_entries=200000)
+    result_cache = SearchCache(max_entries=args.max_entries) if cached else None
+    searches = popular_searches(args.searches)
+    rnd = random.Random(11)
+    for params in searches[:200]:
+        await search(pool, book_cache, None, params)
+
+    samples = []
+    began = timer()
+    for number, params in enumerate(searches, 1):
+        if number % args.write_every == 0:
+            try:
+                async with pool.writer() as db:
+                    await BookService(db, book_cache).return_books([rnd.randint(1, args.books)])
+            except NotFoundError:
+                pass
+        started = timer()
+        await search(pool, book_cache, result_cache, params)
+        samples.append(timer() - started)
+    elapsed = timer() - began
+    result = {
+        "scenario": "popular",
+        "result_cache": cached,
+        "searches_per_second": round(len(searches) / elapsed),
+        **percentiles(samples),
+    }
+    if result_cache is not None:
+        stats = result_cache.stats()
+        result.update(hit_rate=stats["hit_rate"], expired=stats["expired"])
+    return result
+
+
+async def stampede(pool: ConnectionPool, args, cached: bool) -> dict:
+    result_cache = SearchCache() if cached else None
+    params = BookSearchParams(genre="Жанр 3", available_only=True, per_page=20)
+    began = timer()
+    await asyncio.gather(*(search(pool, BookCache(), result_cache, params) for _ in range(args.stampede)))
+    return {
+        "scenario": "stampede",
+        "result_cache": cached,
+        "requests": args.stampede,
+        # Without the cache every request runs the search
+        "database_runs": result_cache.misses if cached else args.stampede,
+        "coalesced": result_cache.coalesced if cached else 0,
+        "seconds": round(timer() - began, 3),
+    }
+
+
+async def run(args) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    await create_catalog(path, args.books)
+    pool = ConnectionPool(path, readers=4)
+    await pool.open()
+    await pool.open_readers()
+    try:
+        results = []
+        for cached in (False, True):
+            results.append(await popular(pool, args, cached))
+        for cached in (False, True):
+            results.append(await stampede(pool, args, cached))
+    finally:
+        await pool.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--searches", type=int, default=2000)
+    parser.add_argument("--write-every", type=int, default=200)
+    parser.add_argument("--max-entries", type=int, default=1000)
+    parser.add_argument("--stampede", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
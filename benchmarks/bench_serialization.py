@@ -0,0 +1,127 @@
+"""CPU cost of turning database rows into a JSON response body.
+
+    python benchmarks/bench_serialization.py [--rounds 200]
+
+Each result is one way of building the books (validated models with model
+instances or plain dicts for authors/genres, model_construct, or plain
+dicts without models) combined with one way of encoding them (the former
+.dict() + json.dumps, or an encoder from utils.serialization).
+"""
+import argparse
+import json
+import random
+from datetime import datetime
+
+from common import WORDS, percentiles, timer
+
+from models.book import Author, BookResponse, Genre
+from utils import serialization
+
+PAGE_SIZES = (10, 100, 1000)
+
+
+def make_rows(count: int, seed: int = 42):
+    rnd = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "title": " ".join(rnd.choices(WORDS, k=rnd.randint(1, 4))).capitalize(),
+            "authors": [(rnd.randint(1, 1000), f"Автор {rnd.randint(1, 1000)}") for _ in range(rnd.randint(1, 3))],
+            "genres": [(rnd.randint(1, 40), f"Жанр {rnd.randint(1, 40)}") for _ in range(rnd.randint(1, 2))],
+            "publication_year": rnd.randint(1800, 2024),
+            "isbn": f"978-{i:09d}",
+            "copies_available": rnd.randint(0, 5),
+            "is_active": 1,
+            "created_at": "2024-01-02 03:04:05.678",
+            "updated_at": "2024-01-02 03:04:05.678",
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def validated(rows):
+    # The former hydration: nested models built one by one
+    return [
+        BookResponse(**{**row, "authors": [Author(id=i, name=n) for i, n in row["authors"]],
+                        "genres": [Genre(id=i, name=n) for i, n in row["genres"]]})
+        for row in rows
+    ]
+
+
+def validated_nested_dicts(rows):
+    # BookService._load_books: pydantic-core builds the nested models
+    return [
+        BookResponse(**{**row, "authors": [{"id": i, "name": n} for i, n in row["authors"]],
+                        "genres": [{"id": i, "name": n} for i, n in row["genres"]]})
+        for row in rows
+    ]
+
+
+def _converted(row):
+    return {**row, "is_active": bool(row["is_active"]),
+            "created_at": datetime.fromisoformat(row["created_at"]),
+            "updated_at": datetime.fromisoformat(row["updated_at"])}
+
+
+def constructed(rows):
+    # Skips validation, but model_construct() runs in Python
+    return [
+        BookResponse.model_construct(**{**_converted(row),
+            "authors": [Author.model_construct(id=i, name=n) for i, n in row["authors"]],
+            "genres": [Genre.model_construct(id=i, name=n) for i, n in row["genres"]]})
+        for row in rows
+    ]
+
+
+def plain(rows):
+    # Row -> dict, no models at all
+    return [
+        {**_converted(row), "authors": [{"id": i, "name": n} for i, n in row["authors"]],
+         "genres": [{"id": i, "name": n} for i, n in row["genres"]]}
+        for row in rows
+    ]
+
+
+def dict_json(books) -> bytes:
+    # The former encoding
+    return json.dumps([book.dict() for book in books]).encode("utf-8")
+
+
+BUILDS = {
+    "validated": validated,
+    "validated_nested_dicts": validated_nested_dicts,
+    "constructed": constructed,
+    "plain": plain,
+}
+
+
+def run(args) -> None:
+    results = []
+    for per_page in PAGE_SIZES:
+        rows = make_rows(per_page)
+        expected = json.loads(dict_json(validated(rows)))
+        combinations = [("validated", "dict_json")] + [
+            (build, encoder) for build in BUILDS for encoder in serialization.ENCODERS
+        ]
+        for build, encoder in combinations:
+            if encoder == "dict_json":
+                encode = dict_json
+            else:
+                serialization.set_encoder(encoder)
+                encode = serialization.dumps
+            assert json.loads(encode(BUILDS[build](rows))) == expected
+
+            samples = []
+            for _ in range(args.rounds):
+                began = timer()
+                encode(BUILDS[build](rows))
+                samples.append(timer() - began)
+            results.append({"build": build, "encoder": encoder, "books": per_page, **percentiles(samples)})
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    run(parser.parse_args())
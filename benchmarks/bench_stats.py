@@ -0,0 +1,74 @@
+"""Stats endpoints: GROUP BY over the link tables vs materialized counters.
+
+    python benchmarks/bench_stats.py [--books 200000] [--authors 20000] [--rounds 20]
+
+Both sides count active books only.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+
+from common import create_catalog, percentiles, timer
+
+import aiosqlite
+
+from services.search_service import SearchService
+
+GROUP_BY_SQL = {
+    "genres": """
+        SELECT g.name, COUNT(b.id) as count
+        FROM genres g
+        LEFT JOIN book_genres bg ON g.id = bg.genre_id
+        LEFT JOIN books b ON bg.book_id = b.id AND b.is_active = TRUE
+        GROUP BY g.name
+        ORDER BY count DESC
+    """,
+    "authors": """
+        SELECT a.name, COUNT(b.id) as count
+        FROM authors a
+        LEFT JOIN book_authors ba ON a.id = ba.author_id
+        LEFT JOIN books b ON ba.book_id = b.id AND b.is_active = TRUE
+        GROUP BY a.name
+        ORDER BY count DESC
+    """,
+}
+
+
+async def group_by(db: aiosqlite.Connection, name: str):
+    async with db.execute(GROUP_BY_SQL[name]) as cursor:
+        return {row["name"]: row["count"] for row in await cursor.fetchall()}
+
+
+async def counters(db: aiosqlite.Connection, name: str):
+    service = SearchService(db)
+    return await (service.get_genre_stats() if name == "genres" else service.get_author_stats())
+
+
+async def run(args) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    await create_catalog(path, args.books, authors=args.authors)
+
+    results = []
+    async with aiosqlite.connect(path) as db:
+        db.row_factory = aiosqlite.Row
+        for name in ("genres", "authors"):
+            assert await group_by(db, name) == await counters(db, name)
+            for strategy_name, strategy in (("group_by", group_by), ("counters", counters)):
+                samples = []
+                for _ in range(args.rounds):
+                    began = timer()
+                    await strategy(db, name)
+                    samples.append(timer() - began)
+                results.append({"stats": name, "strategy": strategy_name, **percentiles(samples)})
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=200000)
+    parser.add_argument("--authors", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,110 @@
+"""Typeahead: /api/suggest against a title search per keystroke.
+
+    python benchmarks/bench_suggest.py [--size 100k] [--words 50]
+
+Types --words random titles and author names a letter at a time and
+sends every prefix of two letters or more as GET /api/suggest?q= and as
+GET /api/books/search?title= (what the search box did before). Reports
+the index build time and memory, the lookup alone (in process, no HTTP)
+and both endpoints end to end, and POST /api/books with and without the
+index to update.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import tracemalloc
+
+from catalog import FIRST_NAMES, LAST_NAMES, cached_catalog, parse_size
+from common import WORDS, percentiles, timer
+from driver import LoadDriver
+
+import aiosqlite
+
+from services.suggest_service import SuggestIndex
+
+
+def keystrokes(rnd: random.Random, count: int):
+    # Every prefix of two letters or more, as typed
+    texts = []
+    for _ in range(count):
+        if rnd.random() < 0.5:
+            texts.append(" ".join(rnd.choices(WORDS, k=rnd.randint(1, 3))).capitalize())
+        else:
+            texts.append(f"{rnd.choice(LAST_NAMES)} {rnd.choice(FIRST_NAMES)}")
+    return [text[:end] for text in texts for end in range(2, len(text) + 1)]
+
+
+async def index_memory(path: str) -> float:
+    # Separate build: tracemalloc slows it down several times
+    async with aiosqlite.connect(path) as db:
+        tracemalloc.start()
+        index = SuggestIndex()
+        await index.build(db)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    return round(size / 1024 / 1024, 1)
+
+
+async def create_books(driver: LoadDriver, first: int):
+    samples = []
+    rnd = random.Random(12)
+    for i in range(first, first + 200):
+        book = {
+            "title": f"{rnd.choice(WORDS).capitalize()} {i}",
+            "authors": [f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)} {i}"],
+            "genres": ["Жанр 1"],
+            "publication_year": 2000,
+        }
+        began = timer()
+        await driver.request(("POST", "/api/books", book))
+        samples.append(timer() - began)
+    return percentiles(samples)
+
+
+async def run(args, path: str) -> None:
+    books = parse_size(args.size)
+    queries = keystrokes(random.Random(11), args.words)
+    results = {"books": books, "keystrokes": len(queries), "index_mb": await index_memory(path)}
+
+    async with LoadDriver({"DB_PATH": path}) as driver:
+        index = driver.app["suggest_index"]
+        results["index"] = index.stats()
+
+        samples = []
+        for query in queries:
+            began = timer()
+            index.suggest(query)
+            samples.append(timer() - began)
+        results["lookup_in_process"] = percentiles(samples)
+
+        for name, url in (("suggest", "/api/suggest?limit=10&q="), ("search_title", "/api/books/search?per_page=10&title=")):
+            samples = []
+            for query in queries:
+                began = timer()
+                status = await driver.request(("GET", url + query))
+                samples.append(timer() - began)
+                assert status == 200, status
+            results[name] = percentiles(samples)
+
+        results["create_book"] = await create_books(driver, books)
+
+    # The same writes without the index to keep in step
+    async with LoadDriver({"DB_PATH": path, "SUGGEST": "false"}) as driver:
+        results["create_book_without_index"] = await create_books(driver, books + 1000)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", default="100k")
+    parser.add_argument("--words", type=int, default=50)
+    args = parser.parse_args()
+
+    source = cached_catalog(parse_size(args.size))
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    shutil.copyfile(source, path)
+    asyncio.run(run(args, path))
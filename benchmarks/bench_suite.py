@@ -0,0 +1,181 @@
+"""Scenario suite: throughput and latency of every API path, as JSON.
+
+    python benchmarks/bench_suite.py [--size 100k] [--seconds 5] [--concurrency 16]
+        [--only get_book,search_genre] [--set SEARCH_CACHE_MAX_ENTRIES=0]
+        [--out results.json] [--compare previous.json]
+
+Runs each scenario against the whole application (benchmarks/driver.py)
+on a catalog from benchmarks/catalog.py. The catalog is copied first, so
+the write scenarios never touch the cached one; they run last. --set
+passes configuration to the app, e.g. to measure with a cache off.
+With --compare, each scenario also gets its throughput ratio and p99
+change against an earlier result file, e.g. one from the previous commit.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+from typing import Any, Callable, Dict
+
+from catalog import FIRST_NAMES, GENRES, LAST_NAMES, author_name, cached_catalog, parse_size, shape, zipf_weights
+from common import WORDS
+from driver import LoadDriver
+
+
+def hot_ids(books: int):
+    # Zipf-popular books, scattered over the id range
+    weights = zipf_weights(books, 1.0, 10)
+    ranks = range(books)
+    step = 7919 if books % 7919 else 7907
+
+    def pick(rnd) -> int:
+        return (rnd.choices(ranks, cum_weights=weights)[0] * step) % books + 1
+
+    return pick
+
+
+def scenarios(books: int) -> Dict[str, Callable]:
+    hot = hot_ids(books)
+    authors = shape(books)["authors"]
+    per_page = 20
+    last_page = max(1, books // per_page)
+    writes = itertools.count()
+
+    def get_book(rnd):
+        return "GET", f"/api/books/{hot(rnd)}"
+
+    def get_book_cold(rnd):
+        return "GET", f"/api/books/{rnd.randint(1, books)}"
+
+    def list_shallow(rnd):
+        return "GET", f"/api/books?page={rnd.randint(1, 3)}&per_page={per_page}"
+
+    def list_deep(rnd):
+        return "GET", f"/api/books?page={rnd.randint(last_page // 2, last_page)}&per_page={per_page}"
+
+    def search(query: Callable) -> Callable:
+        return lambda rnd: ("GET", f"/api/books/search?per_page={per_page}&{query(rnd)}")
+
+    def mixed(rnd):
+        # 80% reads, 20% writes, like a busy library desk
+        roll = rnd.random()
+        if roll < 0.45:
+            return get_book(rnd)
+        if roll < 0.65:
+            return suite["search_genre"](rnd)
+        if roll < 0.8:
+            return list_shallow(rnd)
+        if roll < 0.9:
+            action = "checkout" if next(writes) % 2 else "return"
+            return "POST", f"/api/books/{hot(rnd)}/{action}"
+        if roll < 0.95:
+            return "PUT", f"/api/books/{hot(rnd)}", {"title": " ".join(rnd.choices(WORDS, k=3)).capitalize()}
+        return "POST", "/api/books", {
+            "title": " ".join(rnd.choices(WORDS, k=2)).capitalize(),
+            "authors": [author_name(rnd.randint(1, authors))],
+            "genres": [f"Жанр {rnd.randint(1, GENRES)}"],
+            "publication_year": rnd.randint(1950, 2024),
+        }
+
+    suite = {
+        "get_book": get_book,
+        "get_book_cold": get_book_cold,
+        "list_shallow": list_shallow,
+        "list_deep": list_deep,
+        "search_title": search(lambda rnd: f"title={rnd.choice(WORDS)}"),
+        "search_title_fts": search(lambda rnd: f"mode=fts&title={rnd.choice(WORDS)[:4]}"),
+        "search_author": search(lambda rnd: f"author={rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"),
+        "search_genre": search(lambda rnd: f"genre=Жанр {rnd.randint(1, GENRES)}"),
+        "search_years": search(lambda rnd: f"year_from={(year := rnd.randint(1900, 2020))}&year_to={year + 4}"),
+        "search_isbn": search(lambda rnd: f"isbn=978-{rnd.randint(1, books):09d}"),
+        "search_available": search(lambda rnd: "available_only=true&sort_by=year&sort_order=desc"),
+        "search_sorted_by_author": search(lambda rnd: f"genre=Жанр {rnd.randint(1, GENRES)}&sort_by=author"),
+        "stats_genres": lambda rnd: ("GET", "/api/stats/genres"),
+        "stats_authors": lambda rnd: ("GET", f"/api/stats/authors?offset={rnd.randint(0, authors // 2)}"),
+        "mixed": mixed,
+    }
+    return suite
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    before = {entry["scenario"]: entry for entry in previous["scenarios"]}
+    for entry in results["scenarios"]:
+        old = before.get(entry["scenario"])
+        if old is None or not old.get("requests_per_second") or "p99_ms" not in entry:
+            continue
+        entry["vs_previous"] = {
+            "revision": previous.get("revision"),
+            "throughput_ratio": round(entry["requests_per_second"] / old["requests_per_second"], 3),
+            "p99_change_ms": round(entry["p99_ms"] - old["p99_ms"], 3),
+        }
+
+
+async def run(args, path: str) -> None:
+    books = parse_size(args.size)
+    suite = scenarios(books)
+    names = args.only.split(",") if args.only else list(suite)
+    unknown = [name for name in names if name not in suite]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}")
+    # Writes last, so the read scenarios see the catalog as generated
+    names.sort(key=lambda name: name == "mixed")
+
+    settings = {"DB_PATH": path, **dict(item.split("=", 1) for item in args.set)}
+    results = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "catalog": {**shape(books), "seed": args.seed},
+        "settings": {key: value for key, value in settings.items() if key != "DB_PATH"},
+        "seconds": args.seconds,
+        "concurrency": args.concurrency,
+        "scenarios": [],
+    }
+    async with LoadDriver(settings) as driver:
+        for name in names:
+            report = await driver.run(suite[name], seconds=args.seconds, concurrency=args.concurrency)
+            results["scenarios"].append({"scenario": name, **report})
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", default="100k", help="10k, 100k, 1m or a number of books")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache-dir", help="where generated catalogs are kept")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--only", help="comma-separated scenario names")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="app configuration")
+    parser.add_argument("--out", help="also write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run")
+    args = parser.parse_args()
+
+    # Built (or found) before the event loop starts: the generator runs its own
+    source = cached_catalog(parse_size(args.size), args.seed, args.cache_dir)
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    shutil.copyfile(source, path)
+    asyncio.run(run(args, path))
@@ -0,0 +1,137 @@
+"""Throughput of the server with 1, 2, 4... worker processes.
+
+    python benchmarks/bench_workers.py [--books 20000] [--workers 1,2,4] [--seconds 5] [--clients 4]
+
+Starts `src/main.py` with WORKERS=n on a synthetic catalog and loads it
+from --clients client processes, each keeping --concurrency requests in
+flight: GET /api/books/{id} over random ids (the book cache path) and
+GET /api/books/search?q=... (SQL on every request). Clients take CPU
+too, so the numbers only mean something when the machine has more cores
+than workers + clients; `cpus` is reported next to them.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import SRC_DIR, WORDS, create_catalog, percentiles, timer
+
+import aiohttp
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(path: str, port: int, workers: int, directory: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DB_PATH": path,
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "WORKERS": str(workers),
+        "LOG_FILE": os.path.join(directory, f"workers{workers}.log"),
+        "LOG_LEVEL": "WARNING",
+    }
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(SRC_DIR, "main.py")],
+        cwd=SRC_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"Server with {workers} workers did not start")
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=40)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+async def load(base: str, scenario: str, books: int, seconds: float, concurrency: int, seed: int):
+    rnd = random.Random(seed)
+    latencies = []
+    # A connection per in-flight request, so SO_REUSEPORT spreads them
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        deadline = time.monotonic() + seconds
+
+        async def client():
+            while time.monotonic() < deadline:
+                if scenario == "get_book":
+                    url = f"{base}/api/books/{rnd.randint(1, books)}"
+                else:
+                    url = f"{base}/api/books/search?q={rnd.choice(WORDS)}&per_page=20"
+                began = timer()
+                async with session.get(url) as response:
+                    await response.read()
+                latencies.append(timer() - began)
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies
+
+
+def client_process(args: tuple) -> list:
+    return asyncio.run(load(*args))
+
+
+def measure(pool, base: str, scenario: str, args) -> dict:
+    jobs = [(base, scenario, args.books, args.seconds, args.concurrency, seed) for seed in range(args.clients)]
+    latencies = [sample for samples in pool.map(client_process, jobs) for sample in samples]
+    return {
+        "requests_per_second": round(len(latencies) / args.seconds),
+        **percentiles(latencies),
+    }
+
+
+def run(args) -> None:
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "bench.db")
+    asyncio.run(create_catalog(path, args.books))
+
+    results = []
+    with multiprocessing.Pool(args.clients) as pool:
+        for workers in (int(value) for value in args.workers.split(",")):
+            port = free_port()
+            server = start_server(path, port, workers, directory)
+            base = f"http://127.0.0.1:{port}"
+            try:
+                # Warm the caches of every worker before measuring
+                measure(pool, base, "get_book", argparse.Namespace(**{**vars(args), "seconds": 1.0}))
+                for scenario in ("get_book", "search"):
+                    results.append({"workers": workers, "scenario": scenario, **measure(pool, base, scenario, args)})
+            finally:
+                stop_server(server)
+
+    baseline = {result["scenario"]: result["requests_per_second"] for result in results if result["workers"] == results[0]["workers"]}
+    for result in results:
+        result["speedup"] = round(result["requests_per_second"] / max(baseline[result["scenario"]], 1), 2)
+    print(json.dumps({"cpus": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=16)
+    run(parser.parse_args())
@@ -0,0 +1,190 @@
+"""Deterministic synthetic catalogs with a realistic shape.
+
+    python benchmarks/catalog.py --size 100k [--seed 42] [--out catalog.db]
+
+Unlike common.create_catalog, which spreads books evenly, the shape
+follows a real library: a few prolific authors and popular genres own
+most of the books (Zipf-like ranks), most books have one author and one
+genre, publication years lean towards recent decades, some books have
+no copies left and a few are withdrawn. The same size and seed always
+give the same database; built catalogs are kept in --cache-dir and
+reused.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+from typing import Any, Dict, List
+
+from common import WORDS, timer
+
+import aiosqlite
+
+from models.migrations import SORT_AUTHOR_SQL, migrate, rebuild_search_index, rebuild_stats, refresh_statistics
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# Bump when the shape changes, so cached catalogs are rebuilt
+SHAPE_VERSION = 1
+
+GENRES = 60
+# Popularity of rank r is 1 / (r + offset) ** skew: with these the top
+# author has under 1% of the books and the top genre about 15%
+AUTHOR_SKEW, AUTHOR_OFFSET = 1.0, 20
+GENRE_SKEW, GENRE_OFFSET = 1.0, 2
+
+FIRST_NAMES = (
+    "Анна", "Борис", "Вера", "Григорий", "Дарья", "Евгений", "Жанна", "Иван", "Ксения", "Лев",
+    "Мария", "Николай", "Ольга", "Пётр", "Раиса", "Сергей", "Татьяна", "Фёдор", "Юлия", "Яков",
+)
+LAST_NAMES = (
+    "Иванов", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов", "Новиков", "Морозов",
+    "Волков", "Алексеев", "Фролов", "Семёнов", "Егоров", "Павлов", "Степанов", "Николаев", "Орлов",
+    "Андреев", "Макаров", "Зайцев", "Соловьёв", "Борисов", "Яковлев", "Григорьев", "Романов",
+)
+
+
+def shape(books: int) -> Dict[str, Any]:
+    # One author per four books, as in a large public library
+    return {"books": books, "authors": max(100, books // 4), "genres": GENRES, "version": SHAPE_VERSION}
+
+
+def zipf_weights(count: int, skew: float, offset: float = 0) -> List[float]:
+    # Cumulative weights of ranks 1..count, for random.choices(cum_weights=)
+    return list(itertools.accumulate(1 / (rank + offset) ** skew for rank in range(1, count + 1)))
+
+
+def author_name(index: int) -> str:
+    first = FIRST_NAMES[index % len(FIRST_NAMES)]
+    last = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    # The number keeps names unique and lets benchmarks pick an author
+    return f"{first} {last} {index}"
+
+
+def publication_year(rnd: random.Random) -> int:
+    # Recent decades are far more common than the 19th century
+    return max(1800, 2024 - int(rnd.expovariate(1 / 25)))
+
+
+def generate(path: str, books: int, seed: int = 42) -> Dict[str, Any]:
+    params = shape(books)
+    if os.path.exists(path):
+        os.remove(path)
+
+    async def create_schema():
+        async with aiosqlite.connect(path) as db:
+            await migrate(db)
+
+    asyncio.run(create_schema())
+
+    rnd = random.Random(seed)
+    authors = list(range(1, params["authors"] + 1))
+    genres = list(range(1, params["genres"] + 1))
+    author_weights = zipf_weights(len(authors), AUTHOR_SKEW, AUTHOR_OFFSET)
+    genre_weights = zipf_weights(len(genres), GENRE_SKEW, GENRE_OFFSET)
+    # Popularity rank is not id order, or id ranges would be hot spots
+    rnd.shuffle(authors)
+    rnd.shuffle(genres)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executemany(
+        "INSERT INTO authors (id, name) VALUES (?, ?)",
+        ((i, author_name(i)) for i in range(1, params["authors"] + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO genres (id, name) VALUES (?, ?)",
+        ((i, f"Жанр {i}") for i in range(1, params["genres"] + 1)),
+    )
+
+    book_rows, author_links, genre_links = [], [], []
+    for i in range(1, books + 1):
+        book_rows.append((
+            i,
+            " ".join(rnd.choices(WORDS, k=rnd.randint(1, 4))).capitalize(),
+            publication_year(rnd),
+            f"978-{i:09d}",
+            0 if rnd.random() < 0.15 else rnd.choice((1, 1, 1, 2, 2, 3, 5, 10)),
+            rnd.random() > 0.03,
+        ))
+        # 85% of books have one author, 12% two, 3% three
+        count = 1 if rnd.random() < 0.85 else (2 if rnd.random() < 0.8 else 3)
+        author_links.extend((i, a) for a in set(rnd.choices(authors, cum_weights=author_weights, k=count)))
+        count = rnd.choices((1, 2, 3), weights=(60, 30, 10))[0]
+        genre_links.extend((i, g) for g in set(rnd.choices(genres, cum_weights=genre_weights, k=count)))
+
+        if len(book_rows) == 50000 or i == books:
+            conn.executemany(
+                """
+                INSERT INTO books (id, title, publication_year, isbn, copies_available, is_active)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                book_rows,
+            )
+            conn.executemany("INSERT INTO book_authors (book_id, author_id) VALUES (?, ?)", author_links)
+            conn.executemany("INSERT INTO book_genres (book_id, genre_id) VALUES (?, ?)", genre_links)
+            book_rows, author_links, genre_links = [], [], []
+
+    # Derived columns the services maintain on every write
+    conn.execute(f"UPDATE books SET sort_author = {SORT_AUTHOR_SQL}")
+    conn.commit()
+    conn.close()
+
+    async def derive():
+        async with aiosqlite.connect(path) as db:
+            await rebuild_search_index(db)
+            await rebuild_stats(db)
+            await db.commit()
+            await refresh_statistics(db)
+
+    asyncio.run(derive())
+    return {**params, "seed": seed}
+
+
+def cached_catalog(books: int, seed: int = 42, cache_dir: str = None) -> str:
+    # Path of a built catalog of this size and seed, building it if needed;
+    # copy it before writing to it
+    cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "library_api_catalogs")
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"catalog-{books}-{seed}.db")
+    meta_path = path + ".json"
+    expected = {**shape(books), "seed": seed}
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f) == expected:
+                return path
+
+    building = path + ".building"
+    generate(building, books, seed)
+    shutil.move(building, path)
+    with open(meta_path, "w") as f:
+        json.dump(expected, f)
+    return path
+
+
+def parse_size(size: str) -> int:
+    return SIZES[size.lower()] if size.lower() in SIZES else int(size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", default="10k", help="10k, 100k, 1m or a number of books")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="write here instead of the catalog cache")
+    parser.add_argument("--cache-dir")
+    args = parser.parse_args()
+
+    books = parse_size(args.size)
+    began = timer()
+    if args.out:
+        info = generate(args.out, books, args.seed)
+        path = args.out
+    else:
+        path = cached_catalog(books, args.seed, args.cache_dir)
+        info = {**shape(books), "seed": args.seed}
+    print(json.dumps({"path": path, **info, "seconds": round(timer() - began, 1)}, indent=2))
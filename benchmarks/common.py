@@ -0,0 +1,89 @@
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+import aiosqlite
+
+from models.migrations import migrate, rebuild_search_index, rebuild_stats, refresh_statistics
+
+WORDS = (
+    "война", "мир", "преступление", "наказание", "идиот", "бесы", "отцы", "дети",
+    "мёртвые", "души", "герой", "нашего", "времени", "мастер", "маргарита", "тихий",
+    "дон", "белая", "гвардия", "собачье", "сердце", "остров", "сокровищ", "дом",
+    "море", "ночь", "звёзды", "дорога", "город", "сад", "вишнёвый", "лес", "зима",
+    "лето", "старик", "капитанская", "дочка", "пиковая", "дама", "анна", "каренина",
+)
+
+
+async def create_catalog(path: str, books: int, authors: int = 1000, genres: int = 40, seed: int = 42) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+    async with aiosqlite.connect(path) as db:
+        await migrate(db)
+
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO authors (id, name) VALUES (?, ?)",
+        ((i, f"Автор {i}") for i in range(1, authors + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO genres (id, name) VALUES (?, ?)",
+        ((i, f"Жанр {i}") for i in range(1, genres + 1)),
+    )
+    conn.executemany(
+        """
+        INSERT INTO books (id, title, publication_year, isbn, copies_available, is_active)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (
+            (i, " ".join(rnd.choices(WORDS, k=rnd.randint(1, 4))).capitalize(), rnd.randint(1800, 2024),
+             f"978-{i:09d}", rnd.randint(0, 5), rnd.random() > 0.05)
+            for i in range(1, books + 1)
+        ),
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO book_authors (book_id, author_id) VALUES (?, ?)",
+        ((i, rnd.randint(1, authors)) for i in range(1, books + 1) for _ in range(rnd.randint(1, 3))),
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO book_genres (book_id, genre_id) VALUES (?, ?)",
+        ((i, rnd.randint(1, genres)) for i in range(1, books + 1) for _ in range(rnd.randint(1, 2))),
+    )
+    conn.commit()
+    conn.close()
+
+    async with aiosqlite.connect(path) as db:
+        await rebuild_search_index(db)
+        await rebuild_stats(db)
+        await db.commit()
+        await refresh_statistics(db)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, statement: str) -> None:
+        self.count += 1
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+    }
+
+
+def timer() -> float:
+    return time.perf_counter()
@@ -0,0 +1,117 @@
+"""In-process load driver for the whole application.
+
+The app from main.create_app() runs in an aiohttp.test_utils TestServer
+on a loopback port of this process, so requests go through the real
+middlewares, routes and pool, and nothing leaves the machine.
+
+    async with LoadDriver({"DB_PATH": path}) as driver:
+        report = await driver.run(scenario, seconds=5, concurrency=16)
+
+A scenario is a function of a random.Random returning the next request
+as (method, url) or (method, url, json body).
+"""
+import asyncio
+import os
+import random
+import tempfile
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from common import timer
+
+from aiohttp.test_utils import TestClient, TestServer
+
+Request = Tuple[Any, ...]
+Scenario = Callable[[random.Random], Request]
+
+
+def summarize(latencies: List[float], seconds: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+
+    def at(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 3)
+
+    return {
+        "requests": len(ordered),
+        "requests_per_second": round(len(ordered) / seconds, 1),
+        "p50_ms": at(0.5),
+        "p90_ms": at(0.9),
+        "p99_ms": at(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+class LoadDriver:
+    """Starts the application with `settings` on top of the environment
+    and sends it scenario requests from concurrent client tasks."""
+
+    def __init__(self, settings: Dict[str, Any]):
+        self.settings = {
+            # Only warnings, into a scratch file: logging is not what is measured
+            "LOG_LEVEL": "WARNING",
+            "LOG_FILE": os.path.join(tempfile.mkdtemp(), "bench.log"),
+            **{key: str(value) for key, value in settings.items()},
+        }
+        self.client: Optional[TestClient] = None
+        self._saved_environ: Dict[str, Optional[str]] = {}
+
+    async def __aenter__(self) -> "LoadDriver":
+        # create_app() reads its configuration from the environment
+        from main import create_app
+
+        self._saved_environ = {key: os.environ.get(key) for key in self.settings}
+        os.environ.update(self.settings)
+        self.client = TestClient(TestServer(await create_app()))
+        await self.client.start_server()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.client.close()
+        for key, value in self._saved_environ.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    @property
+    def app(self):
+        return self.client.server.app
+
+    async def request(self, request: Request) -> int:
+        method, url, *body = request
+        async with self.client.request(method, url, json=body[0] if body else None) as response:
+            await response.read()
+            return response.status
+
+    async def run(
+        self,
+        scenario: Scenario,
+        seconds: float = 5.0,
+        concurrency: int = 16,
+        seed: int = 1,
+        warmup: float = 0.5,
+    ) -> Dict[str, Any]:
+        # Requests of the warmup are sent but not counted
+        latencies: List[float] = []
+        statuses: Dict[int, int] = {}
+        began = timer()
+        measure_from = began + warmup
+        deadline = measure_from + seconds
+
+        async def client(rnd: random.Random) -> None:
+            while True:
+                request = scenario(rnd)
+                started = timer()
+                if started >= deadline:
+                    return
+                status = await self.request(request)
+                if started >= measure_from:
+                    latencies.append(timer() - started)
+                    statuses[status] = statuses.get(status, 0) + 1
+
+        await asyncio.gather(*(client(random.Random(seed * 1000 + i)) for i in range(concurrency)))
+        report = summarize(latencies, timer() - measure_from) if latencies else {"requests": 0}
+        report["statuses"] = {str(status): count for status, count in sorted(statuses.items())}
+        # Scenarios may hit withdrawn books (404) or empty shelves (409)
+        report["client_errors"] = sum(count for status, count in statuses.items() if 400 <= status < 500)
+        report["server_errors"] = sum(count for status, count in statuses.items() if status >= 500)
+        return report
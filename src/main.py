@@ -1,43 +1,92 @@
-import logging
-from logging.handlers import RotatingFileHandler
-import sys
+import asyncio
+import os
+import socket
+from typing import Any, Dict, Optional
 import aiohttp.web
 from aiohttp_swagger import setup_swagger
 from utils.config import load_config
-from models.database import init_db
+from utils.log import setup_logging, setup_master_logging, stop_logging
+from models.database import init_db, prepare_database
+from services.cache import BookCache, SearchCache
+from services.group_commit import GroupCommitter
+from services.suggest_service import SuggestIndex
+from utils.metrics import Metrics, metrics_middleware
+from utils.profiling import profile_middleware
+from utils.workers import Supervisor, bind_socket, reuse_port_supported, worker_log_file
+from utils.serialization import set_encoder
 from routes.books import setup_routes as setup_book_routes
 from routes.stats import setup_routes as setup_stats_routes
+from routes.suggest import setup_routes as setup_suggest_routes
 
-def setup_logging():
-    logger = logging.getLogger('library_api')
-    logger.setLevel(logging.DEBUG)
-    
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    
-    file_handler = RotatingFileHandler('library_api.log', maxBytes=5*1024*1024, backupCount=3)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    return logger
+async def group_commit(app: aiohttp.web.Application):
+    # Book writes share transactions; stopped before the pool closes
+    config = app["config"]
+    committer = GroupCommitter(
+        app["pool"],
+        app["book_cache"],
+        window=config["GROUP_COMMIT_WINDOW_MS"] / 1000,
+        max_batch=config["GROUP_COMMIT_MAX_BATCH"],
+        suggest=app.get("suggest_index"),
+    )
+    committer.start()
+    app["group_commit"] = committer
+    yield
+    await committer.stop()
+
+async def suggest_index(app: aiohttp.web.Application):
+    # Built before the first request; a rebuild in flight is stopped
+    # before the pool closes
+    index = app["suggest_index"]
+    async with app["pool"].reader() as db:
+        await index.build(db)
+    counts = ", ".join(f"{len(names.entries)} {kind}" for kind, names in index.indexes.items())
+    app["logger"].info(f"Suggestion index built in {index.build_seconds:.2f}s: {counts}")
+    yield
+    await index.close()
+
+async def close_logging(app: aiohttp.web.Application):
+    stop_logging(app["log_listener"])
 
 async def create_app() -> aiohttp.web.Application:
     app = aiohttp.web.Application()
-    
+    config = load_config()
+    app["config"] = config
+
     # Инициализация логгера
-    logger = setup_logging()
+    logger, listener = setup_logging(config)
     app['logger'] = logger
+    app["log_listener"] = listener
     logger.info("Starting application initialization")
     
     try:
-        config = load_config()
+        if config["METRICS"]:
+            app["metrics"] = Metrics()
+            app.middlewares.append(metrics_middleware(app["metrics"]))
+        if config["DEBUG_PROFILE"]:
+            app.middlewares.append(profile_middleware)
+        logger.info(f"JSON encoder: {set_encoder(config['JSON_ENCODER'])}")
         await init_db(app, config)
+        app["book_cache"] = BookCache(
+            max_entries=config["BOOK_CACHE_MAX_ENTRIES"],
+            max_bytes=config["BOOK_CACHE_MAX_BYTES"],
+            ttl=config["BOOK_CACHE_TTL"],
+            shared_database=config["WORKERS"] > 1,
+        )
+        if config["SEARCH_CACHE_MAX_ENTRIES"] > 0:
+            app["search_cache"] = SearchCache(max_entries=config["SEARCH_CACHE_MAX_ENTRIES"])
+        if config["SUGGEST"]:
+            app["suggest_index"] = SuggestIndex(
+                shared_database=config["WORKERS"] > 1,
+                refresh_interval=config["SUGGEST_REFRESH_SECONDS"],
+            )
+            app.cleanup_ctx.append(suggest_index)
         
+        if config["GROUP_COMMIT"]:
+            app.cleanup_ctx.append(group_commit)
+
         setup_book_routes(app)
         setup_stats_routes(app)
+        setup_suggest_routes(app)
         
         setup_swagger(
             app=app,
@@ -47,12 +96,50 @@ async def create_app() -> aiohttp.web.Application:
             description="RESTful API for library catalog management",
         )
         
+        # Last, so records from the other cleanup handlers are written
+        app.on_cleanup.append(close_logging)
         logger.info("Application initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize application: {str(e)}")
+        stop_logging(listener)
         raise
     
     return app
 
+def serve(config: Dict[str, Any], worker: Optional[int] = None, sock: Optional[socket.socket] = None):
+    # One server process; with a worker index, one of WORKERS
+    if worker is not None:
+        os.environ["LOG_FILE"] = worker_log_file(config["LOG_FILE"], worker)
+    if sock is not None:
+        address = {"sock": sock}
+    else:
+        address = {"host": config["HOST"], "port": config["PORT"], "reuse_port": worker is not None}
+    aiohttp.web.run_app(
+        create_app(),
+        shutdown_timeout=config["SHUTDOWN_TIMEOUT"],
+        print=print if worker in (None, 0) else None,
+        **address,
+    )
+
+def main():
+    config = load_config()
+    if config["WORKERS"] <= 1:
+        serve(config)
+        return
+
+    logger = setup_master_logging(config)
+    # Migrations run once here, before any worker opens the database
+    for migration in asyncio.run(prepare_database(config)):
+        logger.info(f"Applied migration {migration.version}: {migration.name}")
+    # SO_REUSEPORT lets the kernel spread connections over the workers'
+    # own sockets; elsewhere they all accept on one inherited socket
+    sock = None if reuse_port_supported() else bind_socket(config["HOST"], config["PORT"])
+    supervisor = Supervisor(
+        config["WORKERS"],
+        lambda index: serve(config, index, sock),
+        shutdown_timeout=config["SHUTDOWN_TIMEOUT"] + 5,
+    )
+    supervisor.run()
+
 if __name__ == "__main__":
-    aiohttp.web.run_app(create_app(), port=8080)
\ No newline at end of file
+    main()
\ No newline at end of file
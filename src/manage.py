@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import json
+import sys
+
+import aiosqlite
+
+from models.migrations import MIGRATIONS, find_stale_stats, get_schema_version, migrate, rebuild_stats
+from models.pool import ConnectionPool
+from services.import_service import ImportService, parse_records
+from services.query_plans import find_full_scans
+from utils.config import load_config
+
+
+async def run_migrate(args) -> int:
+    async with aiosqlite.connect(args.db) as db:
+        applied = await migrate(db)
+        for migration in applied:
+            print(f"Applied migration {migration.version}: {migration.name}")
+        print(f"Schema version: {await get_schema_version(db)} (latest {MIGRATIONS[-1].version})")
+    return 0
+
+
+async def run_check_plans(args) -> int:
+    async with aiosqlite.connect(args.db) as db:
+        db.row_factory = aiosqlite.Row
+        await migrate(db)
+        scans = await find_full_scans(db)
+
+    for statement, detail in scans:
+        print(f"{detail}\n    {statement}")
+    if scans:
+        print(f"{len(scans)} hot query plan(s) fall back to a full scan")
+        return 1
+    print("All hot queries use indexes")
+    return 0
+
+
+async def run_check_stats(args) -> int:
+    async with aiosqlite.connect(args.db) as db:
+        await migrate(db)
+        stale = await find_stale_stats(db)
+
+    for table, name, stored, actual in stale:
+        print(f"{table} {name!r}: stored {stored}, actual {actual}")
+    if stale:
+        print(f"{len(stale)} stats counter(s) are out of date, run rebuild-stats")
+        return 1
+    print("Stats counters match the catalog")
+    return 0
+
+
+async def run_rebuild_stats(args) -> int:
+    async with aiosqlite.connect(args.db) as db:
+        await migrate(db)
+        await rebuild_stats(db)
+        await db.commit()
+    print("Stats counters rebuilt")
+    return 0
+
+
+async def read_lines(path: str):
+    with open(path, "rb") as source:
+        for line in source:
+            yield line
+
+
+async def run_import(args) -> int:
+    if not args.file:
+        print("import needs a file to read")
+        return 2
+    fmt = args.format or ("csv" if args.file.endswith(".csv") else "ndjson")
+
+    pool = ConnectionPool(args.db, readers=0)
+    await pool.open()
+    try:
+        async with pool.writer() as db:
+            await migrate(db)
+        import_service = ImportService(pool.writer, batch_size=args.batch_size)
+        report = await import_service.import_records(parse_records(read_lines(args.file), fmt))
+    finally:
+        await pool.close()
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0 if not report["failed"] else 1
+
+
+COMMANDS = {
+    "migrate": run_migrate,
+    "check-plans": run_check_plans,
+    "import": run_import,
+    "check-stats": run_check_stats,
+    "rebuild-stats": run_rebuild_stats,
+}
+
+
+def main() -> int:
+    config = load_config()
+    parser = argparse.ArgumentParser(description="Library API maintenance commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("file", nargs="?", help="NDJSON or CSV file for import")
+    parser.add_argument("--db", default=config["DB_PATH"], help="path to the SQLite database")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="import format (default: by file extension)")
+    parser.add_argument("--batch-size", type=int, default=config["IMPORT_BATCH_SIZE"], help="rows per import transaction")
+    args = parser.parse_args()
+    return asyncio.run(COMMANDS[args.command](args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
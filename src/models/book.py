@@ -36,7 +36,7 @@ class BookUpdate(BaseModel):
 
 from datetime import datetime
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 class BookResponse(BaseModel):
     id: int
@@ -65,7 +65,38 @@ class BookSearchParams(BaseModel):
     year_to: Optional[int] = None
     isbn: Optional[str] = None
     available_only: bool = False
+    mode: str = "like"
     sort_by: Optional[str] = None
     sort_order: Optional[str] = "asc"
     page: int = 1
-    per_page: int = 10
\ No newline at end of file
+    per_page: int = 10
+    cursor: Optional[str] = None
+    count: Optional[str] = None
+
+
+# Fields of a BookResponse, in response order; `fields=` picks from these
+BOOK_FIELDS = tuple(BookResponse.model_fields)
+
+# `view=` presets; "full" is the whole BookResponse
+VIEWS = {
+    "summary": ("id", "title", "copies_available"),
+    "full": None,
+}
+
+
+def parse_fields(fields: Optional[str], view: Optional[str] = None) -> Optional[Tuple[str, ...]]:
+    # `fields=title,authors` or `view=summary` -> the fields to return, in
+    # response order and always with id; None for the full book. fields
+    # wins over view.
+    if fields is None:
+        if view is None:
+            return None
+        if view not in VIEWS:
+            raise ValueError(f"Unknown view: {view} (expected {', '.join(VIEWS)})")
+        return VIEWS[view]
+
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested.difference(BOOK_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(field for field in BOOK_FIELDS if field == "id" or field in requested)
@@ -1,63 +1,47 @@
-import aiosqlite
 import os
-from typing import Dict, Any
+from typing import Any, Dict, List
 import aiohttp.web
+from models.migrations import Migration, migrate, refresh_statistics
+from models.pool import ConnectionPool
+from utils.profiling import SlowQueryLog
 
 async def init_db(app: aiohttp.web.Application, config: Dict[str, Any]):
     db_path = config.get("DB_PATH", "library.db")
-    app["db"] = await aiosqlite.connect(db_path)
-    app["db"].row_factory = aiosqlite.Row
-
-    # Create tables if they don't exist
-    await create_tables(app["db"])
-
-
-async def create_tables(db):
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS books (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            publication_year INTEGER,
-            isbn TEXT,
-            copies_available INTEGER DEFAULT 1,
-            is_active BOOLEAN DEFAULT TRUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS authors (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE
-        )
-    """)
-
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS genres (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE
-        )
-    """)
-
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS book_authors (
-            book_id INTEGER NOT NULL,
-            author_id INTEGER NOT NULL,
-            PRIMARY KEY (book_id, author_id),
-            FOREIGN KEY (book_id) REFERENCES books(id) ON DELETE CASCADE,
-            FOREIGN KEY (author_id) REFERENCES authors(id) ON DELETE CASCADE
-        )
-    """)
-
-    await db.execute("""
-        CREATE TABLE IF NOT EXISTS book_genres (
-            book_id INTEGER NOT NULL,
-            genre_id INTEGER NOT NULL,
-            PRIMARY KEY (book_id, genre_id),
-            FOREIGN KEY (book_id) REFERENCES books(id) ON DELETE CASCADE,
-            FOREIGN KEY (genre_id) REFERENCES genres(id) ON DELETE CASCADE
-        )
-    """)
-
-    await db.commit()
\ No newline at end of file
+    slow_query_ms = config.get("SLOW_QUERY_MS", 0)
+    pool = ConnectionPool(
+        db_path,
+        readers=config.get("DB_POOL_SIZE", 4),
+        synchronous=config.get("DB_SYNCHRONOUS", "NORMAL"),
+        slow_query_log=SlowQueryLog(slow_query_ms / 1000) if slow_query_ms > 0 else None,
+    )
+    await pool.open()
+
+    # Bring the schema up to date; with several workers the supervisor
+    # did that before starting them (prepare_database)
+    if config.get("WORKERS", 1) <= 1:
+        async with pool.writer() as db:
+            applied = await migrate(db)
+            await refresh_statistics(db)
+        for migration in applied:
+            app["logger"].info(f"Applied migration {migration.version}: {migration.name}")
+
+    await pool.open_readers()
+    app["pool"] = pool
+    app.on_cleanup.append(close_db)
+
+
+async def prepare_database(config: Dict[str, Any]) -> List[Migration]:
+    # Migrations and planner statistics, once for all worker processes
+    pool = ConnectionPool(config.get("DB_PATH", "library.db"), readers=0)
+    await pool.open()
+    try:
+        async with pool.writer() as db:
+            applied = await migrate(db)
+            await refresh_statistics(db)
+    finally:
+        await pool.close()
+    return applied
+
+
+async def close_db(app: aiohttp.web.Application):
+    await app["pool"].close()
@@ -0,0 +1,276 @@
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Tuple
+
+import aiosqlite
+
+
+# Millisecond precision, so that updated_at changes on every write
+NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+# Text stored in books_fts for one book; ё is folded into е because the
+# unicode61 tokenizer does not treat it as a diacritic.
+SEARCH_DOCUMENT_SQL = """
+    SELECT
+        b.id,
+        replace(replace(b.title, 'ё', 'е'), 'Ё', 'Е'),
+        replace(replace(coalesce((
+            SELECT group_concat(a.name, ' ')
+            FROM book_authors ba
+            JOIN authors a ON a.id = ba.author_id
+            WHERE ba.book_id = b.id
+        ), ''), 'ё', 'е'), 'Ё', 'Е')
+    FROM books b
+"""
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[aiosqlite.Connection], Awaitable[None]]
+
+
+async def create_tables(db: aiosqlite.Connection):
+    # IF NOT EXISTS lets catalogs created before migrations adopt version 1
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            publication_year INTEGER,
+            isbn TEXT,
+            copies_available INTEGER DEFAULT 1,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS authors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+    """)
+
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS genres (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+    """)
+
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS book_authors (
+            book_id INTEGER NOT NULL,
+            author_id INTEGER NOT NULL,
+            PRIMARY KEY (book_id, author_id),
+            FOREIGN KEY (book_id) REFERENCES books(id) ON DELETE CASCADE,
+            FOREIGN KEY (author_id) REFERENCES authors(id) ON DELETE CASCADE
+        )
+    """)
+
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS book_genres (
+            book_id INTEGER NOT NULL,
+            genre_id INTEGER NOT NULL,
+            PRIMARY KEY (book_id, genre_id),
+            FOREIGN KEY (book_id) REFERENCES books(id) ON DELETE CASCADE,
+            FOREIGN KEY (genre_id) REFERENCES genres(id) ON DELETE CASCADE
+        )
+    """)
+
+
+async def create_search_index(db: aiosqlite.Connection):
+    await db.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+            title,
+            authors,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+
+    # Backfill the index for catalogs created before it existed
+    await rebuild_search_index(db)
+
+
+async def rebuild_search_index(db: aiosqlite.Connection):
+    await db.execute("DELETE FROM books_fts")
+    await db.execute(f"INSERT INTO books_fts (rowid, title, authors) {SEARCH_DOCUMENT_SQL}")
+
+
+async def create_query_indexes(db: aiosqlite.Connection):
+    # list_books and search_books sorted by title or year only ever read
+    # active books, so partial indexes keep the inactive tail out of them
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_books_active_title
+        ON books (title) WHERE is_active = TRUE
+    """)
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_books_active_year
+        ON books (publication_year) WHERE is_active = TRUE
+    """)
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_books_isbn ON books (isbn)
+    """)
+
+    # Reverse lookups for the author and genre filters; together with the
+    # primary keys both link tables are covered in either direction
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_book_authors_author
+        ON book_authors (author_id, book_id)
+    """)
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_book_genres_genre
+        ON book_genres (genre_id, book_id)
+    """)
+
+
+# Sort key for sort_by=author: the alphabetically first author of a book
+SORT_AUTHOR_SQL = """
+    coalesce((
+        SELECT MIN(a.name)
+        FROM book_authors ba
+        JOIN authors a ON a.id = ba.author_id
+        WHERE ba.book_id = books.id
+    ), '')
+"""
+
+
+async def add_sort_author(db: aiosqlite.Connection):
+    # Denormalized so that author-sorted pages can be read from an index
+    await db.execute("""
+        ALTER TABLE books ADD COLUMN sort_author TEXT NOT NULL DEFAULT ''
+    """)
+    await db.execute(f"UPDATE books SET sort_author = {SORT_AUTHOR_SQL}")
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_books_active_sort_author
+        ON books (sort_author) WHERE is_active = TRUE
+    """)
+
+
+async def create_catalog_version(db: aiosqlite.Connection):
+    # Single-row counter bumped by every catalog write; list and search
+    # ETags are derived from it
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    await db.execute(f"""
+        INSERT OR IGNORE INTO catalog_version (id, version, updated_at)
+        VALUES (1, 0, {NOW_SQL})
+    """)
+
+
+# Per-author and per-genre book counters, maintained by BookService and
+# the importer: (table, link table, link column)
+STATS_TABLES = (
+    ("authors", "book_authors", "author_id"),
+    ("genres", "book_genres", "genre_id"),
+)
+
+
+async def add_stats_counters(db: aiosqlite.Connection):
+    # Stats endpoints read these instead of grouping the link tables
+    for table, _, _ in STATS_TABLES:
+        await db.execute(f"""
+            ALTER TABLE {table} ADD COLUMN book_count INTEGER NOT NULL DEFAULT 0
+        """)
+        await db.execute(f"""
+            ALTER TABLE {table} ADD COLUMN active_book_count INTEGER NOT NULL DEFAULT 0
+        """)
+    await rebuild_stats(db)
+
+
+def _stats_counts_sql(table: str, link_table: str, column: str) -> Tuple[str, str]:
+    # book_count and active_book_count of a {table} row computed from scratch
+    return (
+        f"(SELECT COUNT(*) FROM {link_table} l WHERE l.{column} = {table}.id)",
+        f"""(SELECT COUNT(*) FROM {link_table} l JOIN books b ON b.id = l.book_id
+             WHERE l.{column} = {table}.id AND b.is_active = TRUE)""",
+    )
+
+
+async def rebuild_stats(db: aiosqlite.Connection):
+    for table, link_table, column in STATS_TABLES:
+        count_sql, active_sql = _stats_counts_sql(table, link_table, column)
+        await db.execute(f"""
+            UPDATE {table} SET book_count = {count_sql}, active_book_count = {active_sql}
+        """)
+
+
+async def find_stale_stats(db: aiosqlite.Connection) -> List[Tuple[str, str, Tuple[int, int], Tuple[int, int]]]:
+    # (table, name, stored counts, actual counts) for every counter that
+    # drifted from the link tables
+    stale = []
+    for table, link_table, column in STATS_TABLES:
+        count_sql, active_sql = _stats_counts_sql(table, link_table, column)
+        async with db.execute(f"""
+            SELECT * FROM (
+                SELECT name, book_count, active_book_count,
+                       {count_sql} AS actual, {active_sql} AS actual_active
+                FROM {table}
+            )
+            WHERE book_count != actual OR active_book_count != actual_active
+        """) as cursor:
+            for row in await cursor.fetchall():
+                stale.append((table, row[0], (row[1], row[2]), (row[3], row[4])))
+    return stale
+
+
+async def create_stats_indexes(db: aiosqlite.Connection):
+    # Top-N and keyset pages of the stats endpoints walk these in order
+    # and stop after the page
+    for table, _, _ in STATS_TABLES:
+        for column in ("book_count", "active_book_count"):
+            await db.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_{table}_{column}
+                ON {table} ({column} DESC, name)
+            """)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "initial schema", create_tables),
+    Migration(2, "books full-text index", create_search_index),
+    Migration(3, "indexes for hot queries", create_query_indexes),
+    Migration(4, "author sort key", add_sort_author),
+    Migration(5, "catalog version", create_catalog_version),
+    Migration(6, "author and genre stats counters", add_stats_counters),
+    Migration(7, "indexes for stats pages", create_stats_indexes),
+]
+
+
+async def get_schema_version(db: aiosqlite.Connection) -> int:
+    async with db.execute("PRAGMA user_version") as cursor:
+        return (await cursor.fetchone())[0]
+
+
+async def migrate(db: aiosqlite.Connection) -> List[Migration]:
+    current = await get_schema_version(db)
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+        # Each migration and its version bump commit together
+        await db.execute("BEGIN")
+        try:
+            await migration.apply(db)
+            await db.execute(f"PRAGMA user_version = {migration.version}")
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        applied.append(migration)
+    return applied
+
+
+async def refresh_statistics(db: aiosqlite.Connection):
+    # Planner statistics (sqlite_stat1); without them SQLite happily counts
+    # through a partial index and a row lookup per match. analysis_limit
+    # keeps this cheap on large catalogs.
+    await db.execute("PRAGMA analysis_limit = 1000")
+    await db.execute("ANALYZE")
+    await db.commit()
@@ -0,0 +1,184 @@
+import asyncio
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aiosqlite
+
+from utils.metrics import current_sql
+from utils.profiling import SlowQueryLog
+
+# NORMAL only syncs the WAL at checkpoints; FULL syncs on every commit
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+# sqlite3 calls that run a statement, as opposed to fetches and commits
+STATEMENT_CALLS = frozenset(("execute", "executemany", "executescript"))
+
+
+class InstrumentedConnection(aiosqlite.Connection):
+    """aiosqlite connection that charges SQL to the current request.
+
+    Every call aiosqlite hands to its worker thread, from connections and
+    cursors alike, goes through `_execute`. Outside a request (migrations,
+    group commit batches) nothing is recorded, except by the slow query
+    log when one is set.
+    """
+
+    slow_query_log: Optional[SlowQueryLog] = None
+
+    async def _execute(self, fn, *args, **kwargs):
+        sql = current_sql.get()
+        if sql is None and self.slow_query_log is None:
+            return await super()._execute(fn, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            result = await super()._execute(fn, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            if sql is not None:
+                sql.seconds += elapsed
+                if fn.__name__ in STATEMENT_CALLS:
+                    sql.statements += 1
+        if self.slow_query_log is not None:
+            for statement in self.slow_query_log.observe(fn, args, result, elapsed):
+                self.slow_query_log.report(statement, await self._query_plan(statement))
+        return result
+
+    async def _query_plan(self, statement) -> Optional[str]:
+        log = self.slow_query_log
+        if not log.explainable(statement):
+            return None
+        plan = log.cached_plan(statement.sql)
+        if plan is None:
+            parameters = statement.parameters[0] if statement.many else statement.parameters
+
+            def explain():
+                rows = self._conn.execute(f"EXPLAIN QUERY PLAN {statement.sql}", parameters).fetchall()
+                return "; ".join(row[3] for row in rows)
+
+            try:
+                # Straight to the worker thread: the plan is not a statement of the request
+                plan = await super()._execute(explain)
+            except sqlite3.Error as e:
+                return f"unavailable ({e})"
+            log.remember_plan(statement.sql, plan)
+        return plan
+
+
+def connect(database: str, **kwargs: Any) -> InstrumentedConnection:
+    # aiosqlite.connect() with the instrumented connection class
+    return InstrumentedConnection(lambda: sqlite3.connect(database, **kwargs), iter_chunk_size=64)
+
+
+class PoolStats:
+    def __init__(self):
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, wait: float) -> None:
+        self.acquired += 1
+        if wait > 0.0001:
+            self.waited += 1
+        self.wait_seconds_total += wait
+        self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+
+
+class ConnectionPool:
+    """One serialized writer connection plus N read-only readers (WAL mode)."""
+
+    def __init__(
+        self,
+        db_path: str,
+        readers: int = 4,
+        synchronous: str = "NORMAL",
+        slow_query_log: Optional[SlowQueryLog] = None,
+    ):
+        if synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Unknown synchronous mode: {synchronous}")
+        self.db_path = db_path
+        self.synchronous = synchronous.upper()
+        self.size = readers if db_path != ":memory:" else 0
+        self.slow_query_log = slow_query_log
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._writer_lock = asyncio.Lock()
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle: "asyncio.Queue[aiosqlite.Connection]" = asyncio.Queue()
+        self.reader_stats = PoolStats()
+        self.writer_stats = PoolStats()
+
+    async def open(self) -> None:
+        self._writer = await connect(self.db_path)
+        self._writer.slow_query_log = self.slow_query_log
+        self._writer.row_factory = aiosqlite.Row
+        if self.db_path != ":memory:":
+            await self._writer.execute("PRAGMA journal_mode = WAL")
+            await self._writer.execute(f"PRAGMA synchronous = {self.synchronous}")
+        await self._writer.execute("PRAGMA foreign_keys = ON")
+
+    async def open_readers(self) -> None:
+        # Readers are opened read-only, so the schema must already exist
+        for _ in range(self.size):
+            reader = await connect(f"file:{self.db_path}?mode=ro", uri=True)
+            reader.slow_query_log = self.slow_query_log
+            reader.row_factory = aiosqlite.Row
+            self._readers.append(reader)
+            self._idle.put_nowait(reader)
+
+    async def close(self) -> None:
+        for reader in self._readers:
+            await reader.close()
+        self._readers.clear()
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
+
+    @property
+    def writer_connection(self) -> aiosqlite.Connection:
+        return self._writer
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        started = time.perf_counter()
+        async with self._writer_lock:
+            self.writer_stats.record(time.perf_counter() - started)
+            try:
+                yield self._writer
+            except BaseException:
+                # Do not leak a half-done transaction into the next borrower
+                await self._writer.rollback()
+                raise
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        if not self.size:
+            async with self.writer() as db:
+                yield db
+            return
+
+        started = time.perf_counter()
+        db = await self._idle.get()
+        self.reader_stats.record(time.perf_counter() - started)
+        try:
+            yield db
+        finally:
+            self._idle.put_nowait(db)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "readers": self.size,
+            "readers_idle": self._idle.qsize(),
+            "writer_busy": self._writer_lock.locked(),
+            "reader": self.reader_stats.as_dict(),
+            "writer": self.writer_stats.as_dict(),
+        }
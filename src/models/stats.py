@@ -0,0 +1,10 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+class StatsParams(BaseModel):
+    limit: int = 100
+    offset: int = 0
+    cursor: Optional[str] = None
+    min_count: int = 0
+    active_only: bool = True
@@ -1,67 +1,251 @@
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+import aiosqlite
 from aiohttp import web
-from models.book import BookCreate, BookUpdate, BookSearchParams
+from models.book import BookCreate, BookUpdate, BookSearchParams, parse_fields
 from services.book_service import BookService
 from services.search_service import SearchService
+from services.import_service import ImportService, parse_records
+from services.export_service import CONTENT_TYPES, EXPORT_FORMATS, ExportService
+from services.group_commit import WriteOperation
 from utils.exceptions import handle_errors
+from utils.profiling import timed
+from utils.serialization import json_response
+from utils.streaming import stream_chunks
+from utils.http_cache import is_not_modified, make_etag, not_modified_response, set_validators
+
+
+def book_etag(book_id: int, updated_at: datetime) -> str:
+    return make_etag("book", book_id, updated_at.isoformat())
+
+
+async def catalog_validators(request: web.Request, db: aiosqlite.Connection) -> Tuple[str, datetime, int]:
+    # List and search bodies change with any write, so their validators come
+    # from the catalog version. Read it before the page itself, so a body is
+    # never labelled with a newer version than the data it was built from.
+    version, updated_at = await BookService(db).get_catalog_version()
+    return make_etag("catalog", version, request.path_qs), updated_at, version
+
+
+async def write(request: web.Request, operation: WriteOperation) -> Any:
+    # Runs operation(BookService) in a transaction of its own, or queues it
+    # into a shared one when group commit is on
+    committer = request.app.get("group_commit")
+    if committer is not None:
+        return await committer.submit(operation)
+    async with request.app["pool"].writer() as db:
+        return await operation(BookService(db, request.app["book_cache"], suggest=request.app.get("suggest_index")))
 
 
 @handle_errors
 async def create_book(request: web.Request) -> web.Response:
-    data = await request.json()
-    book_data = BookCreate(**data)
-    book_service = BookService(request.app["db"])
-    book = await book_service.create_book(book_data)
-    return web.json_response(book.dict(), status=201)
+    with timed("parse"):
+        data = await request.json()
+    with timed("validate"):
+        book_data = BookCreate(**data)
+    book = await write(request, lambda service: service.create_book(book_data))
+    return json_response(book, status=201)
 
 
 @handle_errors
 async def get_book(request: web.Request) -> web.Response:
     book_id = int(request.match_info["id"])
-    book_service = BookService(request.app["db"])
-    book = await book_service.get_book_by_id(book_id)
-    return web.json_response(book.dict())
+    async with request.app["pool"].reader() as db:
+        book_service = BookService(db, request.app["book_cache"])
+        updated_at = await book_service.get_book_updated_at(book_id)
+        etag = book_etag(book_id, updated_at)
+        if is_not_modified(request, etag, updated_at):
+            return not_modified_response(etag, updated_at)
+        book = await book_service.get_book_by_id(book_id)
+
+    response = json_response(book)
+    return set_validators(response, book_etag(book.id, book.updated_at), book.updated_at)
+
+
+
+def parse_ids(value: str) -> List[int]:
+    # "1,2,3" -> [1, 2, 3]
+    try:
+        return [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise ValueError("ids must be a comma-separated list of book ids") from None
+
+
+def batch_body(book_ids: List[int], books: Dict[int, Any]) -> Dict[str, Any]:
+    # One item per requested id, in request order; a missing book does not
+    # fail the batch
+    results = []
+    for book_id in book_ids:
+        book = books.get(book_id)
+        if book is None:
+            results.append({"id": book_id, "status": 404, "error": f"Book with id {book_id} not found"})
+        else:
+            results.append({"id": book_id, "status": 200, "book": book})
+    return {"results": results}
 
 
 @handle_errors
 async def list_books(request: web.Request) -> web.Response:
-    page = int(request.query.get("page", 1))
-    per_page = int(request.query.get("per_page", 10))
-    book_service = BookService(request.app["db"])
-    books = await book_service.list_books(page, per_page)
-    return web.json_response([book.dict() for book in books])
+    with timed("parse"):
+        page = int(request.query.get("page", 1))
+        per_page = int(request.query.get("per_page", 10))
+        ids = parse_ids(request.query["ids"]) if "ids" in request.query else None
+        fields = parse_fields(request.query.get("fields"), request.query.get("view"))
+
+    async with request.app["pool"].reader() as db:
+        etag, last_modified, _ = await catalog_validators(request, db)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        book_service = BookService(db, request.app["book_cache"])
+        # `?ids=1,2,3` fetches those books instead of a page
+        if ids is not None:
+            body = batch_body(ids, await book_service.get_books_batch(ids, fields))
+        # Cursor mode (`?cursor=` starts it) wraps the page in an object
+        elif "cursor" in request.query:
+            books, next_cursor = await book_service.list_books_after(request.query["cursor"], per_page, fields)
+            body = {"results": books, "next_cursor": next_cursor}
+        else:
+            books = await book_service.list_books(page, per_page, fields)
+            body = books
+
+    return set_validators(json_response(body), etag, last_modified)
 
 
 @handle_errors
 async def update_book(request: web.Request) -> web.Response:
     book_id = int(request.match_info["id"])
-    data = await request.json()
-    book_data = BookUpdate(**data)
-    book_service = BookService(request.app["db"])
-    book = await book_service.update_book(book_id, book_data)
-    return web.json_response(book.dict())
+    with timed("parse"):
+        data = await request.json()
+    with timed("validate"):
+        book_data = BookUpdate(**data)
+    book = await write(request, lambda service: service.update_book(book_id, book_data))
+    return json_response(book)
 
 
 @handle_errors
 async def delete_book(request: web.Request) -> web.Response:
     book_id = int(request.match_info["id"])
     soft_delete = request.query.get("soft", "true").lower() == "true"
-    book_service = BookService(request.app["db"])
-    await book_service.delete_book(book_id, soft_delete)
+    await write(request, lambda service: service.delete_book(book_id, soft_delete))
     return web.json_response({"status": "deleted"}, status=204)
 
 
 @handle_errors
 async def search_books(request: web.Request) -> web.Response:
-    params = BookSearchParams(**request.query)
-    search_service = SearchService(request.app["db"])
-    result = await search_service.search_books(params)
-    return web.json_response(result)
+    with timed("parse"):
+        query = dict(request.query)
+    with timed("validate"):
+        fields = parse_fields(query.pop("fields", None), query.pop("view", None))
+        params = BookSearchParams(**query)
+    config = request.app["config"]
+    async with request.app["pool"].reader() as db:
+        etag, last_modified, version = await catalog_validators(request, db)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        search_service = SearchService(
+            db,
+            count_strategy=config["SEARCH_COUNT_STRATEGY"],
+            count_cap=config["SEARCH_COUNT_CAP"],
+            cache=request.app["book_cache"],
+            result_cache=request.app.get("search_cache"),
+        )
+        result = await search_service.search_books(params, catalog_version=version, fields=fields)
+    return set_validators(json_response(result), etag, last_modified)
+
+
+@handle_errors
+async def checkout_book(request: web.Request) -> web.Response:
+    book_id = int(request.match_info["id"])
+    copies = await write(request, lambda service: service.checkout_books([book_id]))
+    return json_response({"id": book_id, "copies_available": copies[book_id]})
+
+
+@handle_errors
+async def return_book(request: web.Request) -> web.Response:
+    book_id = int(request.match_info["id"])
+    copies = await write(request, lambda service: service.return_books([book_id]))
+    return json_response({"id": book_id, "copies_available": copies[book_id]})
+
+
+async def read_ids(request: web.Request) -> List[int]:
+    # {"ids": [1, 2, 2]}; in a cart a repeated id moves one copy per occurrence
+    data = await request.json()
+    ids = data.get("ids") if isinstance(data, dict) else None
+    # bool is an int subclass, but true is not a book id
+    if not isinstance(ids, list) or not all(
+        isinstance(book_id, int) and not isinstance(book_id, bool) for book_id in ids
+    ):
+        raise ValueError("Expected {\"ids\": [book ids]}")
+    return ids
+
+
+@handle_errors
+async def checkout_cart(request: web.Request) -> web.Response:
+    ids = await read_ids(request)
+    copies = await write(request, lambda service: service.checkout_books(ids))
+    return json_response({"results": [{"id": book_id, "copies_available": count} for book_id, count in copies.items()]})
+
+
+@handle_errors
+async def return_cart(request: web.Request) -> web.Response:
+    ids = await read_ids(request)
+    copies = await write(request, lambda service: service.return_books(ids))
+    return json_response({"results": [{"id": book_id, "copies_available": count} for book_id, count in copies.items()]})
+
+
+@handle_errors
+async def get_books_batch(request: web.Request) -> web.Response:
+    # POST form of `GET /api/books?ids=`, for id lists too long for a URL;
+    # takes ?fields= and ?view= like the GET
+    ids = await read_ids(request)
+    fields = parse_fields(request.query.get("fields"), request.query.get("view"))
+    async with request.app["pool"].reader() as db:
+        books = await BookService(db, request.app["book_cache"]).get_books_batch(ids, fields)
+    return json_response(batch_body(ids, books))
+
+
+@handle_errors
+async def import_books(request: web.Request) -> web.Response:
+    # Streams the body line by line: NDJSON by default, CSV with ?format=csv
+    # or a text/csv body
+    default_format = "csv" if request.content_type == "text/csv" else "ndjson"
+    fmt = request.query.get("format", default_format)
+    import_service = ImportService(
+        request.app["pool"].writer,
+        batch_size=request.app["config"]["IMPORT_BATCH_SIZE"],
+        suggest=request.app.get("suggest_index"),
+    )
+    report = await import_service.import_records(parse_records(request.content, fmt))
+    return json_response(report)
+
+
+@handle_errors
+async def export_books(request: web.Request) -> web.StreamResponse:
+    # Streams every matching book; takes the search filters plus ?format=
+    query = dict(request.query)
+    fmt = query.pop("format", "ndjson")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    params = BookSearchParams(**query)
+
+    # The service borrows a reader per page, not for the whole stream
+    chunks = ExportService(request.app["pool"].reader).export(params, fmt)
+    return await stream_chunks(request, chunks, CONTENT_TYPES[fmt])
 
 
 def setup_routes(app: web.Application):
     app.router.add_post("/api/books", create_book)
+    app.router.add_post("/api/books/import", import_books)
+    app.router.add_post("/api/books/checkout", checkout_cart)
+    app.router.add_post("/api/books/return", return_cart)
+    app.router.add_post("/api/books/batch", get_books_batch)
+    app.router.add_post("/api/books/{id}/checkout", checkout_book)
+    app.router.add_post("/api/books/{id}/return", return_book)
     app.router.add_get("/api/books", list_books)
+    app.router.add_get("/api/books/export", export_books)
     app.router.add_get("/api/books/{id}", get_book)
     app.router.add_put("/api/books/{id}", update_book)
     app.router.add_delete("/api/books/{id}", delete_book)
-    app.router.add_get("/api/books/search", search_books)
\ No newline at end of file
+    app.router.add_get("/api/books/search", search_books)
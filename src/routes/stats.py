@@ -1,22 +1,91 @@
 from aiohttp import web
-from services.search_service import SearchService
-from utils.exceptions import handle_errors
+from models.stats import StatsParams
+from services.stats_service import StatsService
+from utils.exceptions import NotFoundError, handle_errors
+from utils.metrics import CONTENT_TYPE, render_metrics
+from utils.profiling import timed
+from utils.serialization import json_response
+from utils.streaming import stream_chunks
+
+PAGING_PARAMS = {"limit", "offset", "cursor"}
+
+
+async def stats_page(request: web.Request, kind: str) -> web.Response:
+    # ?limit, ?offset, ?min_count, ?active_only; cursor mode (`?cursor=`
+    # starts it) wraps the page in an object like GET /api/books. Without
+    # any of limit, offset or cursor the whole mapping is returned, as it
+    # was before paging: a silently capped dict would lose entries
+    with timed("parse"):
+        query = dict(request.query)
+    with timed("validate"):
+        params = StatsParams(**query)
+    paged = bool(PAGING_PARAMS & query.keys())
+    async with request.app["pool"].reader() as db:
+        if paged:
+            rows, next_cursor = await StatsService(db).get_stats(kind, params)
+        else:
+            rows = await StatsService(db).get_all_stats(kind, params)
+    if "cursor" in request.query:
+        results = [{"name": name, "count": count} for name, count in rows]
+        return json_response({"results": results, "next_cursor": next_cursor})
+    return json_response(dict(rows))
 
 
 @handle_errors
 async def get_genre_stats(request: web.Request) -> web.Response:
-    search_service = SearchService(request.app["db"])
-    stats = await search_service.get_genre_stats()
-    return web.json_response(stats)
+    return await stats_page(request, "genres")
 
 
 @handle_errors
 async def get_author_stats(request: web.Request) -> web.Response:
-    search_service = SearchService(request.app["db"])
-    stats = await search_service.get_author_stats()
+    return await stats_page(request, "authors")
+
+
+@handle_errors
+async def export_stats(request: web.Request) -> web.StreamResponse:
+    # Full dump as NDJSON; takes min_count and active_only
+    params = StatsParams(**request.query)
+    async with request.app["pool"].reader() as db:
+        chunks = StatsService(db).iter_stats(request.match_info["kind"], params)
+        return await stream_chunks(request, chunks, "application/x-ndjson")
+
+
+@handle_errors
+async def get_pool_stats(request: web.Request) -> web.Response:
+    stats = request.app["pool"].stats()
+    if "group_commit" in request.app:
+        stats["group_commit"] = request.app["group_commit"].stats()
     return web.json_response(stats)
 
 
+@handle_errors
+async def get_cache_stats(request: web.Request) -> web.Response:
+    stats = request.app["book_cache"].stats()
+    if "search_cache" in request.app:
+        stats["search"] = request.app["search_cache"].stats()
+    return web.json_response(stats)
+
+
+@handle_errors
+async def get_suggest_stats(request: web.Request) -> web.Response:
+    if "suggest_index" not in request.app:
+        raise NotFoundError("Suggestions are disabled")
+    return web.json_response(request.app["suggest_index"].stats())
+
+
+@handle_errors
+async def get_metrics(request: web.Request) -> web.Response:
+    if "metrics" not in request.app:
+        raise NotFoundError("Metrics are disabled")
+    body = render_metrics(request.app).encode("utf-8")
+    return web.Response(body=body, headers={"Content-Type": CONTENT_TYPE})
+
+
 def setup_routes(app: web.Application):
     app.router.add_get("/api/stats/genres", get_genre_stats)
-    app.router.add_get("/api/stats/authors", get_author_stats)
\ No newline at end of file
+    app.router.add_get("/api/stats/authors", get_author_stats)
+    app.router.add_get("/api/stats/{kind:genres|authors}/export", export_stats)
+    app.router.add_get("/api/stats/pool", get_pool_stats)
+    app.router.add_get("/api/stats/cache", get_cache_stats)
+    app.router.add_get("/api/stats/suggest", get_suggest_stats)
+    app.router.add_get("/metrics", get_metrics)
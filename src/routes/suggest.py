@@ -0,0 +1,38 @@
+from typing import List
+from aiohttp import web
+from services.book_service import BookService
+from services.suggest_service import KINDS, MAX_SUGGESTIONS
+from utils.exceptions import NotFoundError, handle_errors
+from utils.serialization import json_response
+
+
+def parse_kinds(value: str) -> List[str]:
+    # "titles,authors" -> ["titles", "authors"]; empty means all kinds
+    kinds = [kind.strip() for kind in value.split(",") if kind.strip()] or list(KINDS)
+    unknown = [kind for kind in kinds if kind not in KINDS]
+    if unknown:
+        raise ValueError(f"Unknown suggestion kind: {', '.join(unknown)}; expected {', '.join(KINDS)}")
+    return list(dict.fromkeys(kinds))
+
+
+@handle_errors
+async def suggest(request: web.Request) -> web.Response:
+    # ?q= prefix of any word of a title, author or genre; ?kind=titles,...
+    # and ?limit= (per kind) narrow the answer
+    index = request.app.get("suggest_index")
+    if index is None:
+        raise NotFoundError("Suggestions are disabled")
+    kinds = parse_kinds(request.query.get("kind", ""))
+    limit = int(request.query.get("limit", 10))
+    if not 1 <= limit <= MAX_SUGGESTIONS:
+        raise ValueError(f"limit must be between 1 and {MAX_SUGGESTIONS}")
+
+    if index.shared_database:
+        async with request.app["pool"].reader() as db:
+            version, _ = await BookService(db).get_catalog_version()
+        index.sync(version, request.app["pool"].reader)
+    return json_response(index.suggest(request.query.get("q", ""), kinds, limit))
+
+
+def setup_routes(app: web.Application):
+    app.router.add_get("/api/suggest", suggest)
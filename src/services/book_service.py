@@ -1,20 +1,90 @@
-from typing import List, Optional, Dict, Any
-from models.book import BookCreate, BookUpdate, BookResponse, Author, Genre
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from models.book import BookCreate, BookUpdate, BookResponse
 import aiosqlite
 from datetime import datetime
-from utils.exceptions import NotFoundError
+from utils.exceptions import ConflictError, NotFoundError
+from models.migrations import NOW_SQL, SEARCH_DOCUMENT_SQL, SORT_AUTHOR_SQL, STATS_TABLES
+from utils.pagination import decode_cursor, encode_cursor
+from utils.profiling import timed
+from services.cache import BookCache
+from services.suggest_service import SuggestIndex, Touched, Weights, read_weights
+
+# Stays well below SQLite's limit on host parameters per statement
+IN_CHUNK_SIZE = 500
+
+# Largest cart accepted by checkout_books/return_books
+MAX_CART_SIZE = 100
+
+# Most ids get_books_batch reads at once; one IN list, so <= IN_CHUNK_SIZE
+MAX_BATCH_SIZE = 500
+
+# BookResponse fields read from books columns, with the conversion the
+# model would apply; authors and genres come from the link tables
+COLUMN_FIELDS: Dict[str, Callable[[Any], Any]] = {
+    "id": int,
+    "title": str,
+    "publication_year": int,
+    "isbn": lambda value: value,
+    "copies_available": int,
+    "is_active": bool,
+    "created_at": datetime.fromisoformat,
+    "updated_at": datetime.fromisoformat,
+}
+
+# authors/genres -> (link table, link column)
+LINK_TABLES = {table: (link_table, column) for table, link_table, column in STATS_TABLES}
+
+
+async def upsert_names(db: aiosqlite.Connection, table: str, names: List[str]) -> Dict[str, int]:
+    # name -> id for authors or genres, creating the missing ones. ON
+    # CONFLICT makes concurrent writers creating the same name harmless.
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    await db.executemany(
+        f"INSERT INTO {table} (name) VALUES (?) ON CONFLICT (name) DO NOTHING",
+        ((name,) for name in names),
+    )
+    ids = {}
+    for start in range(0, len(names), IN_CHUNK_SIZE):
+        chunk = names[start:start + IN_CHUNK_SIZE]
+        placeholders = ", ".join("?" for _ in chunk)
+        async with db.execute(f"SELECT id, name FROM {table} WHERE name IN ({placeholders})", chunk) as cursor:
+            for row in await cursor.fetchall():
+                ids[row[1]] = row[0]
+    return ids
 
 
 class BookService:
-    def __init__(self, db: aiosqlite.Connection):
+    def __init__(
+        self,
+        db: aiosqlite.Connection,
+        cache: Optional[BookCache] = None,
+        autocommit: bool = True,
+        suggest: Optional[SuggestIndex] = None,
+    ):
+        # autocommit=False leaves committing (and the cache invalidation
+        # and suggestion updates that have to follow it) to the caller,
+        # see GroupCommitter
         self.db = db
+        self.cache = cache
+        self.autocommit = autocommit
+        self.suggest = suggest
+        self.uncommitted_ids: List[int] = []
+        self.uncommitted_suggestions: List[Weights] = []
+        self._cache_synced = False
+        # Titles, authors and genres whose suggestion weight the current
+        # write may change
+        self._touched: Touched = {}
 
     async def create_book(self, book_data: BookCreate) -> BookResponse:
         async with self.db.cursor() as cursor:
             # Insert book
-            await cursor.execute("""
-                INSERT INTO books (title, publication_year, isbn, copies_available, is_active)
-                VALUES (?, ?, ?, ?, ?)
+            await cursor.execute(f"""
+                INSERT INTO books (title, publication_year, isbn, copies_available, is_active,
+                                   created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, {NOW_SQL}, {NOW_SQL})
+                RETURNING *
             """, (
                 book_data.title,
                 book_data.publication_year,
@@ -22,118 +92,300 @@ class BookService:
                 book_data.copies_available,
                 book_data.is_active,
             ))
+            book_row = await cursor.fetchone()
+            book_id = book_row["id"]
 
-            book_id = cursor.lastrowid
-
-            # Process authors
-            author_ids = []
-            for author_name in book_data.authors:
-                author_id = await self._get_or_create_author(author_name)
-                author_ids.append(author_id)
-
-            # Process genres
-            genre_ids = []
-            for genre_name in book_data.genres:
-                genre_id = await self._get_or_create_genre(genre_name)
-                genre_ids.append(genre_id)
-
-            # Create book-author relationships
-            for author_id in author_ids:
-                await cursor.execute("""
-                    INSERT INTO book_authors (book_id, author_id)
-                    VALUES (?, ?)
-                """, (book_id, author_id))
-
-            # Create book-genre relationships
-            for genre_id in genre_ids:
-                await cursor.execute("""
-                    INSERT INTO book_genres (book_id, genre_id)
-                    VALUES (?, ?)
-                """, (book_id, genre_id))
+            authors = await self._link_names(cursor, book_id, "authors", book_data.authors)
+            genres = await self._link_names(cursor, book_id, "genres", book_data.genres)
 
-            await self.db.commit()
+            await self._index_book(cursor, book_id)
+            await self._count_book(cursor, book_id, 1)
+            await self._bump_catalog_version(cursor)
+            self._touch(book_row["title"], authors, genres)
+            await self._commit()
 
-            return await self.get_book_by_id(book_id)
+        # Everything in the response is already at hand
+        with timed("hydrate"):
+            return self._book_from_row(book_row, authors, genres)
 
-    async def _get_or_create_author(self, name: str) -> int:
-        async with self.db.cursor() as cursor:
-            await cursor.execute("""
-                SELECT id FROM authors WHERE name = ?
-            """, (name,))
+    async def _bump_catalog_version(self, cursor: aiosqlite.Cursor) -> None:
+        await cursor.execute(f"""
+            UPDATE catalog_version SET version = version + 1, updated_at = {NOW_SQL}
+        """)
+
+    async def get_catalog_version(self) -> Tuple[int, datetime]:
+        async with self.db.execute("SELECT version, updated_at FROM catalog_version") as cursor:
             row = await cursor.fetchone()
+        return row["version"], datetime.fromisoformat(row["updated_at"])
 
-            if row:
-                return row["id"]
-            else:
-                await cursor.execute("""
-                    INSERT INTO authors (name) VALUES (?)
-                """, (name,))
-                return cursor.lastrowid
+    async def _sync_cache(self) -> None:
+        # Other processes write the same file (WORKERS > 1)
+        # Checked once per service, which lives for one request
+        if self.cache is not None and self.cache.shared_database and not self._cache_synced:
+            version, _ = await self.get_catalog_version()
+            self.cache.sync(version)
+            self._cache_synced = True
 
-    async def _get_or_create_genre(self, name: str) -> int:
-        async with self.db.cursor() as cursor:
-            await cursor.execute("""
-                SELECT id FROM genres WHERE name = ?
-            """, (name,))
+    async def get_book_updated_at(self, book_id: int) -> datetime:
+        # Cheap freshness check for conditional GETs, no hydration
+        if self.cache is not None:
+            await self._sync_cache()
+            book = self.cache.get(book_id)
+            if book is not None:
+                return book.updated_at
+        async with self.db.execute("SELECT updated_at FROM books WHERE id = ?", (book_id,)) as cursor:
             row = await cursor.fetchone()
+        if not row:
+            raise NotFoundError(f"Book with id {book_id} not found")
+        return datetime.fromisoformat(row["updated_at"])
 
-            if row:
-                return row["id"]
-            else:
-                await cursor.execute("""
-                    INSERT INTO genres (name) VALUES (?)
-                """, (name,))
-                return cursor.lastrowid
+    async def _commit(self, *book_ids: int) -> None:
+        # Cached copies of written books are dropped only once the write is
+        # committed, so a concurrent read cannot cache the old row again.
+        # Suggestion weights are read inside the transaction, applied after.
+        suggestions = None
+        if self._touched:
+            suggestions = await read_weights(self.db, self._touched)
+            self._touched = {}
+        if self.autocommit:
+            await self.db.commit()
+            self._invalidate(*book_ids)
+            if suggestions:
+                self.suggest.apply(suggestions)
+        else:
+            self.uncommitted_ids.extend(book_ids)
+            if suggestions:
+                self.uncommitted_suggestions.append(suggestions)
+
+    def _touch(
+        self, title: Optional[str], authors: Iterable[Dict[str, Any]], genres: Iterable[Dict[str, Any]]
+    ) -> None:
+        if self.suggest is None:
+            return
+        for kind, names in (
+            ("titles", [title] if title is not None else []),
+            ("authors", [item["name"] for item in authors]),
+            ("genres", [item["name"] for item in genres]),
+        ):
+            if names:
+                self._touched.setdefault(kind, set()).update(names)
+
+    async def _touch_current(self, cursor: aiosqlite.Cursor, book_id: int) -> None:
+        # Names of the book as stored, before a write changes them
+        if self.suggest is None:
+            return
+        await cursor.execute("SELECT title FROM books WHERE id = ?", (book_id,))
+        row = await cursor.fetchone()
+        if row is None:
+            return
+        authors = (await self._load_links(cursor, "authors", [book_id]))[book_id]
+        genres = (await self._load_links(cursor, "genres", [book_id]))[book_id]
+        self._touch(row["title"], authors, genres)
+
+    def _invalidate(self, *book_ids: int) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(book_ids)
+
+    async def _index_book(self, cursor: aiosqlite.Cursor, book_id: int) -> None:
+        # Refresh the author sort key and the full-text search document
+        await cursor.execute(f"""
+            UPDATE books SET sort_author = {SORT_AUTHOR_SQL} WHERE id = ?
+        """, (book_id,))
+        await cursor.execute("DELETE FROM books_fts WHERE rowid = ?", (book_id,))
+        await cursor.execute(f"""
+            INSERT INTO books_fts (rowid, title, authors)
+            {SEARCH_DOCUMENT_SQL}
+            WHERE b.id = ?
+        """, (book_id,))
+
+    async def _count_book(self, cursor: aiosqlite.Cursor, book_id: int, sign: int) -> None:
+        # Adds (sign=1) or removes (sign=-1) the book from the counters of its
+        # current authors and genres; writes that change links or is_active
+        # uncount the book first and count it again afterwards
+        for table, link_table, column in STATS_TABLES:
+            await cursor.execute(f"""
+                UPDATE {table}
+                SET book_count = book_count + ?,
+                    active_book_count = active_book_count + ? * (
+                        SELECT is_active = TRUE FROM books WHERE id = ?
+                    )
+                WHERE id IN (SELECT {column} FROM {link_table} WHERE book_id = ?)
+            """, (sign, sign, book_id, book_id))
+
+    async def _link_names(
+        self, cursor: aiosqlite.Cursor, book_id: int, table: str, names: List[str]
+    ) -> List[Dict[str, Any]]:
+        # Links the book to authors or genres by name (replacing existing
+        # links is up to the caller) and returns them in the given order
+        link_table, column = LINK_TABLES[table]
+        ids = await upsert_names(self.db, table, names)
+        linked = [{"id": ids[name], "name": name} for name in dict.fromkeys(names)]
+        await cursor.executemany(
+            f"INSERT INTO {link_table} (book_id, {column}) VALUES (?, ?)",
+            [(book_id, item["id"]) for item in linked],
+        )
+        return linked
 
     async def get_book_by_id(self, book_id: int) -> BookResponse:
+        books = await self.get_books_by_ids([book_id])
+        if not books:
+            raise NotFoundError(f"Book with id {book_id} not found")
+        return books[0]
+
+    async def get_books_batch(self, book_ids: List[int], fields: Optional[Sequence[str]] = None) -> Dict[int, Any]:
+        # id -> book for the ids that exist; repeated ids are read once but
+        # count towards the limit, which bounds the request as sent.
+        # With fields, the books are dicts of those fields
+        if len(book_ids) > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} books per request")
+        unique_ids = list(dict.fromkeys(book_ids))
+        if fields is not None:
+            return {book["id"]: book for book in await self.get_book_fields(unique_ids, fields)}
+        return {book.id: book for book in await self.get_books_by_ids(unique_ids)}
+
+    async def get_book_fields(self, book_ids: List[int], fields: Sequence[str]) -> List[Dict[str, Any]]:
+        # Sparse get_books_by_ids: plain dicts with only `fields`, no models.
+        # Cached books are projected; the rest are read with a SELECT of
+        # just those columns, joining authors and genres only when asked
+        projected: Dict[int, Dict[str, Any]] = {}
+        if self.cache is not None:
+            await self._sync_cache()
+            for book_id in book_ids:
+                book = self.cache.get(book_id)
+                if book is not None:
+                    projected[book_id] = {field: getattr(book, field) for field in fields}
+
+        missing = [book_id for book_id in dict.fromkeys(book_ids) if book_id not in projected]
+        if missing:
+            projected.update(await self._load_fields(missing, fields))
+        return [projected[book_id] for book_id in book_ids if book_id in projected]
+
+    async def _load_fields(self, book_ids: List[int], fields: Sequence[str]) -> Dict[int, Dict[str, Any]]:
+        columns = [field for field in fields if field in COLUMN_FIELDS and field != "id"]
+        placeholders = ", ".join("?" for _ in book_ids)
         async with self.db.cursor() as cursor:
-            await cursor.execute("""
-                SELECT * FROM books WHERE id = ?
-            """, (book_id,))
-            book_row = await cursor.fetchone()
+            await cursor.execute(f"""
+                SELECT {', '.join(["id", *columns])} FROM books WHERE id IN ({placeholders})
+            """, book_ids)
+            rows = await cursor.fetchall()
+            if not rows:
+                return {}
 
-            if not book_row:
-                raise NotFoundError(f"Book with id {book_id} not found")
+            found = [row["id"] for row in rows]
+            links = {
+                table: await self._load_links(cursor, table, found)
+                for table in ("authors", "genres")
+                if table in fields
+            }
 
-            # Get authors
-            await cursor.execute("""
-                SELECT a.id, a.name 
-                FROM authors a
-                JOIN book_authors ba ON a.id = ba.author_id
-                WHERE ba.book_id = ?
-            """, (book_id,))
-            author_rows = await cursor.fetchall()
-            authors = [Author(id=row["id"], name=row["name"]) for row in author_rows]
-
-            # Get genres
-            await cursor.execute("""
-                SELECT g.id, g.name 
-                FROM genres g
-                JOIN book_genres bg ON g.id = bg.genre_id
-                WHERE bg.book_id = ?
-            """, (book_id,))
-            genre_rows = await cursor.fetchall()
-            genres = [Genre(id=row["id"], name=row["name"]) for row in genre_rows]
-
-            return BookResponse(
-                id=book_row["id"],
-                title=book_row["title"],
-                authors=authors,
-                genres=genres,
-                publication_year=book_row["publication_year"],
-                isbn=book_row["isbn"],
-                copies_available=book_row["copies_available"],
-                is_active=book_row["is_active"],
-                created_at=book_row["created_at"],
-                updated_at=book_row["updated_at"],
-            )
+        with timed("hydrate"):
+            converters = [(field, COLUMN_FIELDS.get(field)) for field in fields]
+            projected = {}
+            for row in rows:
+                item = {}
+                for field, convert in converters:
+                    if convert is None:
+                        item[field] = links[field][row["id"]]
+                    else:
+                        value = row[field]
+                        item[field] = value if value is None else convert(value)
+                projected[row["id"]] = item
+            return projected
+
+    async def get_books_by_ids(self, book_ids: List[int]) -> List[BookResponse]:
+        # Missing ids are skipped and the result keeps the order of book_ids
+        if self.cache is None:
+            return await self._load_books(book_ids)
+
+        await self._sync_cache()
+        cached = {}
+        for book_id in book_ids:
+            book = self.cache.get(book_id)
+            if book is not None:
+                cached[book_id] = book
+
+        missing = [book_id for book_id in book_ids if book_id not in cached]
+        if missing:
+            token = self.cache.token()
+            for book in await self._load_books(missing):
+                self.cache.put(book, token)
+                cached[book.id] = book
+
+        return [cached[book_id] for book_id in book_ids if book_id in cached]
+
+    async def _load_books(self, book_ids: List[int]) -> List[BookResponse]:
+        # Hydrates a whole page in three queries
+        if not book_ids:
+            return []
+
+        placeholders = ", ".join("?" for _ in book_ids)
+        async with self.db.cursor() as cursor:
+            await cursor.execute(f"""
+                SELECT * FROM books WHERE id IN ({placeholders})
+            """, book_ids)
+            book_rows = {row["id"]: row for row in await cursor.fetchall()}
+
+            if not book_rows:
+                return []
+
+            authors = await self._load_links(cursor, "authors", list(book_rows))
+            genres = await self._load_links(cursor, "genres", list(book_rows))
+
+        with timed("hydrate"):
+            return [
+                self._book_from_row(book_rows[book_id], authors[book_id], genres[book_id])
+                for book_id in book_ids
+                if book_id in book_rows
+            ]
+
+    async def _load_links(
+        self, cursor: aiosqlite.Cursor, table: str, book_ids: List[int]
+    ) -> Dict[int, List[Dict[str, Any]]]:
+        # book id -> authors or genres of the book, in link order
+        link_table, column = LINK_TABLES[table]
+        placeholders = ", ".join("?" for _ in book_ids)
+        links: Dict[int, List[Dict[str, Any]]] = {book_id: [] for book_id in book_ids}
+        await cursor.execute(f"""
+            SELECT l.book_id, t.id, t.name
+            FROM {link_table} l
+            JOIN {table} t ON t.id = l.{column}
+            WHERE l.book_id IN ({placeholders})
+            ORDER BY l.book_id, l.rowid
+        """, book_ids)
+        for row in await cursor.fetchall():
+            links[row["book_id"]].append({"id": row["id"], "name": row["name"]})
+        return links
+
+    def _book_from_row(
+        self, book_row: aiosqlite.Row, authors: List[Dict[str, Any]], genres: List[Dict[str, Any]]
+    ) -> BookResponse:
+        # Authors and genres go in as plain dicts: pydantic-core builds the
+        # nested models faster than model_construct() does from Python
+        return BookResponse(
+            id=book_row["id"],
+            title=book_row["title"],
+            authors=authors,
+            genres=genres,
+            publication_year=book_row["publication_year"],
+            isbn=book_row["isbn"],
+            copies_available=book_row["copies_available"],
+            is_active=book_row["is_active"],
+            created_at=book_row["created_at"],
+            updated_at=book_row["updated_at"],
+        )
 
     async def update_book(self, book_id: int, book_data: BookUpdate) -> BookResponse:
         async with self.db.cursor() as cursor:
-            # Check if book exists
-            await cursor.execute("SELECT id FROM books WHERE id = ?", (book_id,))
-            if not await cursor.fetchone():
-                raise NotFoundError(f"Book with id {book_id} not found")
+            recount = (
+                book_data.authors is not None
+                or book_data.genres is not None
+                or book_data.is_active is not None
+            )
+            if recount:
+                # A no-op when the book does not exist
+                await self._count_book(cursor, book_id, -1)
+            if recount or book_data.title is not None:
+                await self._touch_current(cursor, book_id)
 
             # Build update query
             updates = []
@@ -154,53 +406,145 @@ class BookService:
                 updates.append("is_active = ?")
                 params.append(book_data.is_active)
 
-            if updates:
-                updates.append("updated_at = CURRENT_TIMESTAMP")
-                query = f"UPDATE books SET {', '.join(updates)} WHERE id = ?"
-                params.append(book_id)
-                await cursor.execute(query, params)
+            updates.append(f"updated_at = {NOW_SQL}")
+            query = f"UPDATE books SET {', '.join(updates)} WHERE id = ? RETURNING *"
+            params.append(book_id)
+            await cursor.execute(query, params)
+            book_row = await cursor.fetchone()
+            if not book_row:
+                raise NotFoundError(f"Book with id {book_id} not found")
 
-            # Update authors if provided
+            # Replace links that were provided, read the others
             if book_data.authors is not None:
                 await cursor.execute("DELETE FROM book_authors WHERE book_id = ?", (book_id,))
-                for author_name in book_data.authors:
-                    author_id = await self._get_or_create_author(author_name)
-                    await cursor.execute("""
-                        INSERT INTO book_authors (book_id, author_id)
-                        VALUES (?, ?)
-                    """, (book_id, author_id))
-
-            # Update genres if provided
+                authors = await self._link_names(cursor, book_id, "authors", book_data.authors)
+            else:
+                authors = (await self._load_links(cursor, "authors", [book_id]))[book_id]
             if book_data.genres is not None:
                 await cursor.execute("DELETE FROM book_genres WHERE book_id = ?", (book_id,))
-                for genre_name in book_data.genres:
-                    genre_id = await self._get_or_create_genre(genre_name)
-                    await cursor.execute("""
-                        INSERT INTO book_genres (book_id, genre_id)
-                        VALUES (?, ?)
-                    """, (book_id, genre_id))
+                genres = await self._link_names(cursor, book_id, "genres", book_data.genres)
+            else:
+                genres = (await self._load_links(cursor, "genres", [book_id]))[book_id]
 
-            await self.db.commit()
-            return await self.get_book_by_id(book_id)
+            if book_data.title is not None or book_data.authors is not None:
+                await self._index_book(cursor, book_id)
+            if recount:
+                await self._count_book(cursor, book_id, 1)
+            if recount or book_data.title is not None:
+                self._touch(book_row["title"], authors, genres)
+
+            await self._bump_catalog_version(cursor)
+            await self._commit(book_id)
+            with timed("hydrate"):
+                return self._book_from_row(book_row, authors, genres)
 
     async def delete_book(self, book_id: int, soft_delete: bool = True) -> None:
         async with self.db.cursor() as cursor:
+            await self._touch_current(cursor, book_id)
+            await self._count_book(cursor, book_id, -1)
             if soft_delete:
-                await cursor.execute("""
-                    UPDATE books SET is_active = FALSE WHERE id = ?
+                await cursor.execute(f"""
+                    UPDATE books SET is_active = FALSE, updated_at = {NOW_SQL} WHERE id = ?
                 """, (book_id,))
+                await self._count_book(cursor, book_id, 1)
             else:
                 await cursor.execute("DELETE FROM books WHERE id = ?", (book_id,))
-            await self.db.commit()
+                await cursor.execute("DELETE FROM books_fts WHERE rowid = ?", (book_id,))
+            await self._bump_catalog_version(cursor)
+            await self._commit(book_id)
+
+    async def checkout_books(self, book_ids: List[int]) -> Dict[int, int]:
+        # Takes one copy per occurrence of an id, all or nothing
+        return await self._move_copies(book_ids, -1)
+
+    async def return_books(self, book_ids: List[int]) -> Dict[int, int]:
+        return await self._move_copies(book_ids, 1)
+
+    async def _move_copies(self, book_ids: List[int], sign: int) -> Dict[int, int]:
+        # One conditional UPDATE for the whole cart; returns book id -> copies
+        # left. Nothing is hydrated: only the counters change.
+        if not book_ids:
+            raise ValueError("No book ids given")
+        if len(book_ids) > MAX_CART_SIZE:
+            raise ValueError(f"At most {MAX_CART_SIZE} books per request")
+        cart: Dict[int, int] = {}
+        for book_id in book_ids:
+            cart[book_id] = cart.get(book_id, 0) + 1
+
+        values = ", ".join("(?, ?)" for _ in cart)
+        params: List[Any] = [value for item in cart.items() for value in item]
+        # Starts with UPDATE (not WITH) so that sqlite3 opens the transaction
+        async with self.db.execute(f"""
+            UPDATE books
+            SET copies_available = copies_available + ? * cart.copies, updated_at = {NOW_SQL}
+            FROM (SELECT column1 AS id, column2 AS copies FROM (VALUES {values})) AS cart
+            WHERE books.id = cart.id AND books.is_active = TRUE
+              AND books.copies_available + ? * cart.copies >= 0
+            RETURNING books.id, books.copies_available
+        """, [sign] + params + [sign]) as cursor:
+            moved = {row[0]: row[1] for row in await cursor.fetchall()}
+
+        if len(moved) < len(cart):
+            # Raising makes the caller roll back the part that went through
+            await self._reject_cart([book_id for book_id in cart if book_id not in moved])
 
-    async def list_books(self, page: int = 1, per_page: int = 10) -> List[BookResponse]:
+        async with self.db.cursor() as cursor:
+            await self._bump_catalog_version(cursor)
+        await self._commit(*moved)
+        return {book_id: moved[book_id] for book_id in cart}
+
+    async def _reject_cart(self, failed_ids: List[int]) -> None:
+        placeholders = ", ".join("?" for _ in failed_ids)
+        async with self.db.execute(f"""
+            SELECT id FROM books WHERE id IN ({placeholders}) AND is_active = TRUE
+        """, failed_ids) as cursor:
+            existing = {row[0] for row in await cursor.fetchall()}
+        missing = [book_id for book_id in failed_ids if book_id not in existing]
+        if missing:
+            raise NotFoundError(f"Books not found: {', '.join(map(str, missing))}")
+        raise ConflictError(f"No copies available: {', '.join(map(str, failed_ids))}")
+
+    async def list_books(
+        self, page: int = 1, per_page: int = 10, fields: Optional[Sequence[str]] = None
+    ) -> List[Any]:
         async with self.db.cursor() as cursor:
             offset = (page - 1) * per_page
             await cursor.execute("""
                 SELECT id FROM books 
                 WHERE is_active = TRUE
-                ORDER BY title
+                ORDER BY title, id
                 LIMIT ? OFFSET ?
             """, (per_page, offset))
             book_ids = [row["id"] for row in await cursor.fetchall()]
-            return [await self.get_book_by_id(book_id) for book_id in book_ids]
\ No newline at end of file
+            return await self.get_books_page(book_ids, fields)
+
+    async def get_books_page(self, book_ids: List[int], fields: Optional[Sequence[str]] = None) -> List[Any]:
+        # Full books, or only `fields` of them (see get_book_fields)
+        if fields is None:
+            return await self.get_books_by_ids(book_ids)
+        return await self.get_book_fields(book_ids, fields)
+
+    async def list_books_after(
+        self, cursor: Optional[str], per_page: int = 10, fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[Any], Optional[str]]:
+        # Keyset variant of list_books: the page after `cursor` and the
+        # cursor of the page that follows it (None on the last page)
+        after = decode_cursor(cursor, "title:asc")
+        query = "SELECT id, title FROM books WHERE is_active = TRUE"
+        params: List[Any] = []
+        if after is not None:
+            query += " AND (title, id) > (?, ?)"
+            params.extend(after)
+        query += " ORDER BY title, id LIMIT ?"
+        params.append(per_page + 1)
+
+        async with self.db.execute(query, params) as db_cursor:
+            rows = await db_cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            next_cursor = encode_cursor("title:asc", [rows[-1]["title"], rows[-1]["id"]])
+
+        books = await self.get_books_page([row["id"] for row in rows], fields)
+        return books, next_cursor
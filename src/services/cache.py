@@ -0,0 +1,208 @@
+import asyncio
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from models.book import BookResponse
+
+
+def estimate_size(book: BookResponse) -> int:
+    # Rough in-memory footprint of a cached book, in bytes
+    size = sys.getsizeof(book) + sys.getsizeof(book.__dict__)
+    size += sys.getsizeof(book.title) + sys.getsizeof(book.isbn or "")
+    for item in (*book.authors, *book.genres):
+        size += sys.getsizeof(item) + sys.getsizeof(item.__dict__) + sys.getsizeof(item.name)
+    return size
+
+
+class BookCache:
+    """Bounded LRU cache of hydrated books keyed by id, with a TTL.
+
+    With `shared_database` the catalog is also written by other processes,
+    whose invalidations never reach this cache; readers then pass the
+    catalog version to `sync` before using it, and the cache empties
+    itself whenever the version moved.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 300.0,
+        shared_database: bool = False,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.shared_database = shared_database
+        self._version: Optional[int] = None
+        self._entries: "OrderedDict[int, Tuple[BookResponse, float, int]]" = OrderedDict()
+        self._bytes = 0
+        # Bumped by every invalidation; a fill that started before the last
+        # invalidation may carry a stale row and is dropped
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.syncs_cleared = 0
+
+    def get(self, book_id: int) -> Optional[BookResponse]:
+        entry = self._entries.get(book_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        book, expires_at, _ = entry
+        if expires_at < time.monotonic():
+            self._remove(book_id)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(book_id)
+        self.hits += 1
+        return book
+
+    def token(self) -> int:
+        # Taken before reading from the database, handed back to put()
+        return self._generation
+
+    def put(self, book: BookResponse, token: int) -> None:
+        if token != self._generation:
+            return
+        size = estimate_size(book)
+        if size > self.max_bytes:
+            return
+        self._remove(book.id)
+        self._entries[book.id] = (book, time.monotonic() + self.ttl, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, book_ids: Iterable[int]) -> None:
+        self._generation += 1
+        for book_id in book_ids:
+            if self._remove(book_id):
+                self.invalidations += 1
+
+    def sync(self, version: int) -> None:
+        if self._version is not None and version != self._version:
+            self.clear()
+            self.syncs_cleared += 1
+        self._version = version
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, book_id: int) -> bool:
+        entry = self._entries.pop(book_id, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[2]
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "syncs_cleared": self.syncs_cleared,
+        }
+
+
+class _LoaderCancelled(Exception):
+    # Tells waiters to load for themselves: the request they joined went away
+    pass
+
+
+class SearchCache:
+    """Bounded LRU cache of search results: matching ids and the total.
+
+    Entries are labelled with the catalog version the search was read at;
+    every write bumps the version, so an entry only answers requests that
+    see the same version and needs no invalidation of its own. Identical
+    searches that miss at the same time share one database run.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        # Newest catalog version seen; entries of older versions are dead
+        self._version = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._loading: Dict[Tuple[Hashable, int], "asyncio.Future[Any]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expired = 0
+
+    async def get_or_load(self, key: Hashable, version: int, load: Callable[[], Awaitable[Any]]) -> Any:
+        # `load` runs the search; its result must not be mutated afterwards
+        if version > self._version:
+            self.expired += len(self._entries)
+            self._entries.clear()
+            self._version = version
+
+        if version == self._version and key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        pending = self._loading.get((key, version))
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                # shield: a waiter going away must not cancel the shared run
+                return await asyncio.shield(pending)
+            except _LoaderCancelled:
+                return await load()
+
+        self.misses += 1
+        future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        self._loading[(key, version)] = future
+        try:
+            result = await load()
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else _LoaderCancelled())
+            # Marks it retrieved, for when nobody was waiting
+            future.exception()
+            raise
+        finally:
+            del self._loading[(key, version)]
+        future.set_result(result)
+        # A search that read an older version than the newest seen is
+        # already out of date
+        if version == self._version and self.max_entries > 0:
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            # Coalesced requests did not run the search either
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+from datetime import datetime
+from contextlib import AbstractAsyncContextManager
+from typing import Any, AsyncIterator, Callable, Dict
+
+from models.book import BookSearchParams
+from services.search_service import SearchService
+from utils.pagination import encode_cursor
+from utils.serialization import dumps
+
+EXPORT_FORMATS = ("ndjson", "csv")
+CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# Same columns as the import format, plus the fields the database assigns
+CSV_COLUMNS = (
+    "id", "title", "authors", "genres", "publication_year", "isbn",
+    "copies_available", "is_active", "created_at", "updated_at",
+)
+LIST_SEPARATOR = ";"
+
+# Authors and genres are aggregated next to each book in the same
+# statement, so streaming the catalog never issues per-row queries. The
+# id and sort key come first from the search query itself.
+EXPORT_COLUMNS = """
+    b.title, b.publication_year, b.isbn, b.copies_available, b.is_active,
+    b.created_at, b.updated_at,
+    (SELECT json_group_array(json_object('id', id, 'name', name)) FROM (
+        SELECT a.id, a.name FROM book_authors ba
+        JOIN authors a ON a.id = ba.author_id
+        WHERE ba.book_id = b.id
+        ORDER BY ba.rowid
+    )) AS authors,
+    (SELECT json_group_array(json_object('id', id, 'name', name)) FROM (
+        SELECT g.id, g.name FROM book_genres bg
+        JOIN genres g ON g.id = bg.genre_id
+        WHERE bg.book_id = b.id
+        ORDER BY bg.rowid
+    )) AS genres
+"""
+
+
+class ExportService:
+    """Streams the catalog, optionally filtered like a search, as NDJSON or CSV.
+
+    Books are read in keyset pages of `fetch_size` and encoded into buffers
+    of about `buffer_size` bytes, so memory use does not depend on the size
+    of the catalog. `reader` returns an async context manager yielding a
+    read connection; it is entered once per page, so a client that reads
+    slowly holds neither a pooled connection nor a WAL snapshot, at the
+    price of the pages not sharing one snapshot.
+    """
+
+    def __init__(
+        self,
+        reader: Callable[[], AbstractAsyncContextManager],
+        buffer_size: int = 64 * 1024,
+        fetch_size: int = 500,
+    ):
+        self.reader = reader
+        self.buffer_size = buffer_size
+        self.fetch_size = fetch_size
+
+    async def iter_books(self, params: BookSearchParams) -> AsyncIterator[Dict[str, Any]]:
+        # Same filters and sort order as /api/books/search; paging is ignored.
+        # Without sort_by the books come out in id order straight from the table.
+        cursor = ""
+        while True:
+            page = params.model_copy(update={"cursor": cursor})
+            async with self.reader() as db:
+                query, query_params, order_name = SearchService(db).build_search_query(
+                    page, extra_columns=EXPORT_COLUMNS
+                )
+                async with db.execute(f"{query} LIMIT ?", query_params + [self.fetch_size]) as db_cursor:
+                    rows = await db_cursor.fetchall()
+
+            for row in rows:
+                yield {
+                    "id": row["id"],
+                    "title": row["title"],
+                    "authors": json.loads(row["authors"]),
+                    "genres": json.loads(row["genres"]),
+                    "publication_year": row["publication_year"],
+                    "isbn": row["isbn"],
+                    "copies_available": row["copies_available"],
+                    "is_active": bool(row["is_active"]),
+                    "created_at": datetime.fromisoformat(row["created_at"]).isoformat(),
+                    "updated_at": datetime.fromisoformat(row["updated_at"]).isoformat(),
+                }
+            if len(rows) < self.fetch_size:
+                return
+            cursor = encode_cursor(order_name, [rows[-1]["sort_key"], rows[-1]["id"]])
+
+    async def export(self, params: BookSearchParams, fmt: str = "ndjson") -> AsyncIterator[bytes]:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if fmt == "csv":
+            writer.writerow(CSV_COLUMNS)
+
+        async for book in self.iter_books(params):
+            if fmt == "ndjson":
+                buffer.write(dumps(book).decode("utf-8"))
+                buffer.write("\n")
+            else:
+                writer.writerow([_csv_value(book[column]) for column in CSV_COLUMNS])
+            if buffer.tell() >= self.buffer_size:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+
+def _csv_value(value: Any) -> Any:
+    # Lists become ";"-separated names and booleans match the import format
+    if isinstance(value, list):
+        return LIST_SEPARATOR.join(item["name"] for item in value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
@@ -0,0 +1,181 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from models.pool import ConnectionPool
+from services.book_service import BookService
+from services.cache import BookCache
+from services.suggest_service import SuggestIndex, Weights
+
+WriteOperation = Callable[[BookService], Awaitable[Any]]
+
+
+class GroupCommitter:
+    """Coalesces concurrent writes into one transaction per batch.
+
+    Operations are queued by `submit` and run by a single background task.
+    A batch closes after `window` seconds or `max_batch` operations,
+    whichever comes first. Every operation runs inside its own SAVEPOINT,
+    so a failing write is rolled back and raises for its caller only. The
+    rest of the batch commits together, and callers are answered after
+    that commit.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        cache: Optional[BookCache] = None,
+        window: float = 0.002,
+        max_batch: int = 64,
+        suggest: Optional[SuggestIndex] = None,
+    ):
+        self.pool = pool
+        self.cache = cache
+        self.suggest = suggest
+        self.window = window
+        self.max_batch = max_batch
+        # None is the stop marker
+        self._queue: "asyncio.Queue[Optional[Tuple[WriteOperation, asyncio.Future]]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        # The batch being committed, failed with the task if it dies
+        self._batch: List[Tuple[WriteOperation, asyncio.Future]] = []
+        self.error: Optional[BaseException] = None
+        self.batches = 0
+        self.operations = 0
+        self.failed = 0
+        self.largest_batch = 0
+
+    def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        # Commits everything queued before the call, then ends the task
+        if self._task is not None:
+            self._stopping = True
+            self._queue.put_nowait(None)
+            await self._task
+            self._task = None
+
+    async def submit(self, operation: WriteOperation) -> Any:
+        # operation receives a BookService that must not commit itself
+        if self._task is None or self._task.done() or self._stopping:
+            raise RuntimeError("Group commit is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((operation, future))
+        return await future
+
+    async def _run(self) -> None:
+        # Whatever ends the task, no caller is left waiting: an error
+        # outside a batch's transaction (say, invalidating the cache after
+        # the commit) fails the batch and everything queued behind it
+        try:
+            await self._loop()
+        except Exception as e:
+            self.error = e
+            self._fail_pending(e)
+        finally:
+            self._fail_pending(RuntimeError("Group commit is not running"))
+
+    def _fail_pending(self, error: BaseException) -> None:
+        pending = [future for _, future in self._batch]
+        self._batch = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                pending.append(item[1])
+        for future in pending:
+            if not future.done():
+                self.failed += 1
+                future.set_exception(error)
+
+    async def _loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._batch = batch
+            await self._commit_batch(batch)
+            self._batch = []
+
+    async def _commit_batch(self, batch: List[Tuple[WriteOperation, asyncio.Future]]) -> None:
+        outcomes: List[Tuple[asyncio.Future, Any, Optional[BaseException]]] = []
+        written_ids: List[int] = []
+        suggestions: List[Weights] = []
+
+        try:
+            async with self.pool.writer() as db:
+                # IMMEDIATE takes the write lock up front: with several
+                # worker processes a deferred transaction could fail to
+                # upgrade its read lock instead of waiting for it
+                await db.execute("BEGIN IMMEDIATE")
+                for operation, future in batch:
+                    if future.cancelled():
+                        continue
+                    service = BookService(db, self.cache, autocommit=False, suggest=self.suggest)
+                    await db.execute("SAVEPOINT operation")
+                    try:
+                        result = await operation(service)
+                    except Exception as e:
+                        await db.execute("ROLLBACK TO operation")
+                        await db.execute("RELEASE operation")
+                        outcomes.append((future, None, e))
+                        continue
+                    await db.execute("RELEASE operation")
+                    written_ids.extend(service.uncommitted_ids)
+                    suggestions.extend(service.uncommitted_suggestions)
+                    outcomes.append((future, result, None))
+                await db.commit()
+        except Exception as e:
+            # The writer rolled the whole batch back
+            outcomes = [(future, None, e) for _, future in batch]
+            suggestions = []
+
+        if self.cache is not None and written_ids:
+            self.cache.invalidate(written_ids)
+        for weights in suggestions:
+            self.suggest.apply(weights)
+
+        self.batches += 1
+        self.operations += len(outcomes)
+        self.largest_batch = max(self.largest_batch, len(outcomes))
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+            if error is not None:
+                self.failed += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_seconds": self.window,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "operations": self.operations,
+            "failed": self.failed,
+            "largest_batch": self.largest_batch,
+            "average_batch": round(self.operations / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+            "error": None if self.error is None else str(self.error),
+        }
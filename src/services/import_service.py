@@ -0,0 +1,210 @@
+import csv
+import json
+import time
+from collections import Counter
+from contextlib import AbstractAsyncContextManager
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import aiosqlite
+from pydantic import ValidationError
+
+from models.book import BookCreate
+from models.migrations import NOW_SQL
+from services.book_service import upsert_names
+from services.suggest_service import SuggestIndex, read_weights
+
+IMPORT_FORMATS = ("ndjson", "csv")
+LIST_SEPARATOR = ";"
+MAX_REPORTED_ERRORS = 100
+
+Record = Tuple[int, Union[Dict[str, Any], Exception]]
+
+
+async def parse_records(lines: AsyncIterator[bytes], fmt: str = "ndjson") -> AsyncIterator[Record]:
+    # Yields (line number, record or parse error) one line at a time.
+    # CSV needs a header row; list columns are separated by ";" and quoted
+    # fields may not span lines.
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+    header: Optional[List[str]] = None
+    line_no = 0
+    async for raw in lines:
+        line_no += 1
+        try:
+            line = raw.decode("utf-8").lstrip("\ufeff").strip()
+            if not line:
+                continue
+            if fmt == "ndjson":
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("expected a JSON object")
+            elif header is None:
+                header = [name.strip() for name in next(csv.reader([line]))]
+                continue
+            else:
+                values = next(csv.reader([line]))
+                record = {name: value for name, value in zip(header, values) if value != ""}
+                for name in ("authors", "genres"):
+                    if name in record:
+                        record[name] = [item.strip() for item in record[name].split(LIST_SEPARATOR) if item.strip()]
+        except (ValueError, csv.Error) as e:
+            # csv.Error (e.g. a field over csv.field_size_limit) is not a
+            # ValueError, but is just as much a problem of this line only
+            yield line_no, e
+            continue
+        yield line_no, record
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+
+    def add_error(self, line_no: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": error})
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.imported / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+class ImportService:
+    """Bulk loader: validates rows one by one and writes them in batches.
+
+    `writer` returns an async context manager yielding the write connection;
+    it is entered once per batch so other writes can interleave.
+    """
+
+    def __init__(
+        self,
+        writer: Callable[[], AbstractAsyncContextManager],
+        batch_size: int = 5000,
+        suggest: Optional[SuggestIndex] = None,
+    ):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.suggest = suggest
+        # name -> id, shared across batches of one import
+        self._author_ids: Dict[str, int] = {}
+        self._genre_ids: Dict[str, int] = {}
+
+    async def import_records(self, records: AsyncIterator[Record]) -> Dict[str, Any]:
+        report = ImportReport()
+        batch: List[Tuple[int, BookCreate]] = []
+
+        async for line_no, record in records:
+            if isinstance(record, Exception):
+                report.add_error(line_no, f"Invalid record: {record}")
+                continue
+            try:
+                batch.append((line_no, BookCreate(**record)))
+            except (ValidationError, TypeError) as e:
+                report.add_error(line_no, str(e))
+                continue
+            if len(batch) >= self.batch_size:
+                await self._write_batch(batch, report)
+                batch = []
+
+        if batch:
+            await self._write_batch(batch, report)
+        return report.as_dict()
+
+    async def _write_batch(self, batch: List[Tuple[int, BookCreate]], report: ImportReport) -> None:
+        async with self.writer() as db:
+            try:
+                await self._insert_batch(db, [book for _, book in batch])
+                await db.commit()
+            except Exception as e:
+                # Keep the ids cache in step with what was rolled back
+                await db.rollback()
+                self._author_ids.clear()
+                self._genre_ids.clear()
+                for line_no, _ in batch:
+                    report.add_error(line_no, f"Batch rejected by the database: {e}")
+                return
+            if self.suggest is not None:
+                # Still holding the writer, so nothing has changed since
+                self.suggest.apply(await read_weights(db, {
+                    "titles": {book.title for _, book in batch},
+                    "authors": {name for _, book in batch for name in book.authors},
+                    "genres": {name for _, book in batch for name in book.genres},
+                }))
+        report.imported += len(batch)
+
+    async def _insert_batch(self, db: aiosqlite.Connection, books: List[BookCreate]) -> None:
+        author_ids = await self._resolve_names(db, "authors", self._author_ids, (n for b in books for n in b.authors))
+        genre_ids = await self._resolve_names(db, "genres", self._genre_ids, (n for b in books for n in b.genres))
+
+        # Ids are assigned here (we hold the only writer) so that the link
+        # rows can be written with executemany as well
+        async with db.execute("""
+            SELECT max(coalesce((SELECT max(id) FROM books), 0),
+                       coalesce((SELECT seq FROM sqlite_sequence WHERE name = 'books'), 0))
+        """) as cursor:
+            next_id = (await cursor.fetchone())[0] + 1
+
+        book_rows, author_links, genre_links, fts_rows = [], [], [], []
+        # id -> [books, active books] for the stats counters
+        author_counts: Dict[int, Counter] = {}
+        genre_counts: Dict[int, Counter] = {}
+        for book_id, book in enumerate(books, start=next_id):
+            book_rows.append((
+                book_id, book.title, book.publication_year, book.isbn,
+                book.copies_available, book.is_active, min(book.authors, default=""),
+            ))
+            for ids, links, counts, names in (
+                (author_ids, author_links, author_counts, book.authors),
+                (genre_ids, genre_links, genre_counts, book.genres),
+            ):
+                for name_id in dict.fromkeys(ids[name] for name in names):
+                    links.append((book_id, name_id))
+                    counts.setdefault(name_id, Counter()).update(books=1, active=int(book.is_active))
+            fts_rows.append((book_id, _fold(book.title), _fold(" ".join(book.authors))))
+
+        await db.executemany(f"""
+            INSERT INTO books (id, title, publication_year, isbn, copies_available, is_active,
+                               sort_author, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, {NOW_SQL}, {NOW_SQL})
+        """, book_rows)
+        await db.executemany("""
+            INSERT INTO book_authors (book_id, author_id) VALUES (?, ?)
+        """, author_links)
+        await db.executemany("""
+            INSERT INTO book_genres (book_id, genre_id) VALUES (?, ?)
+        """, genre_links)
+        await db.executemany("""
+            INSERT INTO books_fts (rowid, title, authors) VALUES (?, ?, ?)
+        """, fts_rows)
+        for table, counts in (("authors", author_counts), ("genres", genre_counts)):
+            await db.executemany(f"""
+                UPDATE {table}
+                SET book_count = book_count + ?, active_book_count = active_book_count + ?
+                WHERE id = ?
+            """, ((count["books"], count["active"], name_id) for name_id, count in counts.items()))
+        await db.execute(f"""
+            UPDATE catalog_version SET version = version + 1, updated_at = {NOW_SQL}
+        """)
+
+    async def _resolve_names(
+        self, db: aiosqlite.Connection, table: str, known: Dict[str, int], names: Iterable[str]
+    ) -> Dict[str, int]:
+        # Only names not seen earlier in this import go to the database
+        missing = [name for name in names if name not in known]
+        known.update(await upsert_names(db, table, missing))
+        return known
+
+
+def _fold(text: str) -> str:
+    # Same folding as SEARCH_DOCUMENT_SQL
+    return text.replace("ё", "е").replace("Ё", "Е")
@@ -0,0 +1,76 @@
+import re
+from typing import List, Tuple
+
+import aiosqlite
+
+from models.book import BookSearchParams
+from services.book_service import BookService
+from services.search_service import SearchService
+from services.stats_service import StatsService
+from models.stats import StatsParams
+from utils.pagination import encode_cursor
+
+# Searches that must stay index-driven. LIKE on titles or author names is
+# deliberately missing: a leading wildcard always scans, mode=fts covers it.
+HOT_SEARCHES = [
+    BookSearchParams(isbn="978-5-17-113626-1"),
+    BookSearchParams(genre="Роман"),
+    BookSearchParams(year_from=1900, year_to=1950),
+    BookSearchParams(sort_by="title"),
+    BookSearchParams(sort_by="year", sort_order="desc"),
+    BookSearchParams(sort_by="author"),
+    BookSearchParams(sort_by="title", cursor=encode_cursor("title:asc", ["М", 100])),
+    BookSearchParams(sort_by="author", sort_order="desc", cursor=encode_cursor("author:desc", ["М", 100])),
+    BookSearchParams(mode="fts", title="война мир", sort_by="relevance"),
+    BookSearchParams(mode="fts", author="толстой", genre="Роман", available_only=True),
+]
+
+HOT_STATS = [
+    StatsParams(limit=10),
+    StatsParams(limit=50, min_count=5, active_only=False),
+    StatsParams(limit=50, cursor=encode_cursor("authors:active_book_count", [3, "М"])),
+]
+
+# "SCAN b" (SQLite 3.36+) or "SCAN TABLE books AS b" (older) without
+# USING INDEX / VIRTUAL TABLE means a full table scan
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?[\w.]+( AS \w+)?$")
+
+
+async def _run_hot_queries(db: aiosqlite.Connection) -> None:
+    book_service = BookService(db)
+    await book_service.get_books_by_ids([1, 2, 3])
+    await book_service.list_books(page=3, per_page=10)
+    await book_service.list_books_after(encode_cursor("title:asc", ["М", 100]), per_page=10)
+
+    search_service = SearchService(db)
+    for params in HOT_SEARCHES:
+        await search_service.search_books(params)
+
+    stats_service = StatsService(db)
+    for params in HOT_STATS:
+        await stats_service.get_stats("authors", params)
+    await stats_service.get_all_stats("authors", StatsParams(min_count=5))
+
+
+async def find_full_scans(db: aiosqlite.Connection) -> List[Tuple[str, str]]:
+    # Captures the statements the services actually issue (with bound
+    # values inlined by the trace callback) and explains each of them
+    statements: List[str] = []
+    await db.set_trace_callback(statements.append)
+    try:
+        await _run_hot_queries(db)
+    finally:
+        await db.set_trace_callback(None)
+
+    scans = []
+    for statement in statements:
+        if not statement.lstrip().upper().startswith("SELECT"):
+            continue
+        # FTS5 reads its shadow tables through the same connection
+        if "'main'." in statement:
+            continue
+        async with db.execute(f"EXPLAIN QUERY PLAN {statement}") as cursor:
+            for row in await cursor.fetchall():
+                if FULL_SCAN.match(row[3]):
+                    scans.append((" ".join(statement.split()), row[3]))
+    return scans
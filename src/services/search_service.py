@@ -1,109 +1,302 @@
-from typing import List, Optional, Dict, Any
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from models.book import BookResponse, BookSearchParams
 import aiosqlite
 from services.book_service import BookService
+from services.cache import BookCache, SearchCache
+from services.stats_service import StatsService
+from models.stats import StatsParams
 from utils.exceptions import NotFoundError
+from utils.pagination import decode_cursor, encode_cursor
+
+
+SEARCH_MODES = ("like", "fts")
+COUNT_STRATEGIES = ("exact", "estimate", "none")
+
+# Query plans keyed by SQL text: whether ORDER BY sorts in a temp b-tree.
+# Search SQL only varies by which filters and sort are used, so this stays small.
+_SORTED_IN_TEMP_BTREE: Dict[str, bool] = {}
+
+
+def build_match_query(column: str, text: str) -> Optional[str]:
+    # Every word becomes a quoted prefix term, e.g. title: ("вой"* AND "мир"*)
+    words = re.findall(r"\w+", text.replace("ё", "е").replace("Ё", "Е"))
+    if not words:
+        return None
+    return f"{column}: (" + " AND ".join(f'"{word}"*' for word in words) + ")"
 
 
 class SearchService:
-    def __init__(self, db: aiosqlite.Connection):
+    def __init__(
+        self,
+        db: aiosqlite.Connection,
+        count_strategy: str = "exact",
+        count_cap: int = 1000,
+        cache: Optional[BookCache] = None,
+        result_cache: Optional[SearchCache] = None,
+    ):
         self.db = db
+        self.cache = cache
+        self.result_cache = result_cache
+        self.count_strategy = count_strategy
+        self.count_cap = count_cap
 
-    async def search_books(self, params: BookSearchParams) -> Dict[str, Any]:
-        async with self.db.cursor() as cursor:
-            # Build base query
-            query = """
-                SELECT DISTINCT b.id
-                FROM books b
-                LEFT JOIN book_authors ba ON b.id = ba.book_id
-                LEFT JOIN authors a ON ba.author_id = a.id
-                LEFT JOIN book_genres bg ON b.id = bg.book_id
-                LEFT JOIN genres g ON bg.genre_id = g.id
-                WHERE b.is_active = TRUE
-            """
-
-            conditions = []
-            query_params = []
-
-            # Add search conditions
+    def build_search_query(
+        self,
+        params: BookSearchParams,
+        with_total: bool = False,
+        ordered: bool = True,
+        columns: Optional[str] = None,
+        extra_columns: Optional[str] = None,
+    ) -> Tuple[str, List[Any], str]:
+        # Returns the id query, its parameters and the name of the sort
+        # order; the query selects (id, sort_key) so that the last row of a
+        # page can be turned into a cursor. with_total adds the size of the
+        # whole result as a window column; ordered=False drops ORDER BY for
+        # queries that only count; columns replaces the select list and
+        # extra_columns is added to it.
+        if params.mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {params.mode}")
+
+        match_terms = []
+        title_match = author_match = None
+        if params.mode == "fts":
             if params.title:
-                conditions.append("b.title LIKE ?")
-                query_params.append(f"%{params.title}%")
+                title_match = build_match_query("title", params.title)
+                match_terms.append(title_match)
             if params.author:
-                conditions.append("a.name LIKE ?")
-                query_params.append(f"%{params.author}%")
-            if params.genre:
-                conditions.append("g.name = ?")
-                query_params.append(params.genre)
-            if params.year_from:
-                conditions.append("b.publication_year >= ?")
-                query_params.append(params.year_from)
-            if params.year_to:
-                conditions.append("b.publication_year <= ?")
-                query_params.append(params.year_to)
-            if params.isbn:
-                conditions.append("b.isbn = ?")
-                query_params.append(params.isbn)
-            if params.available_only:
-                conditions.append("b.copies_available > 0")
-
-            if conditions:
-                query += " AND " + " AND ".join(conditions)
-
-            # Add sorting
-            if params.sort_by:
-                sort_field = {
-                    "title": "b.title",
-                    "author": "a.name",
-                    "year": "b.publication_year",
-                }.get(params.sort_by, "b.title")
-                sort_order = "DESC" if params.sort_order == "desc" else "ASC"
-                query += f" ORDER BY {sort_field} {sort_order}"
-
-            # Count total results for pagination
-            count_query = f"SELECT COUNT(*) as total FROM ({query})"
-            await cursor.execute(count_query, query_params)
-            total = (await cursor.fetchone())["total"]
+                author_match = build_match_query("authors", params.author)
+                match_terms.append(author_match)
+            match_terms = [term for term in match_terms if term]
+
+        # Sorting: every order ends with b.id so that keyset pages are stable
+        descending = params.sort_order == "desc"
+        if params.sort_by == "relevance" and match_terms:
+            sort_expr, descending = "bm25(books_fts)", False
+        elif params.sort_by:
+            sort_expr = {
+                "title": "b.title",
+                "author": "b.sort_author",
+                "year": "b.publication_year",
+            }.get(params.sort_by, "b.title")
+        else:
+            sort_expr = "b.id"
+        order_name = f"{params.sort_by or 'id'}:{'desc' if descending else 'asc'}"
+
+        query = f"SELECT {columns or f'b.id, {sort_expr} AS sort_key'}"
+        if extra_columns:
+            query += f", {extra_columns}"
+        # bm25() cannot share a query with a window function, so relevance
+        # ordered searches are counted separately
+        if with_total and sort_expr != "bm25(books_fts)":
+            query += ", COUNT(*) OVER () AS total"
+        conditions = []
+        query_params: List[Any] = []
+
+        # Add search conditions. Author and genre filters are IN subqueries
+        # so that the planner can drive them from the reverse-lookup indexes
+        if match_terms:
+            conditions.append("books_fts MATCH ?")
+            query_params.append(" AND ".join(match_terms))
+        if params.title and not title_match:
+            conditions.append("b.title LIKE ?")
+            query_params.append(f"%{params.title}%")
+        if params.author and not author_match:
+            conditions.append("""b.id IN (
+                SELECT ba.book_id FROM book_authors ba
+                JOIN authors a ON a.id = ba.author_id
+                WHERE a.name LIKE ?
+            )""")
+            query_params.append(f"%{params.author}%")
+        if params.genre:
+            conditions.append("""b.id IN (
+                SELECT bg.book_id FROM book_genres bg
+                JOIN genres g ON g.id = bg.genre_id
+                WHERE g.name = ?
+            )""")
+            query_params.append(params.genre)
+        if params.year_from:
+            conditions.append("b.publication_year >= ?")
+            query_params.append(params.year_from)
+        if params.year_to:
+            conditions.append("b.publication_year <= ?")
+            query_params.append(params.year_to)
+        if params.isbn:
+            conditions.append("b.isbn = ?")
+            query_params.append(params.isbn)
+        if params.available_only:
+            conditions.append("b.copies_available > 0")
+
+        # Keyset condition: rows strictly after the cursor in sort order
+        after = decode_cursor(params.cursor, order_name) if params.cursor is not None else None
+        comparison = "<" if descending else ">"
+        if after is not None:
+            if sort_expr == "b.id":
+                conditions.append(f"b.id {comparison} ?")
+                query_params.append(after[-1])
+            else:
+                conditions.append(f"({sort_expr}, b.id) {comparison} (?, ?)")
+                query_params.extend(after)
+
+        if match_terms:
+            query += " FROM books b JOIN books_fts ON books_fts.rowid = b.id"
+        elif not ordered and not conditions:
+            # An unfiltered count reads the ids of the active books from the
+            # partial index; with statistics the planner would scan the table
+            query += " FROM books b INDEXED BY idx_books_active_title"
+        else:
+            query += " FROM books b"
+        query += " WHERE b.is_active = TRUE"
+        if conditions:
+            query += " AND " + " AND ".join(conditions)
+
+        direction = "DESC" if descending else "ASC"
+        if ordered and sort_expr == "b.id":
+            query += f" ORDER BY b.id {direction}"
+        elif ordered:
+            query += f" ORDER BY {sort_expr} {direction}, b.id {direction}"
+
+        return query, query_params, order_name
+
+    async def search_books(
+        self,
+        params: BookSearchParams,
+        catalog_version: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Any]:
+        # Cursor pages only count when a strategy is asked for explicitly
+        strategy = params.count or (self.count_strategy if params.cursor is None else "none")
+        if strategy not in COUNT_STRATEGIES:
+            raise ValueError(f"Unknown count strategy: {strategy}")
+
+        if params.cursor is not None:
+            find = lambda: self._find_after_cursor(params, strategy)
+        else:
+            find = lambda: self._find_page(params, strategy)
+        # Results are cached per catalog version, which the caller read
+        # before anything else
+        if self.result_cache is not None and catalog_version is not None:
+            found = await self.result_cache.get_or_load(self.cache_key(params, strategy), catalog_version, find)
+        else:
+            found = await find()
+
+        # Get book details, all of them or only `fields`
+        book_service = BookService(self.db, self.cache)
+        books = await book_service.get_books_page(list(found["ids"]), fields)
+        return {**{key: value for key, value in found.items() if key != "ids"}, "results": books}
+
+    def cache_key(self, params: BookSearchParams, strategy: str) -> Tuple[Any, ...]:
+        # Spellings of the same search share a key: query parameter order,
+        # empty filters, `true` vs `1`, and in fts mode anything that
+        # yields the same MATCH terms
+        title, author = params.title or None, params.author or None
+        if params.mode == "fts":
+            title = title and (build_match_query("title", title) or title)
+            author = author and (build_match_query("authors", author) or author)
+        return (
+            params.mode, title, author, params.genre or None,
+            params.year_from or None, params.year_to or None, params.isbn or None, params.available_only,
+            params.sort_by, "desc" if params.sort_order == "desc" else "asc",
+            params.page if params.cursor is None else None, params.per_page, params.cursor,
+            strategy, self.count_cap if strategy == "estimate" else None,
+        )
 
-            # Add pagination
-            query += " LIMIT ? OFFSET ?"
-            query_params.extend([params.per_page, (params.page - 1) * params.per_page])
+    async def _find_page(self, params: BookSearchParams, strategy: str) -> Dict[str, Any]:
+        offset = (params.page - 1) * params.per_page
+        query, query_params, _ = self.build_search_query(params)
+        if strategy == "exact" and await self._reads_whole_result(query, query_params):
+            query, query_params, _ = self.build_search_query(params, with_total=True)
 
+        async with self.db.cursor() as cursor:
             # Execute query
-            await cursor.execute(query, query_params)
-            book_ids = [row["id"] for row in await cursor.fetchall()]
+            await cursor.execute(f"{query} LIMIT ? OFFSET ?", query_params + [params.per_page, offset])
+            rows = await cursor.fetchall()
 
-            # Get full book details
-            book_service = BookService(self.db)
-            books = [await book_service.get_book_by_id(book_id) for book_id in book_ids]
+        if strategy == "exact" and rows and "total" in rows[0].keys():
+            # The window column counted the whole result in the same pass
+            total, is_lower_bound = rows[0]["total"], False
+        elif strategy == "exact" and offset == 0 and not rows:
+            total, is_lower_bound = 0, False
+        else:
+            total, is_lower_bound = await self._count(params, strategy)
+            if rows and total is not None and offset + len(rows) > total:
+                # The page itself proves there are at least this many
+                total = offset + len(rows)
 
-            return {
-                "total": total,
-                "page": params.page,
-                "per_page": params.per_page,
-                "results": books,
-            }
+        return {
+            "total": total,
+            "total_is_lower_bound": is_lower_bound,
+            "page": params.page,
+            "per_page": params.per_page,
+            "ids": tuple(row["id"] for row in rows),
+        }
+
+    async def _reads_whole_result(self, query: str, query_params: List[Any]) -> bool:
+        # A window count is only a win when the page query has to sort the
+        # whole result anyway; when the order comes from an index the page
+        # stops early and a standalone COUNT(*) is much cheaper than
+        # buffering every row for the window.
+        if query not in _SORTED_IN_TEMP_BTREE:
+            async with self.db.execute(f"EXPLAIN QUERY PLAN {query}", query_params) as cursor:
+                plan = [row[3] for row in await cursor.fetchall()]
+            _SORTED_IN_TEMP_BTREE[query] = any("TEMP B-TREE FOR" in detail and "ORDER BY" in detail for detail in plan)
+        return _SORTED_IN_TEMP_BTREE[query]
+
+    async def _count(self, params: BookSearchParams, strategy: str) -> Tuple[Optional[int], bool]:
+        # Standalone count of the whole result set, ignoring any cursor
+        if strategy == "none":
+            return None, False
+
+        # Selecting only the id lets SQLite count through a covering index
+        # (see build_search_query for the unfiltered case)
+        query, query_params, _ = self.build_search_query(
+            params.model_copy(update={"cursor": None}), ordered=False, columns="b.id"
+        )
+        if strategy == "estimate":
+            # Stop after count_cap + 1 matches instead of walking them all
+            query += " LIMIT ?"
+            query_params.append(self.count_cap + 1)
+
+        async with self.db.execute(f"SELECT COUNT(*) AS total FROM ({query})", query_params) as cursor:
+            total = (await cursor.fetchone())["total"]
+
+        if strategy == "estimate" and total > self.count_cap:
+            return self.count_cap, True
+        return total, False
+
+    async def _find_after_cursor(self, params: BookSearchParams, strategy: str) -> Dict[str, Any]:
+        # Keyset pagination: constant cost per page unless a count is asked for
+        query, query_params, order_name = self.build_search_query(params)
 
-    async def get_genre_stats(self) -> Dict[str, int]:
         async with self.db.cursor() as cursor:
-            await cursor.execute("""
-                SELECT g.name, COUNT(bg.book_id) as count
-                FROM genres g
-                LEFT JOIN book_genres bg ON g.id = bg.genre_id
-                LEFT JOIN books b ON bg.book_id = b.id AND b.is_active = TRUE
-                GROUP BY g.name
-                ORDER BY count DESC
-            """)
-            return {row["name"]: row["count"] for row in await cursor.fetchall()}
+            # One extra row tells whether there is a next page
+            await cursor.execute(f"{query} LIMIT ?", query_params + [params.per_page + 1])
+            rows = await cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > params.per_page:
+            rows = rows[:params.per_page]
+            last = rows[-1]
+            next_cursor = encode_cursor(order_name, [last["sort_key"], last["id"]])
+
+        total, is_lower_bound = await self._count(params, strategy)
+
+        return {
+            "total": total,
+            "total_is_lower_bound": is_lower_bound,
+            "per_page": params.per_page,
+            "next_cursor": next_cursor,
+            "ids": tuple(row["id"] for row in rows),
+        }
+
+    async def get_genre_stats(self) -> Dict[str, int]:
+        # Active books per genre; see StatsService for pages and filters
+        return await self._get_stats("genres")
 
     async def get_author_stats(self) -> Dict[str, int]:
-        async with self.db.cursor() as cursor:
-            await cursor.execute("""
-                SELECT a.name, COUNT(ba.book_id) as count
-                FROM authors a
-                LEFT JOIN book_authors ba ON a.id = ba.author_id
-                LEFT JOIN books b ON ba.book_id = b.id AND b.is_active = TRUE
-                GROUP BY a.name
-                ORDER BY count DESC
-            """)
-            return {row["name"]: row["count"] for row in await cursor.fetchall()}
\ No newline at end of file
+        return await self._get_stats("authors")
+
+    async def _get_stats(self, kind: str) -> Dict[str, int]:
+        query, query_params, _ = StatsService(self.db).build_stats_query(kind, StatsParams(), paged=False)
+        async with self.db.execute(query, query_params) as cursor:
+            return {row["name"]: row["count"] for row in await cursor.fetchall()}
@@ -0,0 +1,87 @@
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+import aiosqlite
+
+from models.stats import StatsParams
+from utils.pagination import decode_cursor, encode_cursor
+from utils.serialization import dumps
+
+STATS_KINDS = ("genres", "authors")
+MAX_LIMIT = 1000
+
+
+class StatsService:
+    """Book counts per genre or author, read from the materialized counters.
+
+    Rows are ordered by count (descending) and then name, which is exactly
+    the order of the idx_{kind}_*_count indexes, so pages, top-N lists and
+    min_count filters stop after the rows they return.
+    """
+
+    def __init__(self, db: aiosqlite.Connection):
+        self.db = db
+
+    def build_stats_query(
+        self, kind: str, params: StatsParams, paged: bool = True
+    ) -> Tuple[str, List[Any], str]:
+        # Returns the query, its parameters and the cursor order name.
+        # active_only (the default) counts active books only; otherwise
+        # soft-deleted books are counted as well.
+        if kind not in STATS_KINDS:
+            raise ValueError(f"Unknown stats kind: {kind}")
+        column = "active_book_count" if params.active_only else "book_count"
+        order_name = f"{kind}:{column}"
+
+        query = f"SELECT name, {column} AS count FROM {kind} WHERE {column} >= ?"
+        query_params: List[Any] = [params.min_count]
+
+        # Keyset condition for (count DESC, name ASC): the range part keeps
+        # the index seek, the OR picks up the remaining names of that count
+        # Names are unique, so they break ties between equal counts
+        after = decode_cursor(params.cursor, order_name, tiebreak=str) if params.cursor is not None else None
+        if after is not None:
+            query += f" AND {column} <= ? AND ({column} < ? OR name > ?)"
+            query_params.extend([after[0], after[0], after[1]])
+
+        query += f" ORDER BY {column} DESC, name"
+        if paged:
+            if not 0 < params.limit <= MAX_LIMIT:
+                raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+            if params.offset < 0:
+                raise ValueError("offset must not be negative")
+            query += " LIMIT ? OFFSET ?"
+            # One extra row tells whether there is a next page
+            query_params.extend([params.limit + 1, params.offset if after is None else 0])
+        return query, query_params, order_name
+
+    async def get_stats(self, kind: str, params: StatsParams) -> Tuple[List[Tuple[str, int]], Optional[str]]:
+        # One page of (name, count) rows and the cursor of the next page
+        query, query_params, order_name = self.build_stats_query(kind, params)
+        async with self.db.execute(query, query_params) as cursor:
+            rows = [(row["name"], row["count"]) for row in await cursor.fetchall()]
+
+        next_cursor = None
+        if len(rows) > params.limit:
+            rows = rows[:params.limit]
+            next_cursor = encode_cursor(order_name, [rows[-1][1], rows[-1][0]])
+        return rows, next_cursor
+
+    async def get_all_stats(self, kind: str, params: StatsParams) -> List[Tuple[str, int]]:
+        # Every (name, count) row matching min_count/active_only, unpaged
+        query, query_params, _ = self.build_stats_query(kind, params, paged=False)
+        async with self.db.execute(query, query_params) as cursor:
+            return [(row["name"], row["count"]) for row in await cursor.fetchall()]
+
+    async def iter_stats(self, kind: str, params: StatsParams) -> AsyncIterator[bytes]:
+        # Every row matching min_count/active_only as NDJSON, in chunks
+        query, query_params, _ = self.build_stats_query(kind, params, paged=False)
+        async with self.db.execute(query, query_params) as cursor:
+            cursor.iter_chunk_size = 1000
+            lines = []
+            async for row in cursor:
+                lines.append(dumps({"name": row["name"], "count": row["count"]}))
+                if len(lines) >= 1000:
+                    yield b"\n".join(lines) + b"\n"
+                    lines = []
+            if lines:
+                yield b"\n".join(lines) + b"\n"
@@ -0,0 +1,387 @@
+import asyncio
+import bisect
+import heapq
+import re
+import time
+import unicodedata
+from array import array
+from contextlib import AbstractAsyncContextManager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import aiosqlite
+
+KINDS = ("titles", "authors", "genres")
+MAX_SUGGESTIONS = 50
+
+# Names per IN list when reading weights, below SQLite's parameter limit
+WEIGHTS_CHUNK_SIZE = 500
+
+# A word is found by its prefix only when it starts within this many
+# characters of the name: the offset shares a 64-bit key with the name
+OFFSET_BITS = 8
+MAX_OFFSET = (1 << OFFSET_BITS) - 1
+
+# Prefixes matching more keys than this keep their ranked top
+# MAX_SUGGESTIONS, patched by the writes that touch a name they match;
+# the larger ones are ranked when the index is built
+MEMO_MIN_MATCHES = 32
+WARM_MIN_MATCHES = 256
+MEMO_MAX_PREFIXES = 20000
+
+# New keys of one write up to this many are inserted one by one, more
+# are merged in a single copy of the array
+INSERT_MAX_KEYS = 16
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+# kind -> names whose weight a write may have changed
+Touched = Dict[str, Set[str]]
+# kind -> name -> weight (active books) after the write
+Weights = Dict[str, Dict[str, int]]
+
+
+def normalize(text: str) -> str:
+    # Matching form of a name or query: NFKC (full-width and composed
+    # letters), casefold, ё as е like the search index, and runs of
+    # punctuation and spaces as one space
+    text = unicodedata.normalize("NFKC", text).casefold().replace("ё", "е")
+    return _SEPARATORS.sub(" ", text).strip()
+
+
+def word_starts(key: str) -> List[int]:
+    return [0] + [i + 1 for i, char in enumerate(key[:MAX_OFFSET]) if char == " "]
+
+
+class PrefixIndex:
+    """Names of one kind with their weights, found by a prefix of any word.
+
+    Every word start of every normalized name is one key in `refs`, kept
+    sorted by the text from that start on, so the names matching a prefix
+    are one bisected range. A key is a single integer (entry << 8 | offset)
+    in an array; the text is sliced from the normalized name on demand.
+    Names whose weight drops to zero stay indexed but are not suggested.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.keys: List[str] = []
+        self.weights = array("q")
+        self.entries: Dict[str, int] = {}
+        self.refs = array("Q")
+        # Names with a positive weight
+        self.active = 0
+        self._memo: Dict[str, List[int]] = {}
+
+    def _text(self, ref: int) -> str:
+        return self.keys[ref >> OFFSET_BITS][ref & MAX_OFFSET:]
+
+    def _add(self, name: str, weight: int) -> int:
+        entry = len(self.names)
+        self.entries[name] = entry
+        self.names.append(name)
+        self.keys.append(normalize(name))
+        self.weights.append(weight)
+        self.active += weight > 0
+        return entry
+
+    def _refs(self, entry: int) -> List[int]:
+        key = self.keys[entry]
+        if not key:
+            return []
+        return [entry << OFFSET_BITS | offset for offset in word_starts(key)]
+
+    def load(self, rows: Iterable[Tuple[str, int]]) -> None:
+        for name, weight in rows:
+            if name not in self.entries:
+                self._add(name, weight)
+        refs = [ref for entry in range(len(self.names)) for ref in self._refs(entry)]
+        refs.sort(key=self._text)
+        self.refs = array("Q", refs)
+        self._memo.clear()
+
+    def update(self, weights: Dict[str, int]) -> None:
+        # name -> new weight; unknown names are added
+        added = []
+        for name, weight in weights.items():
+            entry = self.entries.get(name)
+            if entry is None:
+                if weight > 0:
+                    added.append(self._add(name, weight))
+                continue
+            previous = self.weights[entry]
+            if previous != weight:
+                self.weights[entry] = weight
+                self.active += (weight > 0) - (previous > 0)
+                self._patch(entry, previous)
+        if added:
+            self._insert(sorted((ref for entry in added for ref in self._refs(entry)), key=self._text))
+            for entry in added:
+                self._patch(entry, 0)
+
+    def _insert(self, refs: List[int]) -> None:
+        # Sorted new keys; an import adds thousands at once, and merging
+        # them in one copy of the array beats a memmove per key
+        if len(refs) <= INSERT_MAX_KEYS:
+            for ref in refs:
+                self.refs.insert(bisect.bisect_left(self.refs, self._text(ref), key=self._text), ref)
+            return
+        merged = array("Q")
+        previous = 0
+        for ref in refs:
+            position = bisect.bisect_left(self.refs, self._text(ref), previous, key=self._text)
+            merged.extend(self.refs[previous:position])
+            merged.append(ref)
+            previous = position
+        merged.extend(self.refs[previous:])
+        self.refs = merged
+
+    def _patch(self, entry: int, previous: int) -> None:
+        # Keeps the memoized tops of the prefixes the entry matches exact:
+        # a name that gained weight can only move up into a top, one that
+        # lost weight while in a top may have to give its place to a name
+        # outside it, which only a fresh ranking finds
+        if not self._memo:
+            return
+        key = self.keys[entry]
+        gained = self.weights[entry] > previous
+        for offset in word_starts(key):
+            for end in range(offset + 1, len(key) + 1):
+                prefix = key[offset:end]
+                top = self._memo.get(prefix)
+                if top is None:
+                    continue
+                if entry in top and not gained:
+                    del self._memo[prefix]
+                elif gained:
+                    rank = self._ranking(prefix)
+                    if entry in top:
+                        top.remove(entry)
+                    elif len(top) >= MAX_SUGGESTIONS and rank(entry) > rank(top[-1]):
+                        continue
+                    bisect.insort(top, entry, key=rank)
+                    del top[MAX_SUGGESTIONS:]
+
+    def _ranking(self, prefix: str) -> Callable[[int], tuple]:
+        # Names starting with the prefix first, then by weight, shorter
+        # names and alphabetically
+        keys, names, weights = self.keys, self.names, self.weights
+
+        def rank(entry: int) -> tuple:
+            key = keys[entry]
+            return not key.startswith(prefix), -weights[entry], len(key), names[entry]
+
+        return rank
+
+    def warm(self) -> None:
+        # Ranks in advance every prefix matching over WARM_MIN_MATCHES
+        # keys, level by level inside the ranges that were large one
+        # character earlier, so no keystroke pays for a large range. A
+        # prefix matching exactly the keys of the one before it (the rest
+        # of a word nothing else shares) takes over its ranking.
+        ranges = [(0, len(self.refs), None)]
+        size = 0
+        while ranges and len(self._memo) < MEMO_MAX_PREFIXES:
+            size += 1
+            larger = []
+            for lo, hi, shorter in ranges:
+                position = lo
+                while position < hi:
+                    text = self._text(self.refs[position])
+                    if len(text) < size:
+                        position += 1
+                        continue
+                    prefix = text[:size]
+                    end = self._bounds(prefix, position, hi)[1]
+                    if end - position > WARM_MIN_MATCHES:
+                        if shorter is not None and (position, end) == (lo, hi):
+                            self._memo[prefix] = list(shorter)
+                        else:
+                            self._rank(prefix, position, end)
+                        larger.append((position, end, self._memo.get(prefix)))
+                    position = end
+            ranges = larger
+
+    def search(self, prefix: str, limit: int) -> List[Tuple[str, int]]:
+        # Best matches for a normalized prefix, see _ranking
+        if not prefix:
+            return []
+        top = self._memo.get(prefix)
+        if top is None:
+            top = self._rank(prefix)
+        return [(self.names[entry], self.weights[entry]) for entry in top[:limit]]
+
+    def _bounds(self, prefix: str, lo: int = 0, hi: Optional[int] = None) -> Tuple[int, int]:
+        hi = len(self.refs) if hi is None else hi
+        lo = bisect.bisect_left(self.refs, prefix, lo, hi, key=self._text)
+        return lo, bisect.bisect_left(self.refs, prefix + "\U0010ffff", lo, hi, key=self._text)
+
+    def _rank(self, prefix: str, lo: Optional[int] = None, hi: Optional[int] = None) -> List[int]:
+        if lo is None:
+            lo, hi = self._bounds(prefix)
+        weights = self.weights
+        entries = [entry for entry in {ref >> OFFSET_BITS for ref in self.refs[lo:hi]} if weights[entry] > 0]
+        # Only names that start with the prefix (key offset 0) or weigh at
+        # least as much as the lightest of the heaviest few can make the
+        # top; the full ranking sorts just those
+        starting = {ref >> OFFSET_BITS for ref in self.refs[lo:hi] if not ref & MAX_OFFSET}
+        candidates = []
+        for group in ([entry for entry in entries if entry in starting], entries):
+            if len(group) > MAX_SUGGESTIONS:
+                cutoff = weights[heapq.nlargest(MAX_SUGGESTIONS, group, key=weights.__getitem__)[-1]]
+                group = [entry for entry in group if weights[entry] >= cutoff]
+            candidates.extend(group)
+        top = sorted(set(candidates), key=self._ranking(prefix))[:MAX_SUGGESTIONS]
+        if hi - lo > MEMO_MIN_MATCHES and len(self._memo) < MEMO_MAX_PREFIXES:
+            self._memo[prefix] = top
+        return top
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "names": self.active,
+            "keys": len(self.refs),
+            "memoized_prefixes": len(self._memo),
+        }
+
+
+async def read_weights(db: aiosqlite.Connection, touched: Touched) -> Weights:
+    # Current weights of the touched names: active books with the title,
+    # active_book_count of the author or genre (0 when gone)
+    weights: Weights = {}
+    for kind, names in touched.items():
+        names = list(names)
+        found: Dict[str, int] = {}
+        for start in range(0, len(names), WEIGHTS_CHUNK_SIZE):
+            chunk = names[start:start + WEIGHTS_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            if kind == "titles":
+                query = f"""
+                    SELECT title, count(*) FROM books
+                    WHERE is_active = TRUE AND title IN ({placeholders})
+                    GROUP BY title
+                """
+            else:
+                query = f"SELECT name, active_book_count FROM {kind} WHERE name IN ({placeholders})"
+            async with db.execute(query, chunk) as cursor:
+                found.update((row[0], row[1]) for row in await cursor.fetchall())
+        weights[kind] = {name: found.get(name, 0) for name in names}
+    return weights
+
+
+async def load_weights(db: aiosqlite.Connection) -> Weights:
+    # Every suggestible name with its weight
+    queries = {
+        # In title order off the partial index, without a temporary B-tree
+        # for the GROUP BY, which the planner otherwise tends to choose
+        "titles": """
+            SELECT title, count(*) FROM books INDEXED BY idx_books_active_title
+            WHERE is_active = TRUE GROUP BY title
+        """,
+        "authors": "SELECT name, active_book_count FROM authors WHERE active_book_count > 0",
+        "genres": "SELECT name, active_book_count FROM genres WHERE active_book_count > 0",
+    }
+    weights: Weights = {}
+    for kind, query in queries.items():
+        async with db.execute(query) as cursor:
+            weights[kind] = {row[0]: row[1] for row in await cursor.fetchall()}
+    return weights
+
+
+class SuggestIndex:
+    """Typeahead over titles, authors and genres, held in memory.
+
+    Built from the database once by `build`; BookService and ImportService
+    then `apply` the new weights of the names each write touched, after
+    its commit. With `shared_database` other processes write as well, and
+    their writes never reach this index: `sync` rebuilds it in the
+    background when the catalog version moved, at most every
+    `refresh_interval` seconds.
+    """
+
+    def __init__(self, shared_database: bool = False, refresh_interval: float = 60.0):
+        self.shared_database = shared_database
+        self.refresh_interval = refresh_interval
+        self.indexes = {kind: PrefixIndex() for kind in KINDS}
+        self.version: Optional[int] = None
+        self.built_at = 0.0
+        self.build_seconds = 0.0
+        self.lookups = 0
+        self.updates = 0
+        self.rebuilds = 0
+        self.failed_rebuilds = 0
+        self._rebuild: Optional[asyncio.Task] = None
+        # Weights applied while a rebuild reads the database, replayed on
+        # top of what it read
+        self._replay: Optional[List[Weights]] = None
+
+    async def build(self, db: aiosqlite.Connection) -> None:
+        started = time.perf_counter()
+        async with db.execute("SELECT version FROM catalog_version") as cursor:
+            version = (await cursor.fetchone())[0]
+        weights = await load_weights(db)
+        indexes = {kind: PrefixIndex() for kind in KINDS}
+        for kind, index in indexes.items():
+            index.load(weights[kind].items())
+            index.warm()
+        self.indexes = indexes
+        self.version = version
+        self.built_at = time.monotonic()
+        self.build_seconds = time.perf_counter() - started
+
+    def apply(self, weights: Weights) -> None:
+        for kind, names in weights.items():
+            self.indexes[kind].update(names)
+        self.updates += 1
+        if self._replay is not None:
+            self._replay.append(weights)
+
+    def sync(self, version: int, reader: Callable[[], AbstractAsyncContextManager]) -> None:
+        # Suggestions keep coming from the current index while it rebuilds
+        if (
+            not self.shared_database
+            or version == self.version
+            or self._rebuild is not None
+            or time.monotonic() - self.built_at < self.refresh_interval
+        ):
+            return
+        self._rebuild = asyncio.get_running_loop().create_task(self._rebuild_from(reader))
+
+    async def _rebuild_from(self, reader: Callable[[], AbstractAsyncContextManager]) -> None:
+        self._replay = []
+        try:
+            async with reader() as db:
+                await self.build(db)
+            for weights in self._replay:
+                for kind, names in weights.items():
+                    self.indexes[kind].update(names)
+            self.rebuilds += 1
+        except Exception:
+            # Retried after refresh_interval; the old index keeps serving
+            self.failed_rebuilds += 1
+            self.built_at = time.monotonic()
+        finally:
+            self._replay = None
+            self._rebuild = None
+
+    async def close(self) -> None:
+        if self._rebuild is not None:
+            self._rebuild.cancel()
+            await asyncio.gather(self._rebuild, return_exceptions=True)
+
+    def suggest(self, query: str, kinds: Iterable[str] = KINDS, limit: int = 10) -> Dict[str, List[Dict[str, Any]]]:
+        self.lookups += 1
+        prefix = normalize(query)
+        return {
+            kind: [{"name": name, "count": count} for name, count in self.indexes[kind].search(prefix, limit)]
+            for kind in kinds
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **{kind: index.stats() for kind, index in self.indexes.items()},
+            "version": self.version,
+            "build_seconds": round(self.build_seconds, 3),
+            "lookups": self.lookups,
+            "updates": self.updates,
+            "rebuilds": self.rebuilds,
+            "failed_rebuilds": self.failed_rebuilds,
+        }
@@ -9,4 +9,28 @@ def load_config() -> Dict[str, Any]:
         "DB_PATH": os.getenv("DB_PATH", "library.db"),
         "HOST": os.getenv("HOST", "0.0.0.0"),
         "PORT": int(os.getenv("PORT", "8080")),
+        "WORKERS": int(os.getenv("WORKERS", "1")),
+        "SHUTDOWN_TIMEOUT": float(os.getenv("SHUTDOWN_TIMEOUT", "30")),
+        "DB_POOL_SIZE": int(os.getenv("DB_POOL_SIZE", "4")),
+        "DB_SYNCHRONOUS": os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+        "GROUP_COMMIT": os.getenv("GROUP_COMMIT", "false").lower() == "true",
+        "GROUP_COMMIT_WINDOW_MS": float(os.getenv("GROUP_COMMIT_WINDOW_MS", "2")),
+        "GROUP_COMMIT_MAX_BATCH": int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64")),
+        "SEARCH_COUNT_STRATEGY": os.getenv("SEARCH_COUNT_STRATEGY", "exact"),
+        "SEARCH_COUNT_CAP": int(os.getenv("SEARCH_COUNT_CAP", "1000")),
+        "BOOK_CACHE_MAX_ENTRIES": int(os.getenv("BOOK_CACHE_MAX_ENTRIES", "10000")),
+        "BOOK_CACHE_MAX_BYTES": int(os.getenv("BOOK_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        "BOOK_CACHE_TTL": float(os.getenv("BOOK_CACHE_TTL", "300")),
+        "SEARCH_CACHE_MAX_ENTRIES": int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000")),
+        "SUGGEST": os.getenv("SUGGEST", "true").lower() == "true",
+        "SUGGEST_REFRESH_SECONDS": float(os.getenv("SUGGEST_REFRESH_SECONDS", "60")),
+        "IMPORT_BATCH_SIZE": int(os.getenv("IMPORT_BATCH_SIZE", "5000")),
+        "JSON_ENCODER": os.getenv("JSON_ENCODER", "auto"),
+        "METRICS": os.getenv("METRICS", "true").lower() == "true",
+        "SLOW_QUERY_MS": float(os.getenv("SLOW_QUERY_MS", "0")),
+        "DEBUG_PROFILE": os.getenv("DEBUG_PROFILE", "false").lower() == "true",
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "INFO"),
+        "LOG_FORMAT": os.getenv("LOG_FORMAT", "json"),
+        "LOG_FILE": os.getenv("LOG_FILE", "library_api.log"),
+        "LOG_CLIENT_ERRORS_PER_SECOND": float(os.getenv("LOG_CLIENT_ERRORS_PER_SECOND", "10")),
     }
\ No newline at end of file
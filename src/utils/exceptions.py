@@ -1,34 +1,61 @@
-import traceback
 from aiohttp import web
 from functools import wraps
-from typing import Callable, Any
+from typing import Any, Callable, Dict
 
 
 class NotFoundError(Exception):
     pass
 
 
+class ConflictError(Exception):
+    pass
+
+
+# Request key set once a streamed response has sent its headers
+RESPONSE_STARTED = "response_started"
+
+
+def log_fields(request: web.Request, status: int) -> Dict[str, Any]:
+    # Structured fields of an error record; `status` drives 4xx sampling
+    return {"status": status, "method": request.method, "path": request.path}
+
+
 def handle_errors(handler: Callable) -> Callable:
     @wraps(handler)
     async def wrapper(request: web.Request) -> web.Response:
         try:
             return await handler(request)
-        except NotFoundError as e:
-            request.app['logger'].warning(f"Not found: {str(e)}")
-            return web.json_response(
-                {"error": str(e)}, status=404
-            )
-        except ValueError as e:
-            request.app['logger'].warning(f"Validation error: {str(e)}")
-            return web.json_response(
-                {"error": str(e)}, status=400
-            )
         except Exception as e:
-            request.app['logger'].error(
-                f"Internal server error: {str(e)}\n"
-                f"Traceback: {traceback.format_exc()}"
-            )
-            return web.json_response(
-                {"error": "Internal server error"}, status=500
-            )
-    return wrapper
\ No newline at end of file
+            if request.get(RESPONSE_STARTED):
+                # Headers and part of the body are out: a second response
+                # cannot be sent (stream_chunks logged and cut the stream)
+                raise
+            return error_response(request, e)
+    return wrapper
+
+
+def error_response(request: web.Request, error: Exception) -> web.Response:
+    if isinstance(error, NotFoundError):
+        request.app['logger'].warning(f"Not found: {str(error)}", extra=log_fields(request, 404))
+        return web.json_response(
+            {"error": str(error)}, status=404
+        )
+    if isinstance(error, ConflictError):
+        request.app['logger'].warning(f"Conflict: {str(error)}", extra=log_fields(request, 409))
+        return web.json_response(
+            {"error": str(error)}, status=409
+        )
+    if isinstance(error, ValueError):
+        request.app['logger'].warning(f"Validation error: {str(error)}", extra=log_fields(request, 400))
+        return web.json_response(
+            {"error": str(error)}, status=400
+        )
+    # The traceback is formatted by the log listener thread
+    request.app['logger'].error(
+        f"Internal server error: {str(error)}",
+        exc_info=True,
+        extra=log_fields(request, 500),
+    )
+    return web.json_response(
+        {"error": "Internal server error"}, status=500
+    )
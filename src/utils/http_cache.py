@@ -0,0 +1,40 @@
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from aiohttp import web
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode(), digest_size=10)
+    return digest.hexdigest()
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Timestamps in the database are naive UTC (CURRENT_TIMESTAMP / 'now')
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def is_not_modified(request: web.Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    # If-None-Match wins over If-Modified-Since (RFC 9110, 13.2.2)
+    if_none_match = request.if_none_match
+    if if_none_match:
+        return any(tag.value in (etag, "*") for tag in if_none_match)
+
+    if_modified_since = request.if_modified_since
+    if if_modified_since is not None and last_modified is not None:
+        return _as_utc(last_modified).replace(microsecond=0) <= if_modified_since
+    return False
+
+
+def set_validators(response: web.StreamResponse, etag: str, last_modified: Optional[datetime] = None) -> web.StreamResponse:
+    response.etag = etag
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    return response
+
+
+def not_modified_response(etag: str, last_modified: Optional[datetime] = None) -> web.Response:
+    return set_validators(web.Response(status=304), etag, last_modified)
@@ -0,0 +1,126 @@
+import json
+import logging
+import queue
+import sys
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional, Tuple
+
+LOG_FORMATS = ("json", "text")
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# LogRecord attributes; anything else on a record came from `extra=`
+_RECORD_FIELDS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, the fields
+    passed with `extra=` and the traceback, if any."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in record.__dict__.items():
+            if name not in _RECORD_FIELDS:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LoopQueueHandler(QueueHandler):
+    """QueueHandler that leaves all formatting to the listener thread.
+
+    The stock prepare() renders the message and the traceback in the
+    calling thread, which is the event loop. Records stay in this process,
+    so they can be queued as they are.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class ClientErrorSampler(logging.Filter):
+    """Lets through at most `per_second` 4xx records per status code.
+
+    Records are recognised by a `status` field (`extra={"status": 404}`).
+    The next record let through for a status carries the number dropped
+    since the previous one as `suppressed`. Runs before the queue, so a
+    dropped record costs no more than this check.
+    """
+
+    def __init__(self, per_second: float):
+        super().__init__()
+        self.per_second = per_second
+        # status -> (tokens, last refill, suppressed since last record)
+        self._buckets: Dict[int, Tuple[float, float, int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        status = getattr(record, "status", None)
+        if status is None or not 400 <= status < 500 or self.per_second <= 0:
+            return True
+        now = time.monotonic()
+        tokens, refilled, suppressed = self._buckets.get(status, (self.per_second, now, 0))
+        tokens = min(self.per_second, tokens + (now - refilled) * self.per_second)
+        if tokens < 1:
+            self._buckets[status] = (tokens, now, suppressed + 1)
+            return False
+        if suppressed:
+            record.suppressed = suppressed
+        self._buckets[status] = (tokens - 1, now, 0)
+        return True
+
+
+def setup_logging(config: Dict[str, Any]) -> Tuple[logging.Logger, QueueListener]:
+    # The loop only puts records on a queue; a listener thread formats
+    # them and does the file and console I/O, including rotation
+    fmt = config["LOG_FORMAT"]
+    if fmt not in LOG_FORMATS:
+        raise ValueError(f"Unknown log format: {fmt}")
+    formatter = JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+
+    file_handler = RotatingFileHandler(config["LOG_FILE"], maxBytes=5 * 1024 * 1024, backupCount=3)
+    file_handler.setFormatter(formatter)
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = LoopQueueHandler(records)
+    queue_handler.addFilter(ClientErrorSampler(config["LOG_CLIENT_ERRORS_PER_SECOND"]))
+
+    logger = logging.getLogger("library_api")
+    logger.setLevel(config["LOG_LEVEL"].upper())
+    # A second create_app() in the same process replaces the pipeline
+    logger.handlers = [queue_handler]
+    logger.propagate = False
+
+    listener = QueueListener(records, file_handler, console_handler)
+    listener.start()
+    return logger, listener
+
+
+def setup_master_logging(config: Dict[str, Any]) -> logging.Logger:
+    # The supervisor forks, so no listener thread here; workers replace
+    # these handlers with their own pipeline
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if config["LOG_FORMAT"] == "json" else logging.Formatter(TEXT_FORMAT))
+    logger = logging.getLogger("library_api")
+    logger.setLevel(config["LOG_LEVEL"].upper())
+    logger.handlers = [handler]
+    logger.propagate = False
+    return logger
+
+
+def stop_logging(listener: Optional[QueueListener]) -> None:
+    # Drains the queue, then closes the files
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
@@ -0,0 +1,213 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+# Upper bounds of the latency histogram, in seconds (+Inf is implicit)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class SqlTimer:
+    """SQL statements and time charged to one request."""
+
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+# Set by the middleware for the duration of a request; the pool's
+# connections add to it (see models.pool.InstrumentedConnection)
+current_sql: ContextVar[Optional[SqlTimer]] = ContextVar("current_sql", default=None)
+
+
+class RouteStats:
+    __slots__ = ("buckets", "count", "seconds", "statuses", "sql_statements", "sql_seconds")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.statuses: Dict[int, int] = {}
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+
+    def record(self, status: int, elapsed: float, sql: SqlTimer) -> None:
+        # Buckets are stored per interval and summed up when rendered
+        self.buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        self.count += 1
+        self.seconds += elapsed
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.sql_statements += sql.statements
+        self.sql_seconds += sql.seconds
+
+
+class Metrics:
+    """Request counters kept in process and rendered for /metrics."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+
+    def route(self, method: str, route: str) -> RouteStats:
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats()
+        return stats
+
+
+def route_name(request: web.Request) -> str:
+    # The route template keeps the label set small: /api/books/{id}, not /api/books/42
+    resource = request.match_info.route.resource
+    if resource is None:
+        return "unmatched"
+    return resource.canonical
+
+
+def metrics_middleware(metrics: Metrics) -> Callable:
+    @web.middleware
+    async def middleware(request: web.Request, handler: Callable) -> web.StreamResponse:
+        sql = SqlTimer()
+        token = current_sql.set(sql)
+        metrics.in_flight += 1
+        status = 500
+        started = time.perf_counter()
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.in_flight -= 1
+            current_sql.reset(token)
+            metrics.route(request.method, route_name(request)).record(status, elapsed, sql)
+
+    return middleware
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: Any) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _family(lines: List[str], name: str, kind: str, help_text: str) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def render_metrics(app: web.Application) -> str:
+    # Prometheus text exposition format 0.0.4
+    metrics: Metrics = app["metrics"]
+    routes = sorted(metrics.routes.items())
+    lines: List[str] = []
+
+    _family(lines, "library_http_requests_in_flight", "gauge", "Requests being handled")
+    lines.append(f"library_http_requests_in_flight {metrics.in_flight}")
+
+    _family(lines, "library_http_request_duration_seconds", "histogram", "Request latency by route")
+    for (method, route), stats in routes:
+        cumulative = 0
+        for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), stats.buckets):
+            cumulative += count
+            lines.append(
+                f"library_http_request_duration_seconds_bucket{_labels(method=method, route=route, le=bound)} {cumulative}"
+            )
+        labels = _labels(method=method, route=route)
+        lines.append(f"library_http_request_duration_seconds_sum{labels} {stats.seconds:.6f}")
+        lines.append(f"library_http_request_duration_seconds_count{labels} {stats.count}")
+
+    _family(lines, "library_http_responses_total", "counter", "Responses by route and status code")
+    for (method, route), stats in routes:
+        for status, count in sorted(stats.statuses.items()):
+            lines.append(f"library_http_responses_total{_labels(method=method, route=route, status=status)} {count}")
+
+    _family(lines, "library_sql_statements_total", "counter", "SQL statements run while handling requests")
+    for (method, route), stats in routes:
+        lines.append(f"library_sql_statements_total{_labels(method=method, route=route)} {stats.sql_statements}")
+
+    _family(lines, "library_sql_duration_seconds_total", "counter", "Time spent waiting for SQLite while handling requests")
+    for (method, route), stats in routes:
+        lines.append(f"library_sql_duration_seconds_total{_labels(method=method, route=route)} {stats.sql_seconds:.6f}")
+
+    if "pool" in app:
+        pool = app["pool"].stats()
+        _family(lines, "library_db_readers_idle", "gauge", "Idle read-only connections")
+        lines.append(f"library_db_readers_idle {pool['readers_idle']}")
+        _family(lines, "library_db_writer_busy", "gauge", "1 while the writer connection is held")
+        lines.append(f"library_db_writer_busy {int(pool['writer_busy'])}")
+        for key, kind, help_text in (
+            ("acquired", "counter", "Connections handed out"),
+            ("waited", "counter", "Acquisitions that had to wait"),
+            ("wait_seconds_total", "counter", "Time spent waiting for a connection"),
+        ):
+            name = "library_db_pool_" + key.replace("_total", "") + "_total"
+            _family(lines, name, kind, help_text)
+            for role in ("reader", "writer"):
+                lines.append(f"{name}{_labels(role=role)} {pool[role][key]}")
+
+    if "book_cache" in app:
+        cache = app["book_cache"].stats()
+        for key, kind, help_text in (
+            ("entries", "gauge", "Books in the cache"),
+            ("bytes", "gauge", "Estimated size of the cached books"),
+            ("hits", "counter", "Cache hits"),
+            ("misses", "counter", "Cache misses"),
+            ("evictions", "counter", "Books evicted by the size limits"),
+            ("invalidations", "counter", "Books dropped after a write"),
+        ):
+            name = f"library_book_cache_{key}" + ("_total" if kind == "counter" else "")
+            _family(lines, name, kind, help_text)
+            lines.append(f"{name} {cache[key]}")
+
+    if "search_cache" in app:
+        cache = app["search_cache"].stats()
+        for key, kind, help_text in (
+            ("entries", "gauge", "Search results in the cache"),
+            ("hits", "counter", "Searches answered from the cache"),
+            ("misses", "counter", "Searches run against the database"),
+            ("coalesced", "counter", "Searches that waited for an identical one in flight"),
+            ("evictions", "counter", "Results evicted by the size limit"),
+            ("expired", "counter", "Results dropped when the catalog version moved"),
+        ):
+            name = f"library_search_cache_{key}" + ("_total" if kind == "counter" else "")
+            _family(lines, name, kind, help_text)
+            lines.append(f"{name} {cache[key]}")
+
+    if "suggest_index" in app:
+        index = app["suggest_index"].stats()
+        _family(lines, "library_suggest_names", "gauge", "Suggestible names in the typeahead index")
+        for kind in ("titles", "authors", "genres"):
+            lines.append(f"library_suggest_names{_labels(kind=kind)} {index[kind]['names']}")
+        for key, help_text in (
+            ("lookups", "Typeahead lookups"),
+            ("updates", "Writes applied to the typeahead index"),
+            ("rebuilds", "Typeahead index rebuilds after other workers' writes"),
+        ):
+            name = f"library_suggest_{key}_total"
+            _family(lines, name, "counter", help_text)
+            lines.append(f"{name} {index[key]}")
+
+    if "group_commit" in app:
+        committer = app["group_commit"].stats()
+        for key, kind, help_text in (
+            ("batches", "counter", "Committed write batches"),
+            ("operations", "counter", "Writes run through group commit"),
+            ("failed", "counter", "Writes rolled back to their savepoint"),
+            ("queued", "gauge", "Writes waiting for the next batch"),
+        ):
+            name = f"library_group_commit_{key}" + ("_total" if kind == "counter" else "")
+            _family(lines, name, kind, help_text)
+            lines.append(f"{name} {committer[key]}")
+
+    return "\n".join(lines) + "\n"
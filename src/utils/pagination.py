@@ -0,0 +1,38 @@
+import base64
+import json
+from typing import Any, List, Optional
+
+
+def encode_cursor(order: str, key: List[Any]) -> str:
+    payload = json.dumps({"o": order, "k": key}, separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+# JSON values a key may hold; anything else (lists, objects) would reach
+# SQLite's parameter binding and fail there
+KEY_TYPES = (str, int, float, type(None))
+
+
+def decode_cursor(cursor: str, order: str, tiebreak: type = int) -> Optional[List[Any]]:
+    # Returns the key [sort value, tiebreak], where tiebreak is the unique
+    # last column of the order (a book id unless told otherwise). An empty
+    # cursor starts cursor pagination from the first page
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        cursor_order, key = payload["o"], payload["k"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_order != order:
+        raise ValueError("Cursor does not match the requested sort order")
+    # bool is an int subclass, but no key holds one
+    if (
+        not isinstance(key, list)
+        or len(key) != 2
+        or not all(isinstance(value, KEY_TYPES) and not isinstance(value, bool) for value in key)
+        or not isinstance(key[-1], tiebreak)
+    ):
+        raise ValueError("Invalid cursor")
+    return key
@@ -0,0 +1,219 @@
+import logging
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+from utils.metrics import SqlTimer, current_sql
+
+# Phases reported in Server-Timing, in this order, followed by total
+PHASES = ("parse", "validate", "sql", "hydrate", "serialize")
+
+PROFILE_HEADER = "X-Debug-Profile"
+
+# Statements worth an EXPLAIN QUERY PLAN; BEGIN, PRAGMA and the like are not
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+FETCH_CALLS = frozenset(("fetchone", "fetchmany", "fetchall"))
+
+# seconds spent per phase by the current request, when it asked for a profile
+current_profile: ContextVar[Optional[Dict[str, float]]] = ContextVar("current_profile", default=None)
+
+
+class _PhaseTimer:
+    __slots__ = ("phase", "profile", "started")
+
+    def __init__(self, phase: str, profile: Dict[str, float]):
+        self.phase = phase
+        self.profile = profile
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.profile[self.phase] = self.profile.get(self.phase, 0.0) + time.perf_counter() - self.started
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+def timed(phase: str):
+    # `with timed("validate"): ...` adds to the request profile, if any
+    profile = current_profile.get()
+    if profile is None:
+        return _NO_TIMER
+    return _PhaseTimer(phase, profile)
+
+
+def server_timing(profile: Dict[str, float], sql: SqlTimer, total: float) -> str:
+    times = {**profile, "sql": sql.seconds}
+    entries = []
+    for phase in PHASES:
+        entry = f"{phase};dur={times.get(phase, 0.0) * 1000:.3f}"
+        if phase == "sql":
+            entry += f';desc="{sql.statements} statements"'
+        entries.append(entry)
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
+
+
+@web.middleware
+async def profile_middleware(request: web.Request, handler: Callable) -> web.StreamResponse:
+    # Only requests sent with `X-Debug-Profile: 1` are profiled
+    if request.headers.get(PROFILE_HEADER) != "1":
+        return await handler(request)
+
+    profile: Dict[str, float] = {}
+    profile_token = current_profile.set(profile)
+    # Reuse the metrics middleware's timer, so its SQL counters stay complete
+    sql = current_sql.get()
+    sql_token = None
+    if sql is None:
+        sql = SqlTimer()
+        sql_token = current_sql.set(sql)
+    started = time.perf_counter()
+    try:
+        response = await handler(request)
+    finally:
+        current_profile.reset(profile_token)
+        if sql_token is not None:
+            current_sql.reset(sql_token)
+
+    # A streamed response has sent its headers already
+    if not response.prepared:
+        response.headers["Server-Timing"] = server_timing(profile, sql, time.perf_counter() - started)
+    return response
+
+
+def parameters_shape(parameters: Any, many: bool = False) -> str:
+    # Types instead of values: (int, str×3) or 500 × (int, str)
+    if many:
+        if not isinstance(parameters, (list, tuple)):
+            return "iterator"
+        if not parameters:
+            return "0 × ()"
+        return f"{len(parameters)} × {parameters_shape(parameters[0])}"
+    if not parameters:
+        return "()"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{name}: {type(value).__name__}" for name, value in parameters.items()) + "}"
+
+    runs: List[List[Any]] = []
+    for value in parameters:
+        name = type(value).__name__
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return "(" + ", ".join(name if count == 1 else f"{name}×{count}" for name, count in runs) + ")"
+
+
+class _Statement:
+    __slots__ = ("sql", "parameters", "many", "seconds", "rows")
+
+    def __init__(self, sql: str, parameters: Any, many: bool, seconds: float):
+        self.sql = sql
+        self.parameters = parameters
+        self.many = many
+        self.seconds = seconds
+        self.rows = 0
+
+
+class SlowQueryLog:
+    """Logs SQL statements that took longer than `threshold` seconds.
+
+    A statement is followed from its execute to the fetch that exhausts
+    its cursor (or to the cursor's close), so the time includes reading
+    the rows. Each slow statement is logged once with the shape of its
+    parameters, the number of rows and its EXPLAIN QUERY PLAN; plans are
+    cached per SQL text.
+    """
+
+    # Cursors that are neither exhausted nor closed are forgotten past this
+    max_open = 1000
+
+    def __init__(self, threshold: float, logger: Optional[logging.Logger] = None, plan_cache_size: int = 256):
+        self.threshold = threshold
+        self.logger = logger or logging.getLogger("library_api.slow_query")
+        self.plan_cache_size = plan_cache_size
+        # id() of the sqlite3 cursor -> statement still being read
+        self._open: Dict[int, _Statement] = {}
+        self._plans: "OrderedDict[str, str]" = OrderedDict()
+        self.logged = 0
+
+    def observe(self, fn: Callable, args: tuple, result: Any, elapsed: float) -> List[_Statement]:
+        # Called for every sqlite3 call of an instrumented connection;
+        # returns the statements that just finished above the threshold
+        name = fn.__name__
+        finished: List[_Statement] = []
+        if name in ("execute", "executemany"):
+            cursor = result
+            previous = self._open.pop(id(cursor), None)
+            if previous is not None:
+                finished.append(previous)
+            statement = _Statement(args[0], args[1] if len(args) > 1 else (), name == "executemany", elapsed)
+            if cursor.description is None:
+                # No result set: INSERT/UPDATE/DELETE without RETURNING
+                statement.rows = max(cursor.rowcount, 0)
+                finished.append(statement)
+            else:
+                self._open[id(cursor)] = statement
+                if len(self._open) > self.max_open:
+                    del self._open[next(iter(self._open))]
+        elif name in FETCH_CALLS:
+            cursor = fn.__self__
+            statement = self._open.get(id(cursor))
+            if statement is None:
+                return finished
+            statement.seconds += elapsed
+            if name == "fetchone":
+                exhausted = result is None
+                statement.rows += 0 if exhausted else 1
+            else:
+                statement.rows += len(result)
+                size = args[0] if args else cursor.arraysize
+                exhausted = name == "fetchall" or len(result) < size
+            if exhausted:
+                finished.append(self._open.pop(id(cursor)))
+        elif name == "close":
+            statement = self._open.pop(id(fn.__self__), None)
+            if statement is not None:
+                finished.append(statement)
+        return [statement for statement in finished if statement.seconds >= self.threshold]
+
+    def explainable(self, statement: _Statement) -> bool:
+        if statement.many and not (isinstance(statement.parameters, (list, tuple)) and statement.parameters):
+            # Generator parameters are consumed; nothing to bind the plan to
+            return False
+        return statement.sql.lstrip().split(None, 1)[0].upper() in EXPLAINABLE
+
+    def cached_plan(self, sql: str) -> Optional[str]:
+        plan = self._plans.get(sql)
+        if plan is not None:
+            self._plans.move_to_end(sql)
+        return plan
+
+    def remember_plan(self, sql: str, plan: str) -> None:
+        self._plans[sql] = plan
+        if len(self._plans) > self.plan_cache_size:
+            self._plans.popitem(last=False)
+
+    def report(self, statement: _Statement, plan: Optional[str]) -> None:
+        self.logged += 1
+        self.logger.warning(
+            f"Slow query: {statement.seconds * 1000:.1f} ms, {statement.rows} rows, "
+            f"params {parameters_shape(statement.parameters, statement.many)}: "
+            f"{' '.join(statement.sql.split())} | plan: {plan or 'n/a'}"
+        )
@@ -0,0 +1,73 @@
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict
+
+from aiohttp import web
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from utils.profiling import timed
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson (poetry extra "fast-json")
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    # Types neither encoder handles natively. Models are dumped field by
+    # field without a validation or serialization pass; nested models come
+    # back here.
+    if isinstance(obj, BaseModel):
+        return dict(obj.__dict__)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps_json(obj: Any) -> bytes:
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _dumps_pydantic(obj: Any) -> bytes:
+    # pydantic-core's serializer handles models, datetimes and containers
+    # natively and ships with pydantic, so it is always available
+    return to_json(obj, fallback=_default)
+
+
+def _dumps_orjson(obj: Any) -> bytes:
+    # orjson writes naive datetimes in the same format as isoformat()
+    return orjson.dumps(obj, default=_default)
+
+
+# Fastest first; "auto" picks the first one installed
+ENCODERS: Dict[str, Callable[[Any], bytes]] = {}
+if orjson is not None:
+    ENCODERS["orjson"] = _dumps_orjson
+ENCODERS["pydantic"] = _dumps_pydantic
+ENCODERS["json"] = _dumps_json
+
+_dumps = next(iter(ENCODERS.values()))
+
+
+def set_encoder(name: str) -> str:
+    # Returns the name of the encoder now in use
+    global _dumps
+    if name == "auto":
+        name = next(iter(ENCODERS))
+    if name not in ENCODERS:
+        raise ValueError(f"JSON encoder {name!r} is not available (installed: {', '.join(ENCODERS)})")
+    _dumps = ENCODERS[name]
+    return name
+
+
+def dumps(obj: Any) -> bytes:
+    """JSON bytes for dicts, lists, models and datetimes."""
+    return _dumps(obj)
+
+
+def json_response(data: Any, status: int = 200, **kwargs) -> web.Response:
+    # Drop-in for web.json_response that accepts models directly
+    with timed("serialize"):
+        body = dumps(data)
+    return web.Response(body=body, status=status, content_type="application/json", charset="utf-8", **kwargs)
@@ -0,0 +1,36 @@
+from typing import AsyncIterator
+
+from aiohttp import web
+
+from utils.exceptions import RESPONSE_STARTED, log_fields
+
+
+async def stream_chunks(request: web.Request, chunks: AsyncIterator[bytes], content_type: str) -> web.StreamResponse:
+    # Pulls the first chunk before sending headers so that errors raised
+    # while building the query (bad filters, bad cursor) still become a 400
+    first = await anext(chunks, b"")
+
+    response = web.StreamResponse(headers={"Content-Type": f"{content_type}; charset=utf-8"})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    request[RESPONSE_STARTED] = True
+    try:
+        await response.write(first)
+        async for chunk in chunks:
+            await response.write(chunk)
+    except Exception as e:
+        # Too late for an error status. Dropping the connection without the
+        # final chunk shows the client that the body is truncated; the
+        # response is returned rather than the error raised, which aiohttp
+        # would log a second time (its write_eof fails quietly on the
+        # closed transport).
+        request.app["logger"].error(
+            f"Stream aborted after headers: {str(e)}",
+            exc_info=True,
+            extra=log_fields(request, 500),
+        )
+        if request.transport is not None:
+            request.transport.close()
+        return response
+    await response.write_eof()
+    return response
@@ -0,0 +1,197 @@
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger("library_api.workers")
+
+# A worker that exits sooner than this after starting counts as a crash
+# and is restarted with a growing delay, up to MAX_RESTART_DELAY
+MIN_UPTIME = 5.0
+MAX_RESTART_DELAY = 30.0
+
+
+def reuse_port_supported() -> bool:
+    # Only Linux balances connections between SO_REUSEPORT sockets
+    return sys.platform.startswith("linux") and hasattr(socket, "SO_REUSEPORT")
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    # Pre-fork fallback: one listening socket, inherited by every worker
+    sock = socket.create_server((host, port), reuse_port=False, backlog=1024)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    """Pre-forking master that keeps `workers` processes running.
+
+    Each worker runs `target(index)` in a forked child and is expected to
+    serve until SIGTERM, then shut down gracefully. The master:
+
+    - restarts workers that exit on their own, backing off when they keep
+      crashing right after start;
+    - on SIGHUP replaces the workers one at a time, starting the new one
+      before stopping the old, so capacity never drops;
+    - on SIGTERM or SIGINT stops all workers and waits `shutdown_timeout`
+      seconds for them before killing what is left.
+
+    Workers get their own process group, so a Ctrl-C in the terminal
+    reaches only the master, which then stops them in order.
+    """
+
+    def __init__(self, workers: int, target: Callable[[int], None], shutdown_timeout: float = 30.0):
+        self.workers = workers
+        self.target = target
+        self.shutdown_timeout = shutdown_timeout
+        # pid -> (worker index, start time)
+        self._children: Dict[int, tuple] = {}
+        self._delays: Dict[int, float] = {}
+        # index -> monotonic time before which a crashed worker is not restarted
+        self._restart_at: Dict[int, float] = {}
+        self._stopping = False
+        self._reloading = False
+        self.restarts = 0
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+
+        for index in range(self.workers):
+            self._spawn(index)
+        logger.info(f"Started {self.workers} workers, master pid {os.getpid()}")
+
+        while not self._stopping:
+            if self._reloading:
+                self._reloading = False
+                self._rolling_restart()
+            self._reap()
+            self._restart_due()
+            time.sleep(0.2)
+        self._stop_all()
+
+    def _on_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _on_reload(self, signum, frame) -> None:
+        self._reloading = True
+
+    def _spawn(self, index: int) -> int:
+        pid = os.fork()
+        if pid == 0:
+            # In the worker: default signal handling, own process group
+            for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+                signal.signal(signum, signal.SIG_DFL)
+            os.setpgid(0, 0)
+            code = 0
+            try:
+                self.target(index)
+            except BaseException:
+                # The worker's log pipeline may be gone by now
+                traceback.print_exc()
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        self._children[pid] = (index, time.monotonic())
+        return pid
+
+    def _reap(self) -> None:
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            index, started = self._children.pop(pid, (None, 0.0))
+            if index is None or self._stopping:
+                continue
+
+            uptime = time.monotonic() - started
+            if uptime < MIN_UPTIME:
+                delay = min(max(self._delays.get(index, 0.5) * 2, 1.0), MAX_RESTART_DELAY)
+            else:
+                delay = 0.0
+            self._delays[index] = delay
+            logger.warning(
+                f"Worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)} "
+                f"after {uptime:.1f}s, restarting in {delay:.1f}s"
+            )
+            # Restarted from the main loop, which keeps reaping other
+            # workers and handling signals while this one backs off
+            self._restart_at[index] = time.monotonic() + delay
+
+    def _restart_due(self) -> None:
+        now = time.monotonic()
+        for index, restart_at in list(self._restart_at.items()):
+            if self._stopping:
+                return
+            if restart_at <= now:
+                del self._restart_at[index]
+                self.restarts += 1
+                self._spawn(index)
+
+    def _rolling_restart(self) -> None:
+        logger.info("Restarting workers")
+        for pid, (index, _) in list(self._children.items()):
+            if self._stopping:
+                return
+            self._spawn(index)
+            self._terminate(pid)
+
+    def _terminate(self, pid: int) -> None:
+        # Stops one worker; it is forgotten first so _reap() does not restart it
+        self._children.pop(pid, None)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        self._wait({pid}, self.shutdown_timeout)
+
+    def _stop_all(self) -> None:
+        pids = set(self._children)
+        self._children.clear()
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        self._wait(pids, self.shutdown_timeout)
+        logger.info("All workers stopped")
+
+    def _wait(self, pids: set, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while pids:
+            for pid in list(pids):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    pids.discard(pid)
+            if not pids:
+                return
+            if time.monotonic() > deadline:
+                for pid in pids:
+                    logger.warning(f"Worker pid {pid} did not stop in {timeout:.0f}s, killing it")
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                        os.waitpid(pid, 0)
+                    except (ProcessLookupError, ChildProcessError):
+                        pass
+                return
+            time.sleep(0.05)
+
+
+def worker_log_file(path: str, index: Optional[int]) -> str:
+    # Workers rotate their own files: library_api.log -> library_api.2.log
+    if index is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{index}{ext}"
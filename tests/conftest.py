@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The application imports its modules from src/ the way main.py is run;
+# the benchmark catalog generator is shared with the tests
+for path in (os.path.join(ROOT_DIR, "src"), os.path.join(ROOT_DIR, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
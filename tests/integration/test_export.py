@@ -0,0 +1,50 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiosqlite
+import pytest
+
+from catalog import generate
+from models.book import BookSearchParams
+from services.export_service import ExportService
+
+
+@pytest.fixture(scope="module")
+def catalog_db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("catalog") / "catalog.db")
+    generate(path, 1000)
+    return path
+
+
+def export(path, params, fetch_size):
+    # The export and how many times it borrowed a connection
+    borrowed = 0
+
+    async def run():
+        async with aiosqlite.connect(path) as db:
+            db.row_factory = aiosqlite.Row
+
+            @asynccontextmanager
+            async def reader():
+                nonlocal borrowed
+                borrowed += 1
+                yield db
+
+            service = ExportService(reader, fetch_size=fetch_size)
+            return b"".join([chunk async for chunk in service.export(params)])
+
+    return asyncio.run(run()), borrowed
+
+
+@pytest.mark.parametrize("params", [
+    BookSearchParams(),
+    BookSearchParams(sort_by="title"),
+    BookSearchParams(sort_by="year", sort_order="desc"),
+    BookSearchParams(sort_by="author", available_only=True),
+])
+def test_pages_add_up_to_one_read(catalog_db, params):
+    whole, borrowed = export(catalog_db, params, fetch_size=10000)
+    assert borrowed == 1
+    paged, borrowed = export(catalog_db, params, fetch_size=70)
+    assert paged == whole
+    assert borrowed == whole.count(b"\n") // 70 + 1
@@ -0,0 +1,43 @@
+import asyncio
+
+import aiosqlite
+import pytest
+
+from catalog import generate
+from services.query_plans import FULL_SCAN, find_full_scans
+
+
+@pytest.fixture(scope="module")
+def catalog_db(tmp_path_factory):
+    # Big enough for sqlite_stat1 to steer the planner away from the
+    # indexes the way it does on a real catalog
+    path = str(tmp_path_factory.mktemp("catalog") / "catalog.db")
+    generate(path, 3000)
+    return path
+
+
+def test_hot_queries_use_indexes(catalog_db):
+    async def check():
+        async with aiosqlite.connect(catalog_db) as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute("SELECT COUNT(*) FROM sqlite_stat1") as cursor:
+                assert (await cursor.fetchone())[0] > 0
+            return await find_full_scans(db)
+
+    scans = asyncio.run(check())
+    assert scans == [], "\n".join(f"{detail}: {statement}" for statement, detail in scans)
+
+
+@pytest.mark.parametrize("detail", ["SCAN b", "SCAN books", "SCAN TABLE books", "SCAN TABLE books AS b"])
+def test_full_scan_matches_both_plan_formats(detail):
+    assert FULL_SCAN.match(detail)
+
+
+@pytest.mark.parametrize("detail", [
+    "SCAN b USING COVERING INDEX idx_books_active_title",
+    "SCAN TABLE books AS b USING INDEX idx_books_active_year",
+    "SCAN books_fts VIRTUAL TABLE INDEX 0:M1",
+    "SEARCH b USING INTEGER PRIMARY KEY (rowid=?)",
+])
+def test_full_scan_ignores_indexed_plans(detail):
+    assert not FULL_SCAN.match(detail)
@@ -0,0 +1,26 @@
+import asyncio
+
+import aiosqlite
+import pytest
+
+from models.migrations import migrate
+from services.book_service import MAX_BATCH_SIZE, BookService
+
+
+def run_batch(book_ids):
+    async def batch():
+        async with aiosqlite.connect(":memory:") as db:
+            db.row_factory = aiosqlite.Row
+            await migrate(db)
+            return await BookService(db).get_books_batch(book_ids)
+
+    return asyncio.run(batch())
+
+
+def test_batch_limit_counts_repeated_ids():
+    with pytest.raises(ValueError):
+        run_batch([1] * (MAX_BATCH_SIZE + 1))
+
+
+def test_batch_at_the_limit():
+    assert run_batch([1] * MAX_BATCH_SIZE) == {}
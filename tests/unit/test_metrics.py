@@ -0,0 +1,14 @@
+import asyncio
+
+from aiohttp import web
+
+from bench_metrics import BUDGET, REQUEST_SECONDS, middleware_cost
+from routes.books import setup_routes
+
+
+def test_metrics_middleware_within_budget():
+    # Only routing is needed: the middleware is timed around a stub handler
+    app = web.Application()
+    setup_routes(app)
+    cost = asyncio.run(middleware_cost(app, "/api/books/42"))
+    assert cost < BUDGET * REQUEST_SECONDS, f"{cost * 1e6:.2f} us per request"
@@ -0,0 +1,39 @@
+import base64
+import json
+
+import pytest
+
+from utils.pagination import decode_cursor, encode_cursor
+
+
+def tampered(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_round_trip():
+    assert decode_cursor(encode_cursor("title:asc", ["Мир", 7]), "title:asc") == ["Мир", 7]
+    assert decode_cursor(encode_cursor("year:desc", [None, 7]), "year:desc") == [None, 7]
+    assert decode_cursor(encode_cursor("authors:active_book_count", [3, "Толстой"]), "authors:active_book_count", tiebreak=str) == [3, "Толстой"]
+    assert decode_cursor("", "title:asc") is None
+
+
+def test_other_order_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor("year:asc", [1900, 7]), "title:asc")
+
+
+@pytest.mark.parametrize("key", [
+    [[1], 1],
+    ["Мир", [1]],
+    [{"a": 1}, 1],
+    ["Мир", "7"],
+    ["Мир", True],
+    [False, 7],
+    ["Мир", 1.5],
+    ["Мир"],
+    ["Мир", 7, 8],
+    "Мир",
+])
+def test_tampered_key_is_rejected(key):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(tampered({"o": "title:asc", "k": key}), "title:asc")
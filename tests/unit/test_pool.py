@@ -0,0 +1,26 @@
+import asyncio
+
+from models.pool import connect
+from utils.metrics import SqlTimer, current_sql
+
+
+def test_statements_are_charged_to_the_request():
+    # InstrumentedConnection relies on aiosqlite routing every call,
+    # cursors included, through the private Connection._execute
+    async def charged():
+        sql = SqlTimer()
+        token = current_sql.set(sql)
+        try:
+            async with connect(":memory:") as db:
+                await db.execute("CREATE TABLE t (x INTEGER)")
+                await db.executemany("INSERT INTO t VALUES (?)", [(1,), (2,)])
+                async with db.execute("SELECT x FROM t") as cursor:
+                    rows = await cursor.fetchall()
+        finally:
+            current_sql.reset(token)
+        return sql, rows
+
+    sql, rows = asyncio.run(charged())
+    assert rows == [(1,), (2,)]
+    assert sql.statements == 3
+    assert sql.seconds > 0
@@ -0,0 +1,23 @@
+import asyncio
+
+import pytest
+
+from routes.books import read_ids
+
+
+class JsonRequest:
+    def __init__(self, data):
+        self.data = data
+
+    async def json(self):
+        return self.data
+
+
+def test_read_ids_keeps_repeats():
+    assert asyncio.run(read_ids(JsonRequest({"ids": [1, 2, 2]}))) == [1, 2, 2]
+
+
+@pytest.mark.parametrize("data", [[1, 2], {"ids": "1,2"}, {"ids": [1, "2"]}, {"ids": [True]}, {"ids": [1, False]}])
+def test_read_ids_rejects(data):
+    with pytest.raises(ValueError):
+        asyncio.run(read_ids(JsonRequest(data)))
@@ -0,0 +1,7 @@
+from utils.serialization import json_response
+
+
+def test_json_response_declares_utf8():
+    response = json_response({"title": "Война и мир"})
+    assert response.headers["Content-Type"] == "application/json; charset=utf-8"
+    assert response.body.decode("utf-8") in ('{"title":"Война и мир"}', '{"title": "Война и мир"}')
@@ -0,0 +1,41 @@
+import asyncio
+
+import aiosqlite
+import pytest
+
+from models.migrations import migrate
+from models.stats import StatsParams
+from services.stats_service import StatsService
+from utils.pagination import encode_cursor
+
+
+def run_stats(call):
+    async def stats():
+        async with aiosqlite.connect(":memory:") as db:
+            db.row_factory = aiosqlite.Row
+            await migrate(db)
+            await db.executemany(
+                "INSERT INTO authors (name, book_count, active_book_count) VALUES (?, ?, ?)",
+                [(f"Автор {i:03d}", i % 7, i % 7) for i in range(250)],
+            )
+            return await call(StatsService(db))
+
+    return asyncio.run(stats())
+
+
+def test_all_stats_are_not_capped():
+    rows = run_stats(lambda service: service.get_all_stats("authors", StatsParams()))
+    assert len(rows) == 250
+    assert rows[0] == ("Автор 006", 6)
+
+
+def test_page_has_next_cursor():
+    rows, next_cursor = run_stats(lambda service: service.get_stats("authors", StatsParams()))
+    assert len(rows) == 100
+    assert next_cursor is not None
+
+
+def test_tampered_cursor_is_rejected():
+    cursor = encode_cursor("authors:active_book_count", [[3], "Автор 001"])
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        run_stats(lambda service: service.get_stats("authors", StatsParams(cursor=cursor)))
@@ -0,0 +1,36 @@
+import time
+
+from utils.workers import Supervisor
+
+
+def reap_all(supervisor, timeout=5.0):
+    # Reaps until every child has exited; no single pass may block on a backoff
+    deadline = time.monotonic() + timeout
+    while supervisor._children and time.monotonic() < deadline:
+        began = time.monotonic()
+        supervisor._reap()
+        assert time.monotonic() - began < 0.5
+        time.sleep(0.05)
+
+
+def test_crashed_workers_back_off_without_blocking():
+    # Workers that return at once count as crashes
+    supervisor = Supervisor(2, lambda index: None, shutdown_timeout=5)
+    for index in range(2):
+        supervisor._spawn(index)
+    try:
+        reap_all(supervisor)
+        assert set(supervisor._restart_at) == {0, 1}
+        assert supervisor.restarts == 0
+
+        # Only workers whose backoff has run out are restarted
+        supervisor._restart_at[1] = 0.0
+        supervisor._restart_due()
+        assert set(supervisor._restart_at) == {0}
+        assert supervisor.restarts == 1
+        assert [index for index, _ in supervisor._children.values()] == [1]
+
+        reap_all(supervisor)
+        assert supervisor._restart_at[1] - time.monotonic() > 1.0
+    finally:
+        supervisor._stop_all()